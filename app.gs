@@ -9,6 +9,9 @@ function doPost(e) {
     // 1. Parsear los datos JSON recibidos en la solicitud.
     const data = JSON.parse(e.postData.contents);
     
+    // ID de correlación enviado por Flask: se agrega a cada log y a la respuesta.
+    currentCorrelationId = String(data.correlationId || '').slice(0, 64);
+    
     // 2. Validar el token de seguridad para proteger el endpoint.
     if (!validateSecurityToken(data.token)) {
       return createResponse(false, 'Token de seguridad inválido o no proporcionado', null, 401);
@@ -19,37 +22,179 @@ function doPost(e) {
       return createResponse(false, 'Acción no especificada', null);
     }
 
-    // 4. Ejecutar la acción correspondiente usando un switch.
-    // Este es el enrutador principal de la API.
-    switch (data.action) {
-      case 'createFolders':
-        return handleCreateFolders(data);
-        
-      case 'generateDocuments':
-        return handleGenerateDocuments(data);
-        
-      case 'sendEmail':
-        return handleSendEmail(data);
-
-      case 'uploadFiles':
-        return handleFileUpload(data);
-
-      case 'getMimeType': // <-- AÑADE ESTA LÍNEA
-        return handleGetMimeType(data); // <-- AÑADE ESTA LÍNEA
-      // --------------------------------
-        
-      default:
-        // Si la acción no coincide con ninguna de las anteriores, devolver un error.
-        return createResponse(false, 'Acción no válida: ' + data.action, null);
-    }
+    // 4. Ejecutar la acción registrando su duración.
+    const startedAt = Date.now();
+    logInfo('Acción ' + data.action + ' iniciada');
+    const response = routeAction(data);
+    logInfo('Acción ' + data.action + ' terminada en ' + (Date.now() - startedAt) + ' ms');
+    return response;
     
   } catch (error) {
     // Si ocurre cualquier error inesperado (ej. JSON mal formado), se captura aquí.
-    console.error('Error fatal en doPost:', error);
+    logError('Error fatal en doPost:', error);
     return createResponse(false, 'Error interno del servidor: ' + error.message, null);
   }
 }
 
+/**
+ * Ejecuta la acción correspondiente usando un switch.
+ * Este es el enrutador principal de la API.
+ * @param {Object} data - Datos de la solicitud con la acción.
+ * @returns {ContentService} - Respuesta JSON del handler.
+ */
+function routeAction(data) {
+  switch (data.action) {
+    case 'createFolders':
+      return handleCreateFolders(data);
+      
+    case 'generateDocuments':
+      return handleGenerateDocuments(data);
+      
+    case 'sendEmail':
+      return handleSendEmail(data);
+
+    case 'uploadFiles':
+      return handleFileUpload(data);
+
+    case 'getMimeType': // <-- AÑADE ESTA LÍNEA
+      return handleGetMimeType(data); // <-- AÑADE ESTA LÍNEA
+    // --------------------------------
+
+    case 'processSubmission':
+      return handleProcessSubmission(data);
+
+    case 'sendDigest':
+      return handleSendDigest(data);
+
+    case 'exportPdf':
+      return handleExportPdf(data);
+
+    case 'startUpload':
+      return handleStartUpload(data);
+
+    case 'uploadChunk':
+      return handleUploadChunk(data);
+
+    case 'uploadStatus':
+      return handleUploadStatus(data);
+      
+    default:
+      // Si la acción no coincide con ninguna de las anteriores, devolver un error.
+      return createResponse(false, 'Acción no válida: ' + data.action, null);
+  }
+}
+
+/**
+ * Ejecuta en una sola petición una lista ordenada de sub-operaciones
+ * (createFolders, generateDocuments, sendEmail, uploadFiles, exportPdf).
+ * Los parámetros de un paso pueden referenciar la salida de pasos anteriores
+ * con cadenas del tipo '${idPaso.ruta.al.valor}', ej: '${carpeta.createdFolders.0.id}'.
+ * @param {Object} data - Datos de la solicitud con el array 'steps'.
+ * @returns {ContentService} - Respuesta JSON con el resultado de cada paso.
+ */
+function handleProcessSubmission(data) {
+  try {
+    if (!data.steps || !Array.isArray(data.steps) || data.steps.length === 0) {
+      return createResponse(false, 'Lista de pasos (steps) no proporcionada o vacía', null);
+    }
+
+    const handlers = {
+      createFolders: handleCreateFolders,
+      generateDocuments: handleGenerateDocuments,
+      sendEmail: handleSendEmail,
+      uploadFiles: handleFileUpload,
+      exportPdf: handleExportPdf
+    };
+
+    const outputs = {};
+    const results = [];
+    let failed = false;
+
+    for (let i = 0; i < data.steps.length; i++) {
+      const step = data.steps[i];
+      const stepId = step.id || ('paso' + i);
+
+      if (failed) {
+        results.push({ id: stepId, action: step.action, success: false, skipped: true });
+        continue;
+      }
+
+      let stepResult;
+      try {
+        const handler = handlers[step.action];
+        if (!handler) {
+          throw new Error('Acción no válida en el paso ' + stepId + ': ' + step.action);
+        }
+        const params = resolveStepReferences(step.params || {}, outputs);
+        const stepStartedAt = Date.now();
+        const response = JSON.parse(handler(params).getContent());
+        logInfo('Paso ' + stepId + ' (' + step.action + ') terminado en ' + (Date.now() - stepStartedAt) + ' ms');
+        stepResult = {
+          id: stepId,
+          action: step.action,
+          success: response.success,
+          message: response.message,
+          data: response.data
+        };
+      } catch (error) {
+        logError('Error en el paso ' + stepId + ':', error);
+        stepResult = { id: stepId, action: step.action, success: false, message: error.message, data: null };
+      }
+
+      outputs[stepId] = stepResult.data;
+      results.push(stepResult);
+
+      // Un paso obligatorio fallido cancela los siguientes; los opcionales (ej. email) no.
+      if (!stepResult.success && !step.optional) {
+        failed = true;
+      }
+    }
+
+    return createResponse(!failed, failed ? 'Procesamiento interrumpido por un paso fallido' : 'Procesamiento completado', {
+      steps: results
+    });
+
+  } catch (error) {
+    logError('Error en handleProcessSubmission:', error);
+    return createResponse(false, 'Error al procesar la solicitud compuesta: ' + error.message, null);
+  }
+}
+
+/**
+ * Reemplaza recursivamente las referencias '${idPaso.ruta}' por valores de pasos anteriores.
+ * @param {*} value - Parámetros del paso (objeto, array o valor simple).
+ * @param {Object} outputs - Salidas de los pasos ya ejecutados, indexadas por id.
+ * @returns {*} - Parámetros con las referencias resueltas.
+ */
+function resolveStepReferences(value, outputs) {
+  if (typeof value === 'string') {
+    const match = value.match(/^\$\{([^}]+)\}$/);
+    if (!match) {
+      return value;
+    }
+    const path = match[1].split('.');
+    let current = outputs;
+    for (const key of path) {
+      if (current === null || current === undefined || !(key in Object(current))) {
+        throw new Error('Referencia no resuelta: ' + value);
+      }
+      current = current[key];
+    }
+    return current;
+  }
+  if (Array.isArray(value)) {
+    return value.map(item => resolveStepReferences(item, outputs));
+  }
+  if (value && typeof value === 'object') {
+    const resolved = {};
+    for (const [key, item] of Object.entries(value)) {
+      resolved[key] = resolveStepReferences(item, outputs);
+    }
+    return resolved;
+  }
+  return value;
+}
+
 /**
  * Maneja la creación de carpetas y subcarpetas
  * @param {Object} data - Datos de la solicitud
@@ -83,7 +228,7 @@ function handleCreateFolders(data) {
     });
     
   } catch (error) {
-    console.error('Error en handleCreateFolders:', error);
+    logError('Error en handleCreateFolders:', error);
     return createResponse(false, 'Error al crear carpetas: ' + error.message, null);
   }
 }
@@ -101,29 +246,37 @@ function createFoldersStructure(parentFolder, folders) {
     try {
       // Validar que el nombre de la carpeta esté presente
       if (!folderData.name || folderData.name.trim() === '') {
-        console.warn('Nombre de carpeta vacío, omitiendo...');
+        logWarn('Nombre de carpeta vacío, omitiendo...');
         return;
       }
       
-      // Verificar si la carpeta ya existe
-      const existingFolders = parentFolder.getFoldersByName(folderData.name);
+      // Obtener o crear la carpeta. El lock evita que dos envíos simultáneos
+      // del mismo docente creen dos carpetas con el mismo nombre.
+      const lock = LockService.getScriptLock();
+      lock.waitLock(10000);
       let currentFolder;
-      
-      if (existingFolders.hasNext()) {
-        // Si ya existe, usar la existente
-        currentFolder = existingFolders.next();
-        console.log('Carpeta ya existe: ' + folderData.name);
-      } else {
-        // Crear nueva carpeta
-        currentFolder = parentFolder.createFolder(folderData.name);
-        console.log('Carpeta creada: ' + folderData.name);
+      let existed;
+      try {
+        currentFolder = findFolderByName(parentFolder, folderData.name);
+        existed = currentFolder !== null;
+        
+        if (existed) {
+          // Si ya existe, usar la existente
+          logInfo('Carpeta ya existe: ' + folderData.name);
+        } else {
+          // Crear nueva carpeta
+          currentFolder = parentFolder.createFolder(folderData.name);
+          logInfo('Carpeta creada: ' + folderData.name);
+        }
+      } finally {
+        lock.releaseLock();
       }
       
       const folderInfo = {
         name: folderData.name,
         id: currentFolder.getId(),
         url: currentFolder.getUrl(),
-        existed: existingFolders.hasNext()
+        existed: existed
       };
       
       // Si hay subcarpetas, crearlas recursivamente
@@ -134,7 +287,7 @@ function createFoldersStructure(parentFolder, folders) {
       createdFolders.push(folderInfo);
       
     } catch (error) {
-      console.error('Error al crear carpeta ' + folderData.name + ':', error);
+      logError('Error al crear carpeta ' + folderData.name + ':', error);
       createdFolders.push({
         name: folderData.name,
         error: error.message
@@ -145,6 +298,23 @@ function createFoldersStructure(parentFolder, folders) {
   return createdFolders;
 }
 
+/**
+ * Busca una subcarpeta por nombre ignorando las que están en la papelera
+ * @param {DriveApp.Folder} parentFolder - Carpeta padre
+ * @param {string} name - Nombre de la carpeta
+ * @returns {DriveApp.Folder|null} - La carpeta encontrada o null
+ */
+function findFolderByName(parentFolder, name) {
+  const folders = parentFolder.getFoldersByName(name);
+  while (folders.hasNext()) {
+    const folder = folders.next();
+    if (!folder.isTrashed()) {
+      return folder;
+    }
+  }
+  return null;
+}
+
 /**
  * Valida el token de seguridad
  * @param {string} providedToken - Token proporcionado en la solicitud
@@ -156,12 +326,12 @@ function validateSecurityToken(providedToken) {
     const secureToken = PropertiesService.getScriptProperties().getProperty('SECURE_TOKEN');
     
     if (!secureToken) {
-      console.error('Token de seguridad no configurado en las propiedades del script');
+      logError('Token de seguridad no configurado en las propiedades del script');
       return false;
     }
     
     if (!providedToken) {
-      console.warn('Token no proporcionado en la solicitud');
+      logWarn('Token no proporcionado en la solicitud');
       return false;
     }
     
@@ -169,11 +339,41 @@ function validateSecurityToken(providedToken) {
     return providedToken === secureToken;
     
   } catch (error) {
-    console.error('Error al validar token de seguridad:', error);
+    logError('Error al validar token de seguridad:', error);
     return false;
   }
 }
 
+/**
+ * ID de correlación de la solicitud en curso ('' si no se envió). Cada ejecución
+ * de doPost tiene su propio contexto global.
+ */
+let currentCorrelationId = '';
+
+/**
+ * console.log/warn/error con el ID de correlación como prefijo, para encontrar en
+ * los logs de ejecución todas las líneas de un envío del formulario.
+ */
+function logInfo() {
+  console.log.apply(console, withCorrelationId(arguments));
+}
+
+function logWarn() {
+  console.warn.apply(console, withCorrelationId(arguments));
+}
+
+function logError() {
+  console.error.apply(console, withCorrelationId(arguments));
+}
+
+function withCorrelationId(args) {
+  const values = Array.prototype.slice.call(args);
+  if (currentCorrelationId) {
+    values.unshift('[' + currentCorrelationId + ']');
+  }
+  return values;
+}
+
 /**
  * Crea una respuesta JSON estandarizada
  * @param {boolean} success - Indica si la operación fue exitosa
@@ -190,6 +390,10 @@ function createResponse(success, message, data, statusCode) {
     data: data
   };
   
+  if (currentCorrelationId) {
+    response.correlationId = currentCorrelationId;
+  }
+  
   // Si se proporciona un código de error, agregarlo a la respuesta
   if (statusCode && !success) {
     response.statusCode = statusCode;
@@ -220,11 +424,12 @@ function handleGenerateDocuments(data) {
         const result = generateDocumentFromTemplate(docData);
         generatedDocuments.push(result);
       } catch (error) {
-        console.error('Error al generar documento:', error);
+        logError('Error al generar documento:', error);
         generatedDocuments.push({
           templateId: docData.templateId,
           fileName: docData.fileName || 'Sin nombre',
           error: error.message,
+          folderMissing: error.folderMissing === true,
           success: false
         });
       }
@@ -238,7 +443,7 @@ function handleGenerateDocuments(data) {
     });
     
   } catch (error) {
-    console.error('Error en handleGenerateDocuments:', error);
+    logError('Error en handleGenerateDocuments:', error);
     return createResponse(false, 'Error al generar documentos: ' + error.message, null);
   }
 }
@@ -250,7 +455,7 @@ function handleGenerateDocuments(data) {
  */
 function generateDocumentFromTemplate(docData) {
   // --- SELLO DE DIAGNÓSTICO ---
-  console.log("EJECUTANDO VERSIÓN SIMPLE (makeCopy) - Después de activar las APIs.");
+  logInfo("EJECUTANDO VERSIÓN SIMPLE (makeCopy) - Después de activar las APIs.");
   // -----------------------------
 
   // 1. Validar datos requeridos
@@ -269,6 +474,22 @@ function generateDocumentFromTemplate(docData) {
     throw new Error('Plantilla no encontrada: ' + docData.templateId);
   }
   
+  // Con requireFolder la carpeta de destino debe existir (y no estar en la papelera)
+  // antes de copiar la plantilla; el cliente puede estar usando un ID guardado en caché
+  if (docData.folderId && docData.requireFolder) {
+    let destinationFolder = null;
+    try {
+      destinationFolder = DriveApp.getFolderById(docData.folderId);
+    } catch (error) {
+      destinationFolder = null;
+    }
+    if (!destinationFolder || destinationFolder.isTrashed()) {
+      const folderError = new Error('Carpeta de destino no encontrada: ' + docData.folderId);
+      folderError.folderMissing = true;
+      throw folderError;
+    }
+  }
+  
   // 3. Reemplazar placeholders en el nombre del archivo
   const finalFileName = replacePlaceholdersInString(docData.fileName, docData.fields || {});
   
@@ -286,16 +507,29 @@ function generateDocumentFromTemplate(docData) {
       }
       folder.addFile(newDocFile);
     } catch (error) {
-      console.warn('No se pudo mover el archivo a la carpeta especificada:', error.message);
+      logWarn('No se pudo mover el archivo a la carpeta especificada:', error.message);
     }
   }
   
   // 6. Reemplazar campos en el cuerpo del documento si se proporcionan
+  let render = null;
   if (docData.fields && Object.keys(docData.fields).length > 0) {
-    replaceFieldsInDocument(newDocFile.getId(), docData.fields, docData.signatureData, docData.equipoData);
+    render = fillDocument(newDocFile.getId(), docData.fields, docData.signatureData, docData.equipoData, docData.renderMode);
   }
   
-  // 7. Devolver la información del documento creado
+  // 7. Guardar el PDF junto al documento para no volver a convertirlo en cada envío
+  let pdf = null;
+  let pdfError = null;
+  if (docData.exportPdf) {
+    try {
+      pdf = savePdfForDocument(newDocFile.getId(), docData.folderId, finalFileName);
+    } catch (error) {
+      logError('No se pudo guardar el PDF del documento:', error);
+      pdfError = error.message;
+    }
+  }
+
+  // 8. Devolver la información del documento creado
   return {
     success: true,
     templateId: docData.templateId,
@@ -303,10 +537,43 @@ function generateDocumentFromTemplate(docData) {
     documentId: newDocFile.getId(),
     documentUrl: newDocFile.getUrl(),
     folderId: docData.folderId || null,
-    fieldsReplaced: docData.fields ? Object.keys(docData.fields).length : 0
+    fieldsReplaced: docData.fields ? Object.keys(docData.fields).length : 0,
+    renderMode: render ? render.mode : null,
+    renderMs: render ? render.ms : null,
+    // Siempre presente para que processSubmission pueda referenciarlo aunque falle
+    pdfFileId: pdf ? pdf.pdfFileId : null,
+    pdfUrl: pdf ? pdf.pdfUrl : null,
+    pdfError: pdfError
   };
 }
 
+/**
+ * Completa el documento generado. Por defecto arma todos los reemplazos y la tabla
+ * del equipo en un único Docs.Documents.batchUpdate; con renderMode 'documentApp',
+ * o si el servicio avanzado Docs no está habilitado, recorre el documento con DocumentApp.
+ * @returns {Object} - Modo usado y milisegundos que tomó.
+ */
+function fillDocument(documentId, fields, signatureData, equipoData, renderMode) {
+  const start = Date.now();
+  let mode = 'documentApp';
+
+  if (renderMode !== 'documentApp' && typeof Docs !== 'undefined') {
+    try {
+      replaceFieldsWithBatchUpdate(documentId, fields, signatureData, equipoData);
+      mode = 'batchUpdate';
+    } catch (error) {
+      // batchUpdate es atómico: si falló, el documento quedó sin cambios
+      logWarn('batchUpdate falló, se usa DocumentApp:', error.message);
+    }
+  }
+
+  if (mode === 'documentApp') {
+    replaceFieldsInDocument(documentId, fields, signatureData, equipoData);
+  }
+
+  return { mode: mode, ms: Date.now() - start };
+}
+
 /**
  * Reemplaza campos en un documento de Google Docs con soporte para inserción de imágenes de firma y tablas de equipo
  * @param {string} documentId - ID del documento.
@@ -342,6 +609,12 @@ function replaceFieldsInDocument(documentId, fields, signatureData, equipoData)
       }
     };
 
+    // Insertar tabla de equipo si existe. Va antes de los reemplazos de texto para que
+    // el campo EQUIPO solo se use cuando no se pudo insertar la tabla.
+    if (equipoData && equipoData.length > 0) {
+      insertTeamTableInDocument(doc, equipoData);
+    }
+
     // Procesar todos los párrafos y tablas
     body.getParagraphs().forEach(processElement);
     body.getTables().forEach(table => {
@@ -352,21 +625,16 @@ function replaceFieldsInDocument(documentId, fields, signatureData, equipoData)
       }
     });
 
-    // Insertar tabla de equipo si existe
-    if (equipoData && equipoData.length > 0) {
-      insertTeamTableInDocument(doc, equipoData);
-    }
-
     // Insertar imagen de firma si existe
     if (signatureData && signatureData.startsWith('data:image/')) {
       insertSignatureInDocument(doc, signatureData);
     }
 
     doc.saveAndClose();
-    console.log('Reemplazo de campos completado para el documento ID: ' + documentId);
+    logInfo('Reemplazo de campos completado para el documento ID: ' + documentId);
 
   } catch (error) {
-    console.error('Error al reemplazar campos en documento:', error);
+    logError('Error al reemplazar campos en documento:', error);
     throw new Error('Error al procesar reemplazos en el documento: ' + error.message);
   }
 }
@@ -378,13 +646,13 @@ function replaceFieldsInDocument(documentId, fields, signatureData, equipoData)
  */
 function insertTeamTableInDocument(doc, equipoData) {
   try {
-    console.log('Insertando tabla de equipo en el documento');
-    console.log('Datos del equipo recibidos:', equipoData);
+    logInfo('Insertando tabla de equipo en el documento');
+    logInfo('Datos del equipo recibidos:', equipoData);
     
     const body = doc.getBody();
     const searchResult = body.findText('[[EQUIPO]]');
     
-    console.log('Resultado de búsqueda del placeholder [[EQUIPO]]:', searchResult);
+    logInfo('Resultado de búsqueda del placeholder [[EQUIPO]]:', searchResult);
     
     if (searchResult) {
       // Obtener el elemento que contiene el placeholder
@@ -424,16 +692,16 @@ function insertTeamTableInDocument(doc, equipoData) {
       // Eliminar el párrafo original que contenía el placeholder
       paragraph.removeFromParent();
       
-      console.log('Tabla de equipo insertada exitosamente');
+      logInfo('Tabla de equipo insertada exitosamente');
       return true;
       
     } else {
-      console.log('No se encontró el placeholder [[EQUIPO]] en el documento');
+      logInfo('No se encontró el placeholder [[EQUIPO]] en el documento');
       return false;
     }
     
   } catch (error) {
-    console.error('Error insertando tabla de equipo:', error);
+    logError('Error insertando tabla de equipo:', error);
     return false;
   }
 }
@@ -484,11 +752,199 @@ function formatTeamTable(table) {
     table.setBorderWidth(1);
     table.setBorderColor('#000000');
     
-    console.log('Formato aplicado a la tabla de equipo');
+    logInfo('Formato aplicado a la tabla de equipo');
     
   } catch (error) {
-    console.error('Error aplicando formato a la tabla:', error);
+    logError('Error aplicando formato a la tabla:', error);
+  }
+}
+
+// Formato de la tabla del equipo (el mismo que aplica formatTeamTable)
+const TEAM_TABLE_HEADERS = ['Apellido y Nombre', 'DNI', 'Correo Electrónico', 'Claustro'];
+const TEAM_TABLE_HEADER_COLOR = '#4472C4';
+const TEAM_TABLE_STRIPE_COLOR = '#F2F2F2';
+
+/**
+ * Reemplaza campos e inserta la tabla del equipo con una sola llamada a
+ * Docs.Documents.batchUpdate (requiere el servicio avanzado Docs).
+ *
+ * Las solicitudes se aplican en orden dentro del batch: primero la tabla, con los
+ * índices leídos del documento original, y al final los replaceAllText, que no
+ * dependen de índices. Las celdas se completan de la última a la primera para que
+ * cada inserción no desplace a las pendientes.
+ * @param {string} documentId - ID del documento.
+ * @param {Object} fields - Objeto con los campos a reemplazar.
+ * @param {string} signatureData - Datos de firma en base64 (opcional).
+ * @param {Array} equipoData - Datos del equipo (opcional).
+ */
+function replaceFieldsWithBatchUpdate(documentId, fields, signatureData, equipoData) {
+  const requests = [];
+
+  if (equipoData && equipoData.length > 0) {
+    const placeholder = findPlaceholderRange(documentId, '[[EQUIPO]]');
+    if (placeholder) {
+      requests.push.apply(requests, buildTeamTableRequests(placeholder, equipoData));
+    } else {
+      logInfo('No se encontró el placeholder [[EQUIPO]] en el cuerpo del documento');
+    }
+  }
+
+  // Si la tabla se insertó, el replaceAllText de EQUIPO ya no encuentra el placeholder
+  for (const [key, value] of Object.entries(fields)) {
+    requests.push({
+      replaceAllText: {
+        containsText: { text: `[[${key}]]`, matchCase: true },
+        replaceText: String(value || '')
+      }
+    });
+  }
+
+  if (requests.length > 0) {
+    Docs.Documents.batchUpdate({ requests: requests }, documentId);
+  }
+
+  // La API de Docs solo inserta imágenes desde una URL pública; la firma va por DocumentApp
+  if (signatureData && signatureData.startsWith('data:image/')) {
+    const doc = DocumentApp.openById(documentId);
+    insertSignatureInDocument(doc, signatureData);
+    doc.saveAndClose();
+  }
+
+  logInfo('Reemplazo de campos (batchUpdate) completado para el documento ID: ' + documentId +
+              ' (' + requests.length + ' solicitudes)');
+}
+
+/**
+ * Busca un placeholder en los párrafos del cuerpo (fuera de tablas).
+ * @returns {Object|null} - {startIndex, endIndex} en índices de la API de Docs.
+ */
+function findPlaceholderRange(documentId, placeholder) {
+  const document = Docs.Documents.get(documentId, {
+    fields: 'body(content(paragraph(elements(startIndex,endIndex,textRun(content)))))'
+  });
+
+  for (const element of document.body.content || []) {
+    if (!element.paragraph || !element.paragraph.elements || element.paragraph.elements.length === 0) {
+      continue;
+    }
+    // Texto del párrafo con un carácter de relleno por cada elemento que no es texto,
+    // para que la posición en el texto coincida con el índice del documento
+    const parts = element.paragraph.elements;
+    const text = parts.map(part => part.textRun
+      ? part.textRun.content
+      : '￼'.repeat(part.endIndex - part.startIndex)).join('');
+    const offset = text.indexOf(placeholder);
+    if (offset >= 0) {
+      const startIndex = parts[0].startIndex + offset;
+      return { startIndex: startIndex, endIndex: startIndex + placeholder.length };
+    }
+  }
+  return null;
+}
+
+/**
+ * Solicitudes que reemplazan el placeholder por la tabla del equipo ya formateada.
+ * @param {Object} placeholder - Rango del placeholder devuelto por findPlaceholderRange.
+ * @param {Array} equipoData - Datos del equipo.
+ * @returns {Array} - Solicitudes de batchUpdate.
+ */
+function buildTeamTableRequests(placeholder, equipoData) {
+  const rows = [TEAM_TABLE_HEADERS].concat(equipoData.map(miembro => [
+    miembro.apellido_nombre || '',
+    miembro.dni || '',
+    miembro.correo || '',
+    miembro.claustro || ''
+  ]));
+  const columns = TEAM_TABLE_HEADERS.length;
+
+  // insertTable agrega un salto de línea antes de la tabla: la tabla empieza en index + 1
+  const insertIndex = placeholder.startIndex;
+  const tableStart = insertIndex + 1;
+
+  const requests = [
+    { deleteContentRange: { range: { startIndex: placeholder.startIndex, endIndex: placeholder.endIndex } } },
+    { insertTable: { rows: rows.length, columns: columns, location: { index: insertIndex } } }
+  ];
+
+  // Estilo de celdas: bordes en toda la tabla, encabezado azul y filas pares en gris
+  const border = {
+    color: { color: { rgbColor: hexToRgbColor('#000000') } },
+    width: { magnitude: 1, unit: 'PT' },
+    dashStyle: 'SOLID'
+  };
+  requests.push(tableCellStyleRequest(tableStart, null, {
+    borderTop: border, borderBottom: border, borderLeft: border, borderRight: border,
+    paddingTop: points(6), paddingBottom: points(6), paddingLeft: points(8), paddingRight: points(8)
+  }));
+  requests.push(tableCellStyleRequest(tableStart, { row: 0, rowSpan: 1, columnSpan: columns }, {
+    backgroundColor: { color: { rgbColor: hexToRgbColor(TEAM_TABLE_HEADER_COLOR) } },
+    paddingTop: points(8), paddingBottom: points(8)
+  }));
+  for (let r = 2; r < rows.length; r += 2) {
+    requests.push(tableCellStyleRequest(tableStart, { row: r, rowSpan: 1, columnSpan: columns }, {
+      backgroundColor: { color: { rgbColor: hexToRgbColor(TEAM_TABLE_STRIPE_COLOR) } }
+    }));
+  }
+
+  // Contenido de las celdas, de la última a la primera. En una tabla recién creada
+  // cada celda ocupa 2 índices (inicio de celda y párrafo vacío) y cada fila 1 más.
+  for (let r = rows.length - 1; r >= 0; r--) {
+    for (let c = columns - 1; c >= 0; c--) {
+      const text = String(rows[r][c]);
+      if (!text) {
+        continue;
+      }
+      const index = tableStart + 3 + r * (2 * columns + 1) + 2 * c;
+      requests.push({ insertText: { location: { index: index }, text: text } });
+      if (r === 0) {
+        requests.push({
+          updateTextStyle: {
+            range: { startIndex: index, endIndex: index + text.length },
+            textStyle: { bold: true, foregroundColor: { color: { rgbColor: hexToRgbColor('#FFFFFF') } } },
+            fields: 'bold,foregroundColor'
+          }
+        });
+      }
+    }
+  }
+
+  return requests;
+}
+
+/**
+ * Solicitud updateTableCellStyle; sin rango se aplica a toda la tabla.
+ */
+function tableCellStyleRequest(tableStart, range, style) {
+  const request = {
+    tableCellStyle: style,
+    fields: Object.keys(style).join(',')
+  };
+  if (range) {
+    request.tableRange = {
+      tableCellLocation: { tableStartLocation: { index: tableStart }, rowIndex: range.row, columnIndex: 0 },
+      rowSpan: range.rowSpan,
+      columnSpan: range.columnSpan
+    };
+  } else {
+    request.tableStartLocation = { index: tableStart };
   }
+  return { updateTableCellStyle: request };
+}
+
+function points(magnitude) {
+  return { magnitude: magnitude, unit: 'PT' };
+}
+
+/**
+ * Convierte '#RRGGBB' al formato rgbColor de la API de Docs (componentes entre 0 y 1).
+ */
+function hexToRgbColor(hex) {
+  const value = parseInt(hex.replace('#', ''), 16);
+  return {
+    red: ((value >> 16) & 255) / 255,
+    green: ((value >> 8) & 255) / 255,
+    blue: (value & 255) / 255
+  };
 }
 
 /**
@@ -498,13 +954,13 @@ function formatTeamTable(table) {
  */
 function insertSignatureInDocument(doc, signatureData) {
   try {
-    console.log('Insertando imagen de firma en el documento');
+    logInfo('Insertando imagen de firma en el documento');
     
     // Buscar el placeholder de firma en todo el documento
     const body = doc.getBody();
     const searchResult = body.findText('[[CUADRO_FIRMA]]');
     
-    console.log('Resultado de búsqueda del placeholder [[CUADRO_FIRMA]]:', searchResult);
+    logInfo('Resultado de búsqueda del placeholder [[CUADRO_FIRMA]]:', searchResult);
     
     if (searchResult) {
       // Extraer los datos base64 de la imagen
@@ -541,16 +997,16 @@ function insertSignatureInDocument(doc, signatureData) {
       // Agregar texto descriptivo después de la imagen
       paragraph.asParagraph().appendText('\nFirma del Docente Responsable');
       
-      console.log('Imagen de firma insertada exitosamente');
+      logInfo('Imagen de firma insertada exitosamente');
       return true;
       
     } else {
-      console.log('No se encontró el placeholder [[CUADRO_FIRMA]] en el documento');
+      logInfo('No se encontró el placeholder [[CUADRO_FIRMA]] en el documento');
       return false;
     }
     
   } catch (error) {
-    console.error('Error insertando imagen de firma:', error);
+    logError('Error insertando imagen de firma:', error);
     return false;
   }
 }
@@ -588,49 +1044,13 @@ function handleSendEmail(data) {
     // 3. Procesar la lista unificada de archivos adjuntos (esta parte ya funciona)
     if (data.attachments && Array.isArray(data.attachments)) {
       for (const attachmentConfig of data.attachments) {
-        if (!attachmentConfig.fileId) { /* ... */ continue; }
+        if (!attachmentConfig.fileId && !attachmentConfig.content) { /* ... */ continue; }
         try {
-          // ... (La lógica de UrlFetchApp que ya solucionamos no cambia)
-          const file = DriveApp.getFileById(attachmentConfig.fileId);
-          let finalBlob;
-          let finalName = file.getName();
-          let conversionType = 'original';
-
-          if (attachmentConfig.convertTo) {
-            let mimeType, extension;
-            if (attachmentConfig.convertTo.toLowerCase() === 'word') {
-              mimeType = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document';
-              extension = '.docx';
-              conversionType = 'word';
-            } else if (attachmentConfig.convertTo.toLowerCase() === 'pdf') {
-              mimeType = 'application/pdf';
-              extension = '.pdf';
-            }
-            if (mimeType) {
-              const url = `https://www.googleapis.com/drive/v3/files/${attachmentConfig.fileId}/export?mimeType=${mimeType}`;
-              const token = ScriptApp.getOAuthToken();
-              const response = UrlFetchApp.fetch(url, {
-                headers: { 'Authorization': 'Bearer ' + token },
-                muteHttpExceptions: true
-              });
-              if (response.getResponseCode() !== 200) {
-                throw new Error(`La API de exportación devolvió un error: ${response.getContentText()}`);
-              }
-              finalBlob = response.getBlob();
-              if (!finalName.toLowerCase().endsWith(extension)) {
-                finalName += extension;
-              }
-            }
-          }
-
-          if (!finalBlob) finalBlob = file.getBlob();
-          finalBlob.setName(finalName);
-          mailOptions.attachments.push(finalBlob);
-          processedFiles.push({ id: attachmentConfig.fileId, name: finalName, conversion: conversionType });
-
+          const resolved = resolveAttachment(attachmentConfig);
+          mailOptions.attachments.push(resolved.blob);
+          processedFiles.push(resolved.info);
         } catch (e) {
-          const errorMessage = 'Fallo al procesar adjunto. Error: ' + e.message;
-          failedFiles.push({ id: attachmentConfig.fileId, error: errorMessage, requestedConversion: attachmentConfig.convertTo || 'original' });
+          failedFiles.push({ id: attachmentConfig.fileId || null, error: e.message, requestedConversion: attachmentRequestedConversion(attachmentConfig) });
         }
       }
     }
@@ -647,11 +1067,244 @@ function handleSendEmail(data) {
     return createResponse(true, 'Correo enviado exitosamente.', { processedFiles });
 
   } catch (error) {
-    console.error('Error fatal en handleSendEmail:', error);
+    logError('Error fatal en handleSendEmail:', error);
     return createResponse(false, 'Error al enviar el correo: ' + error.message, null);
   }
 }
 
+/**
+ * Obtiene el blob de un adjunto de sendEmail/sendDigest: un archivo de Drive
+ * (opcionalmente convertido a Word o PDF) o contenido en Base64 enviado por el cliente.
+ * @param {Object} attachmentConfig - { fileId, convertTo } o { content, fileName, mimeType }.
+ * @returns {Object} - { blob, info } con el blob listo para adjuntar y su descripción.
+ * @throws {Error} - Si el adjunto no se puede obtener.
+ */
+function resolveAttachment(attachmentConfig) {
+  // Adjunto generado por el cliente (ej. PDF renderizado localmente) enviado en Base64
+  if (!attachmentConfig.fileId && attachmentConfig.content) {
+    try {
+      const inlineName = attachmentConfig.fileName || 'adjunto.pdf';
+      const inlineBlob = Utilities.newBlob(
+        Utilities.base64Decode(attachmentConfig.content),
+        attachmentConfig.mimeType || 'application/pdf',
+        inlineName
+      );
+      return { blob: inlineBlob, info: { id: null, name: inlineName, conversion: 'inline' } };
+    } catch (e) {
+      throw new Error('Fallo al decodificar adjunto en línea. Error: ' + e.message);
+    }
+  }
+
+  // PDF ya guardado en Drive: se adjunta tal cual. Si se borró, se convierte fileId.
+  if (attachmentConfig.storedFileId) {
+    try {
+      const storedBlob = DriveApp.getFileById(attachmentConfig.storedFileId).getBlob();
+      return {
+        blob: storedBlob,
+        info: { id: attachmentConfig.storedFileId, name: storedBlob.getName(), conversion: 'stored' }
+      };
+    } catch (e) {
+      logWarn('Archivo guardado no disponible, se convierte el original:', e.message);
+    }
+  }
+
+  try {
+    const file = DriveApp.getFileById(attachmentConfig.fileId);
+    let finalBlob;
+    let finalName = file.getName();
+    let conversionType = 'original';
+
+    if (attachmentConfig.convertTo) {
+      let mimeType, extension;
+      if (attachmentConfig.convertTo.toLowerCase() === 'word') {
+        mimeType = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document';
+        extension = '.docx';
+        conversionType = 'word';
+      } else if (attachmentConfig.convertTo.toLowerCase() === 'pdf') {
+        mimeType = 'application/pdf';
+        extension = '.pdf';
+      }
+      if (mimeType) {
+        finalBlob = exportFileAs(attachmentConfig.fileId, mimeType);
+        if (!finalName.toLowerCase().endsWith(extension)) {
+          finalName += extension;
+        }
+      }
+    }
+
+    if (!finalBlob) finalBlob = file.getBlob();
+    finalBlob.setName(finalName);
+    return { blob: finalBlob, info: { id: attachmentConfig.fileId, name: finalName, conversion: conversionType } };
+
+  } catch (e) {
+    throw new Error('Fallo al procesar adjunto. Error: ' + e.message);
+  }
+}
+
+/**
+ * Exporta un archivo de Google Docs al formato indicado con la API de Drive.
+ * @param {string} fileId - ID del documento.
+ * @param {string} mimeType - Tipo MIME de destino (ej. 'application/pdf').
+ * @returns {Blob} - Contenido exportado.
+ */
+function exportFileAs(fileId, mimeType) {
+  const url = `https://www.googleapis.com/drive/v3/files/${fileId}/export?mimeType=${mimeType}`;
+  const token = ScriptApp.getOAuthToken();
+  const response = UrlFetchApp.fetch(url, {
+    headers: { 'Authorization': 'Bearer ' + token },
+    muteHttpExceptions: true
+  });
+  if (response.getResponseCode() !== 200) {
+    throw new Error(`La API de exportación devolvió un error: ${response.getContentText()}`);
+  }
+  return response.getBlob();
+}
+
+/**
+ * Exporta el documento a PDF y lo guarda en la carpeta indicada
+ * (por defecto, la carpeta del documento).
+ * @param {string} documentId - ID del documento de Google Docs.
+ * @param {string} folderId - Carpeta de destino (opcional).
+ * @param {string} fileName - Nombre base del PDF (opcional; se usa el del documento).
+ * @returns {Object} - { pdfFileId, pdfFileName, pdfUrl, size }.
+ */
+function savePdfForDocument(documentId, folderId, fileName) {
+  const docFile = DriveApp.getFileById(documentId);
+  let folder = null;
+  if (folderId) {
+    folder = DriveApp.getFolderById(folderId);
+  } else {
+    const parents = docFile.getParents();
+    folder = parents.hasNext() ? parents.next() : null;
+  }
+
+  const pdfName = (fileName || docFile.getName()).replace(/\.docx?$/i, '') + '.pdf';
+  const blob = exportFileAs(documentId, 'application/pdf').setName(pdfName);
+  const pdfFile = folder ? folder.createFile(blob) : DriveApp.createFile(blob);
+
+  return {
+    pdfFileId: pdfFile.getId(),
+    pdfFileName: pdfName,
+    pdfUrl: pdfFile.getUrl(),
+    size: pdfFile.getSize()
+  };
+}
+
+/**
+ * Guarda en Drive el PDF de documentos ya generados (formularios anteriores a
+ * exportPdf en generateDocuments).
+ * @param {Object} data - { documents: [{ documentId, folderId, fileName }] }.
+ * @returns {ContentService} - Respuesta JSON con el resultado de cada documento.
+ */
+function handleExportPdf(data) {
+  try {
+    if (!data.documents || !Array.isArray(data.documents) || data.documents.length === 0) {
+      return createResponse(false, 'Lista de documentos no proporcionada o vacía', null);
+    }
+
+    const results = data.documents.map(docData => {
+      try {
+        const pdf = savePdfForDocument(docData.documentId, docData.folderId, docData.fileName);
+        return Object.assign({ success: true, documentId: docData.documentId }, pdf);
+      } catch (error) {
+        logError('Error al exportar PDF de ' + docData.documentId + ':', error);
+        return { success: false, documentId: docData.documentId, error: error.message };
+      }
+    });
+
+    return createResponse(true, 'Exportación de PDF completada', {
+      totalRequested: results.length,
+      totalSuccess: results.filter(r => r.success).length,
+      totalErrors: results.filter(r => !r.success).length,
+      documents: results
+    });
+
+  } catch (error) {
+    logError('Error en handleExportPdf:', error);
+    return createResponse(false, 'Error al exportar PDF: ' + error.message, null);
+  }
+}
+
+/**
+ * Conversión pedida para un adjunto (se informa en los errores).
+ */
+function attachmentRequestedConversion(attachmentConfig) {
+  if (!attachmentConfig.fileId && attachmentConfig.content) return 'inline';
+  if (attachmentConfig.storedFileId) return 'stored';
+  return attachmentConfig.convertTo || 'original';
+}
+
+// Límite práctico del tamaño total de adjuntos de un email de Gmail (25 MB con margen)
+const DIGEST_MAX_ATTACHMENT_BYTES = 20 * 1024 * 1024;
+
+/**
+ * Envía un único email de resumen con varios formularios y sus adjuntos.
+ * Cada item aporta una fila HTML (rowHtml) y sus adjuntos; solo se incluyen en el
+ * email los items cuyos adjuntos se obtuvieron todos. Los items que no entran por
+ * el límite de tamaño se devuelven como postergados para un próximo resumen.
+ * @param {Object} data - { to, subject, senderName, htmlHeader, htmlFooter, items: [{ id, rowHtml, attachments }] }.
+ * @returns {ContentService} - Respuesta JSON con sentItems, deferredItems y failedItems (ids de los items).
+ */
+function handleSendDigest(data) {
+  try {
+    if (!data.to) return createResponse(false, 'El destinatario (to) es obligatorio.', null);
+    if (!data.subject) return createResponse(false, 'El asunto (subject) es obligatorio.', null);
+    if (!data.items || !Array.isArray(data.items) || data.items.length === 0) {
+      return createResponse(false, 'Lista de items no proporcionada o vacía', null);
+    }
+
+    const blobs = [];
+    const rows = [];
+    const sentItems = [];
+    const deferredItems = [];
+    const failedItems = [];
+    let totalBytes = 0;
+
+    for (const item of data.items) {
+      if (totalBytes >= DIGEST_MAX_ATTACHMENT_BYTES) {
+        deferredItems.push(item.id);
+        continue;
+      }
+      try {
+        const itemBlobs = (item.attachments || []).map(config => resolveAttachment(config).blob);
+        const itemBytes = itemBlobs.reduce((total, blob) => total + blob.getBytes().length, 0);
+        if (sentItems.length > 0 && totalBytes + itemBytes > DIGEST_MAX_ATTACHMENT_BYTES) {
+          deferredItems.push(item.id);
+          continue;
+        }
+        totalBytes += itemBytes;
+        itemBlobs.forEach(blob => blobs.push(blob));
+        rows.push(item.rowHtml || '');
+        sentItems.push(item.id);
+      } catch (e) {
+        failedItems.push({ id: item.id, error: e.message });
+      }
+    }
+
+    if (sentItems.length === 0) {
+      return createResponse(false, 'Ningún item del resumen pudo incluirse. El correo NO fue enviado.',
+        { sentItems, deferredItems, failedItems });
+    }
+
+    const htmlBody = (data.htmlHeader || '') + rows.join('') + (data.htmlFooter || '');
+    const mailOptions = { htmlBody: htmlBody, attachments: blobs };
+    if (data.senderName) mailOptions.name = data.senderName;
+    if (data.replyTo) mailOptions.replyTo = data.replyTo;
+    if (data.cc) mailOptions.cc = data.cc;
+    if (data.bcc) mailOptions.bcc = data.bcc;
+
+    const plainTextBody = data.plainTextBody || htmlBody.replace(/<[^>]*>/g, "");
+    GmailApp.sendEmail(data.to, data.subject, plainTextBody, mailOptions);
+
+    return createResponse(true, `Resumen enviado con ${sentItems.length} items.`,
+      { sentItems, deferredItems, failedItems, totalBytes });
+
+  } catch (error) {
+    logError('Error fatal en handleSendDigest:', error);
+    return createResponse(false, 'Error al enviar el resumen: ' + error.message, null);
+  }
+}
+
 /**
  * Reemplaza placeholders en una cadena de texto.
  * @param {string} text - El texto que contiene placeholders, ej. "Contrato para [[NOMBRE_CLIENTE]]".
@@ -730,7 +1383,7 @@ function handleFileUpload(data) {
 
       } catch (error) {
         // Capturar errores para un archivo individual sin detener el proceso
-        console.error('Error al subir el archivo ' + (fileData.fileName || '') + ':', error);
+        logError('Error al subir el archivo ' + (fileData.fileName || '') + ':', error);
         uploadResults.push({
           success: false,
           fileName: fileData.fileName || 'Nombre no especificado',
@@ -748,7 +1401,7 @@ function handleFileUpload(data) {
     });
 
   } catch (error) {
-    console.error('Error en handleFileUpload:', error);
+    logError('Error en handleFileUpload:', error);
     return createResponse(false, 'Error al procesar la subida de archivos: ' + error.message, null);
   }
 }
@@ -756,3 +1409,261 @@ function handleFileUpload(data) {
 
 
 
+
+/**
+ * Compara la generación de documentos con batchUpdate y con DocumentApp.
+ * Ejecutar desde el editor de Apps Script; el resultado queda en el registro.
+ * Los documentos de prueba se envían a la papelera al terminar.
+ * @param {string} templateId - ID de la plantilla (debe contener [[EQUIPO]]).
+ * @param {number} teamSize - Cantidad de miembros del equipo (por defecto 50).
+ * @param {number} repetitions - Documentos por modo (por defecto 3).
+ */
+function benchmarkDocumentGeneration(templateId, teamSize, repetitions) {
+  teamSize = teamSize || 50;
+  repetitions = repetitions || 3;
+
+  const equipoData = [];
+  for (let i = 0; i < teamSize; i++) {
+    equipoData.push({
+      apellido_nombre: 'Miembro ' + (i + 1) + ', Nombre',
+      dni: String(30000000 + i),
+      correo: 'miembro' + (i + 1) + '@uncoma.edu.ar',
+      claustro: i % 3 === 0 ? 'Estudiante' : 'Docente'
+    });
+  }
+  const fields = {
+    TITULO_ACTIVIDAD: 'Actividad de prueba',
+    DOCENTE_RESPONSABLE: 'Docente de prueba',
+    EMAIL_RESPONSABLE: 'docente@uncoma.edu.ar',
+    DNI_RESPONSABLE: '20000000',
+    DEPARTAMENTO: 'Departamento de prueba',
+    EQUIPO: 'No especificado',
+    FUNDAMENTACION: 'Fundamentación de la actividad. '.repeat(40),
+    OBJETIVOS: 'Objetivos de la actividad. '.repeat(20),
+    METODOLOGIA: 'Metodología de trabajo. '.repeat(30),
+    GRADOS: '5to Grado, 6to Grado',
+    MATERIALES_PRESUPUESTO: 'Lupas, microscopios. '.repeat(10),
+    PERIODOS: '2025: Marzo, Abril',
+    FECHA_GENERACION: Utilities.formatDate(new Date(), 'GMT-3', 'dd/MM/yyyy'),
+    'AÑO_CONVOCATORIA': String(new Date().getFullYear()),
+    CUADRO_FIRMA: 'Sin firma'
+  };
+
+  const results = {};
+  for (const mode of ['documentApp', 'batchUpdate']) {
+    const times = [];
+    for (let i = 0; i < repetitions; i++) {
+      const doc = generateDocumentFromTemplate({
+        templateId: templateId,
+        fileName: 'benchmark-' + mode + '-' + i,
+        fields: fields,
+        equipoData: equipoData,
+        renderMode: mode
+      });
+      if (doc.renderMode !== mode) {
+        logWarn('Se pidió ' + mode + ' pero se usó ' + doc.renderMode);
+      }
+      times.push(doc.renderMs);
+      DriveApp.getFileById(doc.documentId).setTrashed(true);
+    }
+    times.sort((a, b) => a - b);
+    results[mode] = { ms: times, median: times[Math.floor(times.length / 2)] };
+  }
+
+  logInfo('Equipo de ' + teamSize + ' miembros: ' + JSON.stringify(results));
+  return results;
+}
+
+// Subidas por partes: Drive exige partes múltiplo de 256 KB (salvo la última)
+const UPLOAD_CHUNK_GRANULARITY = 256 * 1024;
+// Las sesiones se guardan en la caché del script, cuyo máximo es 6 horas
+const UPLOAD_SESSION_TTL = 21600;
+
+/**
+ * Inicia una subida por partes. Crea una sesión de subida reanudable de la API de
+ * Drive; las partes se envían luego con uploadChunk y Drive arma el archivo, por lo
+ * que Apps Script nunca tiene en memoria más que una parte.
+ * @param {Object} data - { fileName, mimeType, size, folderId }.
+ * @returns {ContentService} - Respuesta JSON con uploadId.
+ */
+function handleStartUpload(data) {
+  try {
+    if (!data.fileName) throw new Error('El campo "fileName" es obligatorio.');
+    if (!data.mimeType) throw new Error('El campo "mimeType" es obligatorio.');
+    if (!(data.size > 0)) throw new Error('El campo "size" debe ser mayor que cero.');
+
+    const metadata = { name: data.fileName, mimeType: data.mimeType };
+    if (data.folderId) {
+      try {
+        DriveApp.getFolderById(data.folderId);
+      } catch (e) {
+        throw new Error('La carpeta de destino con ID "' + data.folderId + '" no fue encontrada.');
+      }
+      metadata.parents = [data.folderId];
+    }
+
+    const response = UrlFetchApp.fetch(
+      'https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable&fields=id,name,webViewLink,size',
+      {
+        method: 'post',
+        contentType: 'application/json; charset=UTF-8',
+        headers: {
+          'Authorization': 'Bearer ' + ScriptApp.getOAuthToken(),
+          'X-Upload-Content-Type': data.mimeType,
+          'X-Upload-Content-Length': String(data.size)
+        },
+        payload: JSON.stringify(metadata),
+        muteHttpExceptions: true
+      }
+    );
+    const headers = response.getHeaders();
+    const sessionUri = headers['Location'] || headers['location'];
+    if (response.getResponseCode() !== 200 || !sessionUri) {
+      throw new Error('La API de Drive no inició la subida: ' + response.getContentText());
+    }
+
+    const uploadId = Utilities.getUuid();
+    CacheService.getScriptCache().put('upload:' + uploadId, JSON.stringify({
+      sessionUri: sessionUri,
+      size: data.size,
+      mimeType: data.mimeType
+    }), UPLOAD_SESSION_TTL);
+
+    return createResponse(true, 'Subida iniciada', {
+      uploadId: uploadId,
+      size: data.size,
+      received: 0,
+      completed: false,
+      chunkGranularity: UPLOAD_CHUNK_GRANULARITY
+    });
+
+  } catch (error) {
+    logError('Error en handleStartUpload:', error);
+    return createResponse(false, 'Error al iniciar la subida: ' + error.message, null);
+  }
+}
+
+/**
+ * Recibe una parte de una subida iniciada con startUpload.
+ * @param {Object} data - { uploadId, offset, content } con content en Base64.
+ * @returns {ContentService} - Respuesta JSON con los bytes recibidos por Drive o el archivo creado.
+ */
+function handleUploadChunk(data) {
+  try {
+    const session = getUploadSession(data.uploadId);
+    if (!session) {
+      return createResponse(false, 'Sesión de subida inexistente o vencida', { uploadId: data.uploadId, expired: true });
+    }
+    if (session.file) {
+      // Reintento de la última parte cuya respuesta se perdió: el archivo ya existe
+      return completedUploadResponse(data.uploadId, session);
+    }
+    if (typeof data.offset !== 'number' || !data.content) {
+      throw new Error('Los campos "offset" y "content" son obligatorios.');
+    }
+
+    const bytes = Utilities.base64Decode(data.content);
+    const end = data.offset + bytes.length - 1;
+    if (end >= session.size) {
+      throw new Error('La parte excede el tamaño declarado del archivo.');
+    }
+    if (end + 1 < session.size && bytes.length % UPLOAD_CHUNK_GRANULARITY !== 0) {
+      throw new Error('Las partes intermedias deben ser múltiplo de ' + UPLOAD_CHUNK_GRANULARITY + ' bytes.');
+    }
+
+    const response = UrlFetchApp.fetch(session.sessionUri, {
+      method: 'put',
+      contentType: session.mimeType,
+      headers: { 'Content-Range': 'bytes ' + data.offset + '-' + end + '/' + session.size },
+      payload: bytes,
+      muteHttpExceptions: true
+    });
+    return uploadProgressResponse(data.uploadId, session, response);
+
+  } catch (error) {
+    logError('Error en handleUploadChunk:', error);
+    return createResponse(false, 'Error al subir la parte: ' + error.message, null);
+  }
+}
+
+/**
+ * Consulta cuántos bytes de una subida recibió Drive (para retomarla tras un corte).
+ * Si la subida ya terminó devuelve el archivo creado hasta que venza la sesión.
+ * @param {Object} data - { uploadId }.
+ * @returns {ContentService} - Respuesta JSON con el mismo formato que uploadChunk.
+ */
+function handleUploadStatus(data) {
+  try {
+    const session = getUploadSession(data.uploadId);
+    if (!session) {
+      return createResponse(false, 'Sesión de subida inexistente o vencida', { uploadId: data.uploadId, expired: true });
+    }
+    if (session.file) {
+      return completedUploadResponse(data.uploadId, session);
+    }
+
+    const response = UrlFetchApp.fetch(session.sessionUri, {
+      method: 'put',
+      headers: { 'Content-Range': 'bytes */' + session.size },
+      muteHttpExceptions: true
+    });
+    return uploadProgressResponse(data.uploadId, session, response);
+
+  } catch (error) {
+    logError('Error en handleUploadStatus:', error);
+    return createResponse(false, 'Error al consultar la subida: ' + error.message, null);
+  }
+}
+
+function getUploadSession(uploadId) {
+  const cached = uploadId ? CacheService.getScriptCache().get('upload:' + uploadId) : null;
+  return cached ? JSON.parse(cached) : null;
+}
+
+/**
+ * Traduce la respuesta de la sesión de subida de Drive: 308 indica los bytes
+ * recibidos (encabezado Range), 200/201 el archivo terminado y 404/410 una sesión vencida.
+ * La sesión terminada se conserva con el archivo (hasta UPLOAD_SESSION_TTL) para que el
+ * cliente que perdió la respuesta de la última parte lo obtenga con uploadStatus.
+ */
+function uploadProgressResponse(uploadId, session, response) {
+  const code = response.getResponseCode();
+
+  if (code === 308) {
+    const headers = response.getHeaders();
+    const range = headers['Range'] || headers['range'];
+    const received = range ? Number(range.split('-')[1]) + 1 : 0;
+    return createResponse(true, 'Parte recibida', {
+      uploadId: uploadId,
+      size: session.size,
+      received: received,
+      completed: false
+    });
+  }
+
+  if (code === 200 || code === 201) {
+    const file = JSON.parse(response.getContentText());
+    session.file = { id: file.id, name: file.name, webViewLink: file.webViewLink };
+    CacheService.getScriptCache().put('upload:' + uploadId, JSON.stringify(session), UPLOAD_SESSION_TTL);
+    return completedUploadResponse(uploadId, session);
+  }
+
+  if (code === 404 || code === 410) {
+    CacheService.getScriptCache().remove('upload:' + uploadId);
+    return createResponse(false, 'La sesión de subida de Drive venció', { uploadId: uploadId, expired: true });
+  }
+
+  throw new Error('La API de Drive devolvió ' + code + ': ' + response.getContentText());
+}
+
+function completedUploadResponse(uploadId, session) {
+  return createResponse(true, 'Subida completada', {
+    uploadId: uploadId,
+    size: session.size,
+    received: session.size,
+    completed: true,
+    fileId: session.file.id,
+    fileName: session.file.name,
+    fileUrl: session.file.webViewLink
+  });
+}
@@ -1,28 +1,37 @@
-from flask import Flask, request, render_template, jsonify, redirect, url_for, send_from_directory
+from flask import Flask, request, render_template, jsonify, redirect, url_for, send_from_directory, Response, stream_with_context
+from flask.logging import default_handler
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import base64
+import hashlib
+import re
+from sqlalchemy.exc import IntegrityError
 
 # Importar nuestras utilidades
-from models import db, FormularioActividad
-from utils.google_drive import GoogleDriveManager
+from models import db, FormularioActividad, ProcesamientoJob, EquipoMiembro, NotificacionResumen
+from utils.google_drive import GoogleDriveManager, CarpetaNoEncontrada
 from utils.email_sender import EmailSender
-from utils.pdf_generator import PDFGenerator
+from utils.job_queue import JobQueue
+from utils.resumen_email import ResumenEmail
+from utils import sqlite_profile
+from utils import serializacion
+from utils import pdf_pool
+from utils import exportacion
+from utils.rate_limiter import CuotaAgotada, get_limiter
+from utils.servicios import Servicios
+from utils import logs
+from utils import metricas
+from utils import correlacion
+from utils.logs import resumir
+from utils import campos_template
+from utils.salud import Salud
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Debug: Verificar que las variables de entorno se carguen correctamente
-print(f"[DEBUG] Variables de entorno cargadas:")
-print(f"[DEBUG]   GOOGLE_APPS_SCRIPT_URL: {os.getenv('GOOGLE_APPS_SCRIPT_URL')}")
-print(f"[DEBUG]   GOOGLE_APPS_SCRIPT_TOKEN: {os.getenv('GOOGLE_APPS_SCRIPT_TOKEN')[:10] if os.getenv('GOOGLE_APPS_SCRIPT_TOKEN') else 'None'}...")
-print(f"[DEBUG]   GOOGLE_DRIVE_ROOT_FOLDER_ID: {os.getenv('GOOGLE_DRIVE_ROOT_FOLDER_ID')}")
-print(f"[DEBUG]   TEMPLATE_DOC_ID: {os.getenv('TEMPLATE_DOC_ID')}")
-print()
-
 # Crear la aplicación Flask
 app = Flask(__name__)
 
@@ -46,18 +55,65 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Procesamiento en segundo plano (Google Drive + Email) mediante la cola de trabajos
+app.config['PROCESAMIENTO_ASINCRONO'] = os.getenv('PROCESAMIENTO_ASINCRONO', 'True').lower() == 'true'
+
+# Generación del PDF adjunto: 'apps_script' (exportación del Google Doc en handleSendEmail)
+# o 'local' (PDFGenerator en un pool de procesos, con respaldo en la exportación de Apps Script)
+app.config['PDF_RENDER_MODE'] = os.getenv('PDF_RENDER_MODE', 'apps_script')
+
+# Usar la acción compuesta processSubmission de app.gs (una sola petición por formulario)
+app.config['APPS_SCRIPT_BATCH'] = os.getenv('APPS_SCRIPT_BATCH', 'False').lower() == 'true'
+
+# Notificar a la secretaría con emails de resumen periódicos en lugar de un email por formulario
+app.config['EMAIL_RESUMEN'] = os.getenv('EMAIL_RESUMEN', 'False').lower() == 'true'
+
+# Guardar el PDF del documento en su carpeta de Drive al generarlo; los emails y
+# descargas posteriores usan ese archivo en lugar de volver a convertir el documento
+app.config['GUARDAR_PDF_DRIVE'] = os.getenv('GUARDAR_PDF_DRIVE', 'True').lower() == 'true'
+
 # Debug: Mostrar configuración de base de datos
-print(f"[DEBUG] Database URI configurada: {app.config['SQLALCHEMY_DATABASE_URI']}")
+app.logger.debug(f"Database URI configurada: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
 # Configuración para producción con basepath se maneja en wsgi.py
 
+# Perfil de almacenamiento SQLite (WAL, busy_timeout, pool) seleccionable con SQLITE_PROFILE
+app.config['SQLITE_PROFILE'] = sqlite_profile.get_profile_name()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_profile.get_engine_options(
+    app.config['SQLITE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI']
+)
+
 # Inicializar la base de datos
 db.init_app(app)
 
-# Inicializar las utilidades
-google_drive = GoogleDriveManager()
-email_sender = EmailSender()
-pdf_generator = PDFGenerator()
+with app.app_context():
+    sqlite_profile.register(db.engine, app.config['SQLITE_PROFILE'])
+
+# Inicializar las utilidades (se crean en el primer uso, ver utils/servicios.py).
+# PDFGenerator solo se crea en los procesos de utils/pdf_pool.py.
+servicios = Servicios()
+servicios.registrar('google_drive', GoogleDriveManager)
+servicios.registrar('email_sender', EmailSender)
+google_drive = servicios.perezoso('google_drive')
+email_sender = servicios.perezoso('email_sender')
+
+@app.before_request
+def asignar_id_correlacion():
+    """ID de correlación del request: el de X-Correlation-ID / X-Request-ID o uno nuevo.
+    Se agrega a cada log, se envía a Apps Script y se guarda en el formulario."""
+    correlacion.establecer(correlacion.desde_cabeceras(request.headers))
+
+@app.after_request
+def devolver_id_correlacion(response):
+    id_correlacion = correlacion.actual()
+    if id_correlacion:
+        response.headers['X-Correlation-ID'] = id_correlacion
+    return response
+
+@app.teardown_request
+def liberar_id_correlacion(error=None):
+    # El hilo atiende luego otros requests
+    correlacion.establecer(None)
 
 # Crear las tablas al iniciar la aplicación se hará en el main
 
@@ -83,6 +139,7 @@ def favicon():
                              'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 @app.route('/enviar_formulario', methods=['POST'])
+@metricas.medir('enviar_formulario')
 def enviar_formulario():
     """Procesar el envío del formulario"""
     try:
@@ -95,21 +152,67 @@ def enviar_formulario():
                 'success': False,
                 'message': 'Faltan campos obligatorios'
             })
+        try:
+            for miembro in datos_formulario['equipo']:
+                EquipoMiembro.validar(miembro)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            })
         
-        # 3. Guardar en la base de datos
-        formulario = crear_formulario_db(datos_formulario)
-        db.session.add(formulario)
-        db.session.commit()
+        # 3. Evitar envíos duplicados (doble click, reintentos del navegador)
+        clave = obtener_clave_idempotencia(request, datos_formulario)
+        existente = FormularioActividad.query.filter_by(clave_idempotencia=clave).first()
+        if existente is not None and not reclamar_reintento(existente):
+            # Envío repetido: devolver el resultado del original, aunque siga en proceso
+            app.logger.info(f'Envío repetido del formulario {existente.id} (clave {clave})')
+            return redirect(url_for('confirmacion_envio', formulario_id=existente.id))
+        
+        # 4. Guardar en la base de datos (o reutilizar el envío anterior que falló)
+        if existente is not None:
+            # El reintento puede traer correcciones: se guardan en lugar del contenido anterior
+            formulario = existente
+            asignar_datos_formulario(formulario, datos_formulario)
+        else:
+            formulario = crear_formulario_db(datos_formulario)
+            formulario.clave_idempotencia = clave
+            db.session.add(formulario)
+            try:
+                db.session.flush()
+            except IntegrityError:
+                # Otro request con la misma clave se guardó primero
+                db.session.rollback()
+                original = FormularioActividad.query.filter_by(clave_idempotencia=clave).first_or_404()
+                return redirect(url_for('confirmacion_envio', formulario_id=original.id))
+        
+        # El procesamiento en segundo plano usa el ID del último request que lo envió
+        formulario.id_correlacion = correlacion.actual()
+        
+        if app.config['PROCESAMIENTO_ASINCRONO']:
+            # Guardar el formulario y su trabajo en la misma transacción y responder de inmediato
+            job_queue.enqueue(formulario.id)
+            with metricas.medir('guardar_formulario'):
+                db.session.commit()
+            job_queue.notify()
+            return redirect(url_for('confirmacion_envio', formulario_id=formulario.id))
+        
+        with metricas.medir('guardar_formulario'):
+            db.session.commit()
         
-        # 4. Procesar el formulario (Google Drive y Email)
-        resultado_procesamiento = procesar_formulario(formulario, datos_formulario)
+        # 5. Procesar el formulario (Google Drive y Email)
+        try:
+            resultado_procesamiento = procesar_formulario(formulario, datos_formulario)
+        except CuotaAgotada as e:
+            app.logger.warning(f'Formulario {formulario.id} sin procesar: {str(e)}')
+            resultado_procesamiento = {
+                'success': False,
+                'message': 'Se alcanzó el límite de uso de Google Apps Script. Intente nuevamente más tarde.'
+            }
         
         if resultado_procesamiento['success']:
             # Actualizar el estado del formulario
-            formulario.estado = 'procesado'
-            formulario.documento_id = resultado_procesamiento.get('document_id')
-            formulario.carpeta_id = resultado_procesamiento.get('folder_id')
-            db.session.commit()
+            marcar_procesado(formulario, resultado_procesamiento)
             
             # Redirigir a página de confirmación
             return redirect(url_for('confirmacion_envio', formulario_id=formulario.id))
@@ -117,6 +220,7 @@ def enviar_formulario():
             # Marcar como error pero mantener en la base de datos
             formulario.estado = 'error'
             db.session.commit()
+            metricas.incrementar('pilar_formularios_total', estado='error')
             
             return jsonify({
                 'success': False,
@@ -131,22 +235,45 @@ def enviar_formulario():
             'message': f'Error interno del servidor: {str(e)}'
         }), 500
 
+# Campos que identifican el contenido de un envío para derivar la clave de idempotencia
+CAMPOS_CLAVE_IDEMPOTENCIA = (
+    'titulo_actividad', 'docente_responsable', 'email_responsable', 'dni_responsable',
+    'departamento', 'equipo', 'fundamentacion', 'objetivos', 'metodologia', 'grados',
+    'materiales_presupuesto', 'periodos'
+)
+
+def obtener_clave_idempotencia(request, datos):
+    """Clave enviada por el formulario (campo idempotency_key o cabecera Idempotency-Key)
+    o, si no hay una válida, hash del contenido del formulario"""
+    clave = request.form.get('idempotency_key') or request.headers.get('Idempotency-Key', '')
+    clave = clave.strip()
+    if clave and re.fullmatch(r'[A-Za-z0-9_-]{8,64}', clave):
+        return clave
+    
+    contenido = json.dumps(
+        {campo: datos.get(campo) for campo in CAMPOS_CLAVE_IDEMPOTENCIA},
+        sort_keys=True, ensure_ascii=False
+    )
+    return 'sha256:' + hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def reclamar_reintento(formulario):
+    """Si el envío anterior terminó en error, lo vuelve a 'pendiente' para reprocesarlo.
+    El UPDATE condicional garantiza que solo un request concurrente lo reclame."""
+    if formulario.estado != 'error':
+        return False
+    reclamados = FormularioActividad.query.filter_by(id=formulario.id, estado='error').update(
+        {'estado': 'pendiente'}, synchronize_session='fetch'
+    )
+    return reclamados == 1
+
 def extraer_datos_formulario(request):
     """Extrae y organiza los datos del formulario"""
     
-    # Extraer equipo
-    equipo_json = request.form.get('equipo', '[]')
-    try:
-        equipo = json.loads(equipo_json)
-    except:
-        equipo = []
+    # Extraer equipo (lo que no sea un arreglo JSON válido se toma como vacío)
+    equipo = serializacion.cargar_lista(request.form.get('equipo', '[]')) or []
     
     # Extraer períodos (reemplaza fechas_propuestas)
-    periodos_json = request.form.get('periodos', '[]')
-    try:
-        periodos = json.loads(periodos_json)
-    except:
-        periodos = []
+    periodos = serializacion.cargar_lista(request.form.get('periodos', '[]')) or []
     
     # Generar texto legible para el campo 'meses' a partir de los períodos
     meses_texto = generar_texto_periodos(periodos)
@@ -167,13 +294,8 @@ def extraer_datos_formulario(request):
         'periodos': periodos
     }
     
-    # Debug: imprimir los valores de grados y períodos
-    app.logger.info(f"[DEBUG] Grados recibidos: '{datos['grados']}'")
-    app.logger.info(f"[DEBUG] Períodos recibidos: {datos['periodos']}")
-    app.logger.info(f"[DEBUG] Meses (texto): '{datos['meses']}'")
-    print(f"[DEBUG] Grados recibidos: '{datos['grados']}'")
-    print(f"[DEBUG] Períodos recibidos: {datos['periodos']}")
-    print(f"[DEBUG] Meses (texto): '{datos['meses']}'")
+    app.logger.debug('Grados recibidos: %s', resumir(datos['grados']))
+    app.logger.debug('Períodos recibidos: %s', resumir(datos['periodos']))
     
     return datos
 
@@ -206,29 +328,29 @@ def validar_datos_requeridos(datos):
     
     return True
 
+# Campos del formulario que se copian tal cual de los datos enviados
+CAMPOS_FORMULARIO = (
+    'titulo_actividad', 'docente_responsable', 'email_responsable', 'dni_responsable',
+    'departamento', 'fundamentacion', 'objetivos', 'metodologia', 'grados',
+    'materiales_presupuesto', 'meses'
+)
+
 def crear_formulario_db(datos):
     """Crea un objeto FormularioActividad para guardar en la base de datos"""
-    
-    formulario = FormularioActividad(
-        titulo_actividad=datos['titulo_actividad'],
-        docente_responsable=datos['docente_responsable'],
-        email_responsable=datos['email_responsable'],
-        dni_responsable=datos['dni_responsable'],
-        departamento=datos['departamento'],
-        fundamentacion=datos['fundamentacion'],
-        objetivos=datos['objetivos'],
-        metodologia=datos['metodologia'],
-        grados=datos['grados'],
-        materiales_presupuesto=datos['materiales_presupuesto'],
-        meses=datos['meses']
-    )
+    formulario = FormularioActividad()
+    asignar_datos_formulario(formulario, datos)
+    return formulario
+
+def asignar_datos_formulario(formulario, datos):
+    """Copia los datos enviados al formulario (también al reutilizar un envío fallido)"""
+    for campo in CAMPOS_FORMULARIO:
+        setattr(formulario, campo, datos[campo])
     
     # Asignar equipo y períodos usando las propiedades
     formulario.equipo = datos['equipo']
     formulario.periodos = datos['periodos']
-    
-    return formulario
 
+@metricas.medir('procesar_formulario')
 def procesar_formulario(formulario_db, datos_formulario):
     """Procesa el formulario: genera documento y envía email"""
     
@@ -241,9 +363,22 @@ def procesar_formulario(formulario_db, datos_formulario):
         folder_name = google_drive.create_folder_name(docente_apellido)
         app.logger.info(f'Nombre de carpeta a crear: {folder_name}')
         
+        # El PDF local se genera en paralelo con las llamadas a Google Apps Script
+        pdf_futuro = iniciar_pdf_local(datos_formulario)
+        pdf_filename = google_drive.create_filename(docente_apellido, extension='pdf')
+        
+        template_id = os.getenv('TEMPLATE_DOC_ID')
+        if app.config['APPS_SCRIPT_BATCH'] and template_id:
+            return procesar_formulario_batch(datos_formulario, docente_apellido, folder_name, template_id,
+                                             pdf_futuro, pdf_filename)
+        
         try:
-            folder_id = google_drive.create_folder(folder_name)
+            # Reutiliza la carpeta del día si ya se creó (caché local o carpeta existente en Drive)
+            with metricas.medir('crear_carpeta'):
+                folder_id, carpeta_en_cache = google_drive.get_or_create_folder(folder_name)
             app.logger.info(f'Resultado de crear carpeta: {folder_id}')
+        except CuotaAgotada:
+            raise
         except Exception as e:
             app.logger.error(f'Error específico al crear carpeta: {str(e)}')
             return {
@@ -259,78 +394,192 @@ def procesar_formulario(formulario_db, datos_formulario):
             }
         
         # 3. Generar documento desde template de Google Docs usando la API
-        template_id = os.getenv('TEMPLATE_DOC_ID')
         document_result = None
         
         if template_id:
             # Generar documento usando el template de Google Docs via API
             filename = google_drive.create_filename(docente_apellido, extension='docx')
-            fields = pdf_generator.create_template_fields(datos_formulario)
+            fields = campos_template.create_template_fields(datos_formulario)
             
             app.logger.info(f'Generando documento desde template: {template_id}')
             app.logger.info(f'Nombre de archivo: {filename}')
             app.logger.info(f'Carpeta destino: {folder_id}')
             
             # Generar documento Google Docs desde template
-            doc_result = google_drive.generate_document_from_template(
-                template_id, filename, fields, folder_id, 
-                None,  # Sin firma
-                datos_formulario.get('equipo')
-            )
+            with metricas.medir('generar_documento'):
+                try:
+                    doc_result = google_drive.generate_document_from_template(
+                        template_id, filename, fields, folder_id, 
+                        None,  # Sin firma
+                        datos_formulario.get('equipo'),
+                        export_pdf=app.config['GUARDAR_PDF_DRIVE']
+                    )
+                except CarpetaNoEncontrada:
+                    if not carpeta_en_cache:
+                        raise
+                    # La carpeta guardada en la caché se borró en Drive: pedirla de nuevo y reintentar
+                    app.logger.warning(f'La carpeta {folder_id} ya no existe en Drive, se vuelve a crear')
+                    google_drive.invalidate_folder(folder_name)
+                    folder_id = google_drive.create_folder(folder_name)
+                    doc_result = google_drive.generate_document_from_template(
+                        template_id, filename, fields, folder_id,
+                        None,  # Sin firma
+                        datos_formulario.get('equipo'),
+                        export_pdf=app.config['GUARDAR_PDF_DRIVE']
+                    )
             
             if doc_result:
                 app.logger.info(f'Documento generado exitosamente: {doc_result["document_id"]}')
-                print(f'[DEBUG] Documento generado exitosamente: {doc_result["document_id"]}')
                 
-                # Enviar email con el documento convertido a PDF (no generar PDF local)
-                print(f'[DEBUG] Enviando email con documento de Google Docs convertido a PDF')
-                
-                email_success = email_sender.send_notification_email_with_pdf(
-                    datos_formulario, 
-                    doc_result['document_id']
-                )
-                print(f'[DEBUG] Resultado envío email con PDF convertido: {email_success}')
+                pdf_local = obtener_pdf_local(pdf_futuro)
+                if app.config['EMAIL_RESUMEN']:
+                    # La notificación se envía en el próximo email de resumen
+                    email_success = False
+                elif pdf_local:
+                    # Enviar email con el PDF generado localmente
+                    with metricas.medir('enviar_email'):
+                        email_success = email_sender.send_notification_email_with_attachment(
+                            datos_formulario, pdf_local, pdf_filename
+                        )
+                else:
+                    # Enviar email con el PDF guardado en Drive (o convertido por Apps Script si no hay)
+                    with metricas.medir('enviar_email'):
+                        email_success = email_sender.send_notification_email_with_pdf(
+                            datos_formulario, 
+                            doc_result['document_id'],
+                            doc_result.get('pdf_file_id')
+                        )
+                app.logger.debug(f'Resultado envío email con PDF convertido: {email_success}')
                 
                 document_result = {
                     'document_id': doc_result['document_id'],
                     'document_url': doc_result['document_url'],
-                    'pdf_download_url': f'https://docs.google.com/document/d/{doc_result["document_id"]}/export?format=pdf'
+                    'pdf_file_id': doc_result.get('pdf_file_id'),
+                    'pdf_download_url': google_drive.pdf_download_url(
+                        doc_result['document_id'], doc_result.get('pdf_file_id')
+                    )
                 }
                 
                 # Verificar resultado del envío
-                if not email_success:
+                if not email_success and not app.config['EMAIL_RESUMEN']:
                     app.logger.warning('El documento se generó pero falló el envío del email')
                 
-                print(f'[DEBUG] Preparando respuesta final exitosa con documento convertido a PDF')
                 return {
                     'success': True,
                     'message': 'Formulario procesado correctamente. Documento con imagen de firma enviado como PDF por email.',
                     'document_id': document_result['document_id'],
                     'document_url': document_result['document_url'],
+                    'pdf_file_id': document_result['pdf_file_id'],
                     'pdf_download_url': document_result.get('pdf_download_url'),
                     'folder_id': folder_id,
                     'email_sent': email_success,
+                    'email_diferido': app.config['EMAIL_RESUMEN'],
                     'generation_method': 'google_docs_template_with_signature_to_pdf'
                 }
             else:
                 app.logger.error('Falló la generación del documento desde template')
-                print(f'[DEBUG] Falló la generación del documento desde template')
                 return {
                     'success': False,
                     'message': 'No se pudo generar documento desde template de Google Docs'
                 }
     
+    except CuotaAgotada:
+        # Se propaga para que la cola posponga el trabajo en lugar de contarlo como fallo
+        raise
     except Exception as e:
-        app.logger.error(f'Error en procesar_formulario: {str(e)}')
-        print(f'[DEBUG] ERROR CAPTURADO: {str(e)}')
-        print(f'[DEBUG] Tipo de error: {type(e).__name__}')
-        import traceback
-        print(f'[DEBUG] Traceback: {traceback.format_exc()}')
+        app.logger.exception(f'Error en procesar_formulario: {str(e)}')
         return {
             'success': False,
             'message': f'Error en el procesamiento: {str(e)}'
         }
 
+def procesar_formulario_batch(datos_formulario, docente_apellido, folder_name, template_id,
+                              pdf_futuro=None, pdf_filename=None):
+    """Procesa el formulario con una única petición processSubmission a Google Apps Script"""
+    filename = google_drive.create_filename(docente_apellido, extension='docx')
+    fields = campos_template.create_template_fields(datos_formulario)
+    
+    pdf_local = obtener_pdf_local(pdf_futuro)
+    if app.config['EMAIL_RESUMEN']:
+        # La notificación se envía en el próximo email de resumen
+        email_data = None
+    elif pdf_local:
+        email_data = email_sender.create_notification_email_with_attachment(
+            datos_formulario, pdf_local, pdf_filename
+        )
+    else:
+        email_data = email_sender.create_notification_email_with_pdf(
+            datos_formulario, google_drive.DOCUMENT_REF,
+            google_drive.PDF_REF if app.config['GUARDAR_PDF_DRIVE'] else None
+        )
+    
+    try:
+        with metricas.medir('process_submission'):
+            resultado = google_drive.process_submission(
+                folder_name, template_id, filename, fields,
+                datos_formulario.get('equipo'), email_data,
+                export_pdf=app.config['GUARDAR_PDF_DRIVE']
+            )
+    except CuotaAgotada:
+        raise
+    except Exception as e:
+        app.logger.error(f'Error en processSubmission: {str(e)}')
+        return {
+            'success': False,
+            'message': f'Error al procesar en Google Apps Script: {str(e)}'
+        }
+    
+    if not resultado['folder_id']:
+        return {
+            'success': False,
+            'message': 'No se pudo crear la carpeta en Google Drive'
+        }
+    
+    if not resultado['document']:
+        return {
+            'success': False,
+            'message': 'No se pudo generar documento desde template de Google Docs'
+        }
+    
+    if not resultado['email_sent'] and not app.config['EMAIL_RESUMEN']:
+        app.logger.warning('El documento se generó pero falló el envío del email')
+    
+    document_id = resultado['document']['document_id']
+    pdf_file_id = resultado['document'].get('pdf_file_id')
+    return {
+        'success': True,
+        'message': 'Formulario procesado correctamente. Documento enviado como PDF por email.',
+        'document_id': document_id,
+        'document_url': resultado['document']['document_url'],
+        'pdf_file_id': pdf_file_id,
+        'pdf_download_url': google_drive.pdf_download_url(document_id, pdf_file_id),
+        'folder_id': resultado['folder_id'],
+        'email_sent': resultado['email_sent'],
+        'email_diferido': app.config['EMAIL_RESUMEN'],
+        'generation_method': 'google_docs_template_batch'
+    }
+
+def iniciar_pdf_local(datos_formulario):
+    """Encola la generación local del PDF si PDF_RENDER_MODE=local. Devuelve un futuro o None"""
+    if app.config['PDF_RENDER_MODE'] != 'local' or app.config['EMAIL_RESUMEN']:
+        return None
+    try:
+        return pdf_pool.submit(datos_formulario)
+    except Exception as e:
+        app.logger.warning(f'No se pudo iniciar la generación local del PDF: {str(e)}')
+        return None
+
+def obtener_pdf_local(pdf_futuro):
+    """Espera el PDF generado localmente. Devuelve los bytes o None para usar la exportación de Apps Script"""
+    if pdf_futuro is None:
+        return None
+    try:
+        with metricas.medir('esperar_pdf_local'):
+            return pdf_futuro.result(timeout=float(os.getenv('PDF_RENDER_TIMEOUT', 60)))
+    except Exception as e:
+        app.logger.warning(f'Falló la generación local del PDF, se usará la exportación de Apps Script: {str(e)}')
+        return None
+
 def extraer_apellido(nombre_completo):
     """Extrae el apellido del nombre completo (asume que el apellido es la primera palabra)"""
     if not nombre_completo:
@@ -342,56 +591,478 @@ def extraer_apellido(nombre_completo):
     else:
         return 'Sin_Apellido'
 
+def procesar_formulario_pendiente(formulario_id):
+    """Procesa un formulario guardado desde la cola de trabajos. Devuelve (success, message)"""
+    formulario = db.session.get(FormularioActividad, formulario_id)
+    if formulario is None:
+        return False, f'Formulario {formulario_id} no encontrado'
+    
+    if formulario.estado == 'procesado':
+        return True, 'Formulario ya procesado'
+    
+    # Los logs y las llamadas a Apps Script del trabajo llevan el ID del request original
+    with correlacion.usar(formulario.id_correlacion):
+        resultado = procesar_formulario(formulario, formulario.to_dict())
+    if not resultado:
+        return False, 'No se pudo procesar el formulario (TEMPLATE_DOC_ID no configurado)'
+    
+    if resultado['success']:
+        marcar_procesado(formulario, resultado)
+        return True, resultado.get('message')
+    
+    return False, resultado.get('message', 'Error desconocido')
+
+def marcar_procesado(formulario, resultado):
+    """Guarda el resultado del procesamiento y, en modo resumen, agrega el formulario al próximo resumen"""
+    formulario.estado = 'procesado'
+    formulario.documento_id = resultado.get('document_id')
+    formulario.carpeta_id = resultado.get('folder_id')
+    formulario.pdf_file_id = resultado.get('pdf_file_id')
+    if resultado.get('email_diferido'):
+        resumen_email.registrar(formulario.id)
+    db.session.commit()
+    metricas.incrementar('pilar_formularios_total', estado='procesado')
+    if resultado.get('email_diferido'):
+        resumen_email.notify()
+
+def crear_adjunto_resumen(formulario):
+    """Adjunto del PDF de un formulario para el email de resumen"""
+    apellido = extraer_apellido(formulario.docente_responsable)
+    if app.config['PDF_RENDER_MODE'] == 'local':
+        try:
+            pdf_content = pdf_pool.render_pdf(formulario.to_dict())
+            return {
+                'fileName': f'{formulario.id}_' + google_drive.create_filename(apellido, formulario.fecha_creacion, extension='pdf'),
+                'mimeType': 'application/pdf',
+                'content': base64.b64encode(pdf_content).decode('ascii')
+            }
+        except Exception as e:
+            app.logger.warning(f'Falló la generación local del PDF del formulario {formulario.id}: {str(e)}')
+    if formulario.documento_id:
+        adjunto = {'fileId': formulario.documento_id, 'convertTo': 'pdf'}
+        if formulario.pdf_file_id:
+            # PDF ya guardado en Drive: Apps Script lo adjunta sin volver a convertir
+            adjunto['storedFileId'] = formulario.pdf_file_id
+        return adjunto
+    return None
+
+job_queue = JobQueue(procesar_formulario_pendiente)
+resumen_email = ResumenEmail(email_sender, crear_adjunto_resumen)
+salud = Salud()
+
+def iniciar_cola_trabajos():
+    """Arranca los trabajadores de la cola y el envío de resúmenes si están activos"""
+    if app.config['PDF_RENDER_MODE'] == 'local':
+        # Crear los procesos del pool antes de arrancar más hilos
+        try:
+            pdf_pool.warmup()
+        except Exception as e:
+            app.logger.error(f'Error al iniciar el pool de PDF: {str(e)}')
+    if app.config['PROCESAMIENTO_ASINCRONO']:
+        job_queue.start(app)
+    if app.config['EMAIL_RESUMEN']:
+        resumen_email.start(app)
+
 @app.route('/confirmacion/<int:formulario_id>')
 def confirmacion_envio(formulario_id):
     """Página de confirmación después del envío exitoso"""
     try:
         formulario = FormularioActividad.query.get_or_404(formulario_id)
         
-        # Verificar que el formulario fue procesado exitosamente
-        if formulario.estado != 'procesado':
+        # Verificar que el formulario fue procesado o está en cola de procesamiento
+        if formulario.estado not in ('procesado', 'pendiente'):
             return redirect(url_for('index'))
         
         return render_template('confirmacion.html', 
                              fecha_procesamiento=formulario.fecha_creacion.strftime("%d/%m/%Y %H:%M"),
-                             numero_formulario=f"FORM-{formulario.id:06d}")
+                             numero_formulario=f"FORM-{formulario.id:06d}",
+                             formulario_id=formulario.id,
+                             estado=formulario.estado)
     
     except Exception as e:
         app.logger.error(f'Error en confirmacion_envio: {str(e)}')
         return redirect(url_for('index'))
 
-@app.route('/formularios')
-def listar_formularios():
-    """Página para listar todos los formularios enviados (para administración)"""
-    formularios = FormularioActividad.query.order_by(FormularioActividad.fecha_creacion.desc()).all()
-    
-    formularios_data = []
-    for formulario in formularios:
-        data = formulario.to_dict()
-        formularios_data.append(data)
+@app.route('/formulario/<int:formulario_id>/estado')
+def estado_formulario(formulario_id):
+    """Estado de procesamiento de un formulario (consultado por la página de confirmación)"""
+    formulario = FormularioActividad.query.get_or_404(formulario_id)
+    job = ProcesamientoJob.query.filter_by(formulario_id=formulario_id).order_by(
+        ProcesamientoJob.id.desc()
+    ).first()
+    notificacion = NotificacionResumen.query.filter_by(formulario_id=formulario_id).first()
     
     return jsonify({
         'success': True,
-        'data': formularios_data
+        'data': {
+            'formulario_id': formulario.id,
+            'estado': formulario.estado,
+            'job': {
+                'estado': job.estado,
+                'intentos': job.intentos,
+                'max_intentos': job.max_intentos
+            } if job else None,
+            'notificacion': {
+                'estado': notificacion.estado,
+                'intentos': notificacion.intentos,
+                'fecha_envio': notificacion.fecha_envio.isoformat() if notificacion.fecha_envio else None
+            } if notificacion else None
+        }
     })
 
+# Paginación del listado de administración
+LISTADO_LIMITE_POR_DEFECTO = 50
+LISTADO_LIMITE_MAXIMO = 500
+LISTADO_STREAM_LOTE = 200
+
+def codificar_cursor(formulario):
+    """Cursor opaco con la posición (fecha_creacion, id) del último formulario devuelto"""
+    valor = f"{formulario.fecha_creacion.isoformat()}|{formulario.id}"
+    return base64.urlsafe_b64encode(valor.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor. Lanza ValueError si el cursor no es válido"""
+    try:
+        valor = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        fecha, formulario_id = valor.split('|', 1)
+        return datetime.fromisoformat(fecha), int(formulario_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+def parsear_fecha_filtro(valor, nombre):
+    """Parsea una fecha de filtro (YYYY-MM-DD o ISO 8601)"""
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f'Fecha inválida en "{nombre}": {valor}')
+
+def construir_consulta_formularios(args):
+    """Arma la consulta del listado a partir de los filtros de la query string.
+    El orden (fecha_creacion desc, id desc) es estable y sirve de clave para el cursor."""
+    consulta = FormularioActividad.query
+    
+    if args.get('estado'):
+        consulta = consulta.filter(FormularioActividad.estado == args['estado'])
+    if args.get('departamento'):
+        consulta = consulta.filter(FormularioActividad.departamento == args['departamento'])
+    if args.get('dni'):
+        consulta = consulta.filter(FormularioActividad.dni_responsable == args['dni'].strip())
+    if args.get('email'):
+        consulta = consulta.filter(FormularioActividad.email_responsable == args['email'].strip())
+    if args.get('correlacion'):
+        consulta = consulta.filter(FormularioActividad.id_correlacion == args['correlacion'].strip())
+    if args.get('miembro_dni'):
+        # Actividades en las que participa la persona como miembro del equipo
+        consulta = consulta.filter(FormularioActividad.miembros.any(EquipoMiembro.dni == args['miembro_dni'].strip()))
+    if args.get('desde'):
+        consulta = consulta.filter(FormularioActividad.fecha_creacion >= parsear_fecha_filtro(args['desde'], 'desde'))
+    if args.get('hasta'):
+        hasta = parsear_fecha_filtro(args['hasta'], 'hasta')
+        if len(args['hasta']) == 10:
+            # Fecha sin hora: incluir el día completo
+            consulta = consulta.filter(FormularioActividad.fecha_creacion < hasta + timedelta(days=1))
+        else:
+            consulta = consulta.filter(FormularioActividad.fecha_creacion <= hasta)
+    
+    if args.get('cursor'):
+        fecha, formulario_id = decodificar_cursor(args['cursor'])
+        # Comparación de tuplas: SQLite la resuelve como rango sobre el índice de fecha
+        consulta = consulta.filter(
+            db.tuple_(FormularioActividad.fecha_creacion, FormularioActividad.id) < (fecha, formulario_id)
+        )
+    
+    return consulta.order_by(FormularioActividad.fecha_creacion.desc(), FormularioActividad.id.desc())
+
+def parsear_campos(valor, por_defecto):
+    """Parsea el parámetro fields= (lista separada por comas, 'resumen' o 'all')"""
+    if not valor:
+        return por_defecto
+    if valor == 'all':
+        return FormularioActividad.CAMPOS
+    if valor == 'resumen':
+        return FormularioActividad.CAMPOS_RESUMEN
+    
+    campos = tuple(campo.strip() for campo in valor.split(',') if campo.strip())
+    invalidos = [campo for campo in campos if campo not in FormularioActividad.CAMPOS]
+    if invalidos:
+        raise ValueError(f'Campos no válidos: {", ".join(invalidos)}')
+    return campos
+
+def recorrer_por_lotes(consulta):
+    """Itera los formularios de la consulta leyendo de a LISTADO_STREAM_LOTE filas"""
+    resultado = db.session.execute(consulta.statement.execution_options(yield_per=LISTADO_STREAM_LOTE))
+    return resultado.scalars()
+
+def generar_ndjson(consulta, campos):
+    """Genera una línea JSON por formulario leyendo la consulta por lotes"""
+    for formulario in recorrer_por_lotes(consulta):
+        yield serializacion.formulario_a_json(formulario, campos) + '\n'
+
+@app.route('/formularios')
+def listar_formularios():
+    """Listado paginado de formularios enviados (para administración).
+    
+    Filtros: estado, departamento, dni, email, miembro_dni, desde, hasta.
+    Paginación por cursor: limit y cursor (valor next_cursor de la página anterior).
+    Con formato=ndjson se transmiten todos los resultados como JSON por líneas.
+    Por defecto se devuelve la representación resumida; fields=all o una lista de
+    campos separados por comas carga también los textos largos.
+    """
+    try:
+        campos = parsear_campos(request.args.get('fields'), FormularioActividad.CAMPOS_RESUMEN)
+        consulta = construir_consulta_formularios(request.args)
+        limite = int(request.args.get('limit', LISTADO_LIMITE_POR_DEFECTO))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    consulta = consulta.options(*FormularioActividad.opciones_carga(campos))
+    
+    if request.args.get('formato') == 'ndjson':
+        return Response(stream_with_context(generar_ndjson(consulta, campos)), mimetype='application/x-ndjson')
+    
+    limite = max(1, min(limite, LISTADO_LIMITE_MAXIMO))
+    # Se pide un registro extra para saber si hay una página siguiente
+    formularios = consulta.limit(limite + 1).all()
+    hay_mas = len(formularios) > limite
+    formularios = formularios[:limite]
+    
+    # Serialización directa a texto: los JSON almacenados se insertan sin decodificarse
+    cuerpo = serializacion.respuesta_listado(
+        [serializacion.formulario_a_json(formulario, campos) for formulario in formularios],
+        next_cursor=codificar_cursor(formularios[-1]) if hay_mas else None
+    )
+    return Response(cuerpo, mimetype='application/json')
+
+EXPORTACION_VENTANA = int(os.getenv('EXPORTACION_VENTANA', 8))
+
+def trabajos_exportacion_pdf(consulta):
+    """Genera (nombre_archivo, datos) por formulario leyendo la consulta por lotes"""
+    consulta = consulta.options(*FormularioActividad.opciones_carga(FormularioActividad.CAMPOS))
+    for formulario in recorrer_por_lotes(consulta):
+        nombre = google_drive.create_filename(
+            extraer_apellido(formulario.docente_responsable), formulario.fecha_creacion, extension='pdf'
+        )
+        yield f'{formulario.id}_{nombre}', formulario.to_dict()
+
+def generar_zip_pdfs(consulta):
+    """ZIP con el PDF de cada formulario de la consulta, generado en paralelo y transmitido por partes"""
+    resultados = exportacion.renderizar_pdfs(
+        trabajos_exportacion_pdf(consulta),
+        ventana=EXPORTACION_VENTANA,
+        timeout=float(os.getenv('PDF_RENDER_TIMEOUT', 60))
+    )
+    return exportacion.generar_zip(exportacion.entradas_pdf(resultados))
+
+@app.route('/formularios/exportar/pdf')
+def exportar_formularios_pdf():
+    """Exporta como ZIP los PDF de los formularios que cumplen los filtros del listado
+    (estado, departamento, dni, email, miembro_dni, desde, hasta)"""
+    try:
+        consulta = construir_consulta_formularios(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    nombre_zip = f"formularios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(generar_zip_pdfs(consulta)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={nombre_zip}'}
+    )
+
+# Columnas de la exportación tabular (además del equipo y los períodos aplanados)
+EXPORTACION_COLUMNAS = (
+    'id', 'fecha_creacion', 'estado', 'titulo_actividad', 'docente_responsable', 'email_responsable',
+    'dni_responsable', 'departamento', 'grados', 'meses', 'fundamentacion', 'objetivos',
+    'metodologia', 'materiales_presupuesto', 'documento_id', 'carpeta_id', 'pdf_file_id'
+)
+EXPORTACION_CAMPOS_MIEMBRO = ('apellido_nombre', 'dni', 'correo', 'claustro')
+
+def ids_exportacion(consulta):
+    """Subconsulta con los IDs de los formularios que exporta la consulta filtrada"""
+    return consulta.order_by(None).with_entities(FormularioActividad.id).scalar_subquery()
+
+def maximo_miembros_exportacion(consulta):
+    """Mayor cantidad de miembros de equipo en los formularios exportados (define las columnas de miembros)"""
+    ids = ids_exportacion(consulta)
+    normalizados = db.session.query(db.func.count(EquipoMiembro.id)).filter(
+        EquipoMiembro.formulario_id.in_(ids)
+    ).group_by(
+        EquipoMiembro.formulario_id
+    ).order_by(db.func.count(EquipoMiembro.id).desc()).limit(1).scalar()
+    # Formularios anteriores a equipo_miembros (el JSON inválido se ignora)
+    equipo_json = FormularioActividad.equipo_json
+    sin_migrar = db.session.query(db.func.max(db.case(
+        (db.func.json_valid(equipo_json) == 1, db.func.json_array_length(equipo_json))
+    ))).filter(equipo_json.isnot(None), FormularioActividad.id.in_(ids)).scalar()
+    return max(normalizados or 0, sin_migrar or 0)
+
+def anos_periodos_exportacion(consulta):
+    """Años presentes en los períodos de los formularios exportados, en orden"""
+    periodos_json = FormularioActividad.periodos_json
+    periodo = db.func.json_each(
+        db.case((db.func.json_valid(periodos_json) == 1, periodos_json))
+    ).table_valued('value').alias('periodo')
+    filas = db.session.query(db.func.json_extract(periodo.c.value, '$.ano')).select_from(
+        FormularioActividad
+    ).join(periodo, db.true()).filter(FormularioActividad.id.in_(ids_exportacion(consulta))).distinct()
+    return sorted({str(ano) for ano, in filas if ano})
+
+def encabezados_exportacion(max_miembros, anos):
+    encabezados = list(EXPORTACION_COLUMNAS) + ['cantidad_miembros']
+    for numero in range(1, max_miembros + 1):
+        encabezados.extend(f'miembro_{numero}_{campo}' for campo in EXPORTACION_CAMPOS_MIEMBRO)
+    encabezados.extend(f'meses_{ano}' for ano in anos)
+    return encabezados
+
+def fila_exportacion(formulario, max_miembros, anos):
+    """Fila plana de un formulario: un grupo de columnas por miembro y una columna de meses por año"""
+    fila = [formulario._valor_campo(campo) for campo in EXPORTACION_COLUMNAS]
+    
+    equipo = formulario.equipo
+    fila.append(len(equipo))
+    for posicion in range(max_miembros):
+        miembro = equipo[posicion] if posicion < len(equipo) else {}
+        fila.extend(miembro.get(campo) for campo in EXPORTACION_CAMPOS_MIEMBRO)
+    
+    meses_por_ano = {str(periodo.get('ano')): ', '.join(periodo.get('meses', [])) for periodo in formulario.periodos}
+    fila.extend(meses_por_ano.get(ano, '') for ano in anos)
+    return fila
+
+def filas_exportacion(consulta, max_miembros, anos):
+    consulta = consulta.options(*FormularioActividad.opciones_carga(FormularioActividad.CAMPOS))
+    for formulario in recorrer_por_lotes(consulta):
+        yield fila_exportacion(formulario, max_miembros, anos)
+
+FORMATOS_EXPORTACION = {
+    'csv': (exportacion.generar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (exportacion.generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+
+@app.route('/formularios/exportar/<any(csv, xlsx):formato>')
+def exportar_formularios_tabla(formato):
+    """Exporta los formularios como planilla CSV o XLSX, transmitida a medida que se leen las filas.
+    Admite los mismos filtros que el listado."""
+    try:
+        consulta = construir_consulta_formularios(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    # Columnas calculadas sobre los mismos filtros que las filas
+    max_miembros = maximo_miembros_exportacion(consulta)
+    anos = anos_periodos_exportacion(consulta)
+    generador, mimetype = FORMATOS_EXPORTACION[formato]
+    
+    nombre_archivo = f"formularios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return Response(
+        stream_with_context(generador(
+            encabezados_exportacion(max_miembros, anos),
+            filas_exportacion(consulta, max_miembros, anos)
+        )),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nombre_archivo}'}
+    )
+
 @app.route('/formulario/<int:formulario_id>')
 def ver_formulario(formulario_id):
-    """Ver un formulario específico"""
+    """Ver un formulario específico (admite fields= igual que el listado)"""
+    try:
+        campos = parsear_campos(request.args.get('fields'), FormularioActividad.CAMPOS)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    formulario = FormularioActividad.query.options(
+        *FormularioActividad.opciones_carga(campos)
+    ).filter_by(id=formulario_id).first_or_404()
+    cuerpo = '{"success":true,"data":' + serializacion.formulario_a_json(formulario, campos) + '}'
+    return Response(cuerpo, mimetype='application/json')
+
+def obtener_pdf_drive(formulario):
+    """ID del PDF guardado en Drive. Los formularios procesados antes de guardar el PDF
+    se exportan una sola vez y el ID queda registrado para las siguientes descargas."""
+    if formulario.pdf_file_id or not formulario.documento_id:
+        return formulario.pdf_file_id
+    
+    apellido = extraer_apellido(formulario.docente_responsable)
+    with metricas.medir('exportar_pdf'):
+        pdf_file_id = google_drive.export_pdf(
+            formulario.documento_id, formulario.carpeta_id,
+            google_drive.create_filename(apellido, formulario.fecha_creacion, extension='pdf')
+        )
+    if pdf_file_id:
+        formulario.pdf_file_id = pdf_file_id
+        db.session.commit()
+    return pdf_file_id
+
+@app.route('/formulario/<int:formulario_id>/pdf')
+def descargar_pdf_formulario(formulario_id):
+    """Redirige a la descarga del PDF del formulario guardado en Google Drive"""
     formulario = FormularioActividad.query.get_or_404(formulario_id)
+    if not formulario.documento_id:
+        return jsonify({
+            'success': False,
+            'message': 'El formulario todavía no tiene un documento generado'
+        }), 404
+    
+    try:
+        pdf_file_id = obtener_pdf_drive(formulario)
+    except CuotaAgotada as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503, {'Retry-After': str(int(e.reintentar_en) + 1)}
+    
+    return redirect(google_drive.pdf_download_url(formulario.documento_id, pdf_file_id))
+
+@app.route('/limites')
+def limites_apps_script():
+    """Contadores del limitador de cuotas de Google Apps Script (para monitoreo)"""
+    limiter = get_limiter()
+    if limiter is None:
+        return jsonify({
+            'success': True,
+            'data': None,
+            'message': 'Limitador desactivado (APPS_SCRIPT_RATE_LIMIT=False)'
+        })
     return jsonify({
         'success': True,
-        'data': formulario.to_dict()
+        'data': limiter.estadisticas()
     })
 
+@app.route('/metrics')
+def metricas_prometheus():
+    """Métricas de todos los procesos en formato de texto de Prometheus"""
+    registro = metricas.get_metricas()
+    if registro is None:
+        return Response('# Métricas desactivadas (METRICAS=False)\n', mimetype='text/plain')
+    return Response(registro.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health')
 def health_check():
-    """Endpoint de verificación de estado de la aplicación"""
-    return jsonify({
+    """Endpoint de verificación de estado de la aplicación. Con ?deep=1 verifica la base
+    de datos, el lock de escritura, Apps Script y la cola (resultado en caché unos segundos)
+    y responde 503 si el proceso no puede atender envíos"""
+    estado = {
         'status': 'OK',
         'timestamp': datetime.utcnow().isoformat(),
         'version': '1.0.0'
-    })
+    }
+    if request.args.get('deep', '').lower() not in ('1', 'true'):
+        return jsonify(estado)
+    
+    estado.update(salud.verificar())
+    return jsonify(estado), 503 if estado['status'] == 'ERROR' else 200
 
 # Manejo de errores
 @app.errorhandler(404)
@@ -416,6 +1087,14 @@ if __name__ == '__main__':
     
     # Configuración para desarrollo con recarga automática
     debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'  # Por defecto True para desarrollo
+    
+    # El mismo logging por cola que en producción (ver wsgi.py), sin el handler propio de Flask
+    logs.configurar()
+    app.logger.removeHandler(default_handler)
+    
+    # Con el recargador activo, solo el proceso hijo debe consumir la cola
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        iniciar_cola_trabajos()
     port = int(os.getenv('FLASK_PORT', 5000))
     
     print(f"🚀 Iniciando aplicación en modo {'DEBUG' if debug_mode else 'PRODUCCIÓN'}")
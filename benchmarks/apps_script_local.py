@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local que reemplaza a Google Apps Script (app.gs) en las pruebas de carga
+
+Atiende las acciones de doPost (createFolders, generateDocuments, sendEmail,
+uploadFiles, getMimeType, exportPdf, sendDigest y processSubmission) con las mismas
+formas de petición y respuesta que app.gs, guardando carpetas y archivos en memoria.
+Permite simular la latencia de cada acción, errores, respuestas HTTP 500, el límite
+de ejecuciones simultáneas y las cuotas diarias de Apps Script, para comparar
+configuraciones de despliegue sin conexión (ver benchmarks/carga_formularios.py).
+
+Uso: python benchmarks/apps_script_local.py [--puerto 8090] [--token pilar-local]
+         [--latencia "sendEmail=lognormal:1.5:0.4"] [--arranque lognormal:0.3:0.4]
+         [--escala 0.1] [--errores "*=0.01"] [--errores-http 0.005]
+         [--cuotas "email=100,documentos=250"] [--max-simultaneas 30] [--semilla 1]
+
+Con la aplicación apuntando al servidor:
+    GOOGLE_APPS_SCRIPT_URL=http://127.0.0.1:8090/exec GOOGLE_APPS_SCRIPT_TOKEN=pilar-local python app.py
+"""
+
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Distribuciones por defecto (segundos), aproximadas a las medidas en el despliegue
+LATENCIAS_POR_DEFECTO = {
+    '*': 'lognormal:0.5:0.4',
+    'createFolders': 'lognormal:0.6:0.3',
+    'generateDocuments': 'lognormal:3:0.4',
+    'sendEmail': 'lognormal:1.5:0.4',
+    'uploadFiles': 'lognormal:1:0.5',
+    'exportPdf': 'lognormal:1.5:0.4',
+    'sendDigest': 'lognormal:2:0.4',
+    'getMimeType': 'lognormal:0.3:0.3'
+}
+
+# Tiempo de arranque de cada ejecución de doPost (una vez por petición)
+ARRANQUE_POR_DEFECTO = 'lognormal:0.3:0.4'
+
+# Las mismas cuotas diarias que utils/rate_limiter.py (valores de Google Workspace)
+CUOTAS_POR_DEFECTO = {
+    'email': 1500,
+    'documentos': 1500,
+    'urlfetch': 100000
+}
+
+# Mensaje de Apps Script al agotarse cada cuota
+_MENSAJES_CUOTA = {
+    'email': 'Service invoked too many times for one day: email.',
+    'documentos': 'Service invoked too many times for one day: docs create.',
+    'urlfetch': 'Service invoked too many times for one day: urlfetch.'
+}
+
+
+class FalloSimulado(Exception):
+    """Error inyectado en una acción (equivale a una excepción dentro del handler de app.gs)"""
+
+
+def parse_distribucion(texto):
+    """Parsea 'fija:S', 'uniforme:MIN:MAX', 'normal:MEDIA:DESV' o 'lognormal:MEDIANA:SIGMA'.
+    Devuelve una función que recibe un random.Random y devuelve segundos."""
+    partes = texto.strip().split(':')
+    tipo, valores = partes[0].lower(), [float(valor) for valor in partes[1:]]
+    if tipo == 'fija' and len(valores) == 1:
+        return lambda rng: valores[0]
+    if tipo == 'uniforme' and len(valores) == 2:
+        return lambda rng: rng.uniform(valores[0], valores[1])
+    if tipo == 'normal' and len(valores) == 2:
+        return lambda rng: max(0.0, rng.gauss(valores[0], valores[1]))
+    if tipo == 'lognormal' and len(valores) == 2:
+        return lambda rng: valores[0] * math.exp(rng.gauss(0, valores[1]))
+    raise ValueError(f'Distribución inválida: {texto}')
+
+
+def parse_pares(texto, convertir):
+    """Parsea 'clave=valor,clave2=valor2' aplicando convertir a cada valor"""
+    pares = {}
+    for item in (texto or '').split(','):
+        if '=' not in item:
+            continue
+        clave, valor = item.split('=', 1)
+        pares[clave.strip()] = convertir(valor.strip())
+    return pares
+
+
+class AppsScriptLocal:
+    """Estado en memoria y acciones simuladas de app.gs.
+
+    Cada acción espera una latencia tomada de su distribución (o la de '*'),
+    multiplicada por `escala`, y falla con la proporción indicada en `errores`.
+    En processSubmission se suman las latencias de sus pasos, como en app.gs,
+    donde los pasos se ejecutan uno tras otro en la misma ejecución.
+    """
+
+    def __init__(self, token, latencias=None, arranque=ARRANQUE_POR_DEFECTO, errores=None,
+                 errores_http=0.0, cuotas=None, max_simultaneas=30, escala=1.0, semilla=None):
+        self.token = token
+        self.latencias = {accion: parse_distribucion(texto) for accion, texto in LATENCIAS_POR_DEFECTO.items()}
+        self.latencias.update({accion: parse_distribucion(texto) for accion, texto in (latencias or {}).items()})
+        self.arranque = parse_distribucion(arranque) if arranque else None
+        self.errores = dict(errores or {})
+        self.errores_http = errores_http
+        self.cuotas = dict(CUOTAS_POR_DEFECTO)
+        self.cuotas.update(cuotas or {})
+        self.max_simultaneas = max_simultaneas
+        self.escala = escala
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._simultaneas = 0
+        self._carpetas = {}
+        self._archivos = {}
+        self._consumo = {}
+        self._estadisticas = {}
+
+        self._acciones = {
+            'createFolders': self.crear_carpetas,
+            'generateDocuments': self.generar_documentos,
+            'sendEmail': self.enviar_email,
+            'uploadFiles': self.subir_archivos,
+            'getMimeType': self.obtener_mime_type,
+            'exportPdf': self.exportar_pdf,
+            'sendDigest': self.enviar_resumen,
+            'processSubmission': self.procesar_envio
+        }
+        # Acciones que processSubmission acepta como pasos (igual que app.gs)
+        self._pasos = ('createFolders', 'generateDocuments', 'sendEmail', 'uploadFiles', 'exportPdf')
+
+    # --- Simulación ---
+
+    def _aleatorio(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _esperar(self, distribucion):
+        with self._lock:
+            segundos = distribucion(self._rng) * self.escala
+        if segundos > 0:
+            time.sleep(segundos)
+
+    def _operacion(self, accion):
+        """Espera la latencia de la acción y, según su proporción de errores, falla"""
+        self._esperar(self.latencias.get(accion, self.latencias['*']))
+        proporcion = self.errores.get(accion, self.errores.get('*', 0.0))
+        if proporcion and self._aleatorio() < proporcion:
+            self._contar(accion, 'errores_simulados')
+            raise FalloSimulado(f'Error simulado en {accion}')
+
+    def _consumir(self, cuota, cantidad=1):
+        """Consume una cuota diaria; al agotarse falla con el mensaje de Apps Script"""
+        dia = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        with self._lock:
+            usados = self._consumo.get((cuota, dia), 0)
+            if usados + cantidad > self.cuotas.get(cuota, float('inf')):
+                self._estadisticas.setdefault('cuotas_agotadas', {}).setdefault(cuota, 0)
+                self._estadisticas['cuotas_agotadas'][cuota] += 1
+                raise FalloSimulado(_MENSAJES_CUOTA[cuota])
+            self._consumo[(cuota, dia)] = usados + cantidad
+
+    def _contar(self, accion, campo):
+        with self._lock:
+            acciones = self._estadisticas.setdefault('acciones', {})
+            contadores = acciones.setdefault(accion, {'llamadas': 0, 'exitosas': 0, 'errores_simulados': 0})
+            contadores[campo] = contadores.get(campo, 0) + 1
+
+    def _nuevo_id(self, prefijo):
+        return f'{prefijo}-{uuid.uuid4().hex[:16]}'
+
+    # --- Acciones (mismas validaciones y respuestas que app.gs) ---
+
+    def crear_carpetas(self, data):
+        if not data.get('rootFolderId'):
+            return _respuesta(False, 'ID de carpeta raíz no proporcionado')
+        if not isinstance(data.get('folders'), list) or not data['folders']:
+            return _respuesta(False, 'Lista de carpetas no proporcionada o vacía')
+        try:
+            self._operacion('createFolders')
+            creadas = self._crear_estructura(data['rootFolderId'], data['folders'])
+        except FalloSimulado as e:
+            return _respuesta(False, 'Error al crear carpetas: ' + str(e))
+        return _respuesta(True, 'Carpetas creadas exitosamente', {
+            'rootFolderId': data['rootFolderId'],
+            'createdFolders': creadas
+        })
+
+    def _crear_estructura(self, padre, carpetas):
+        creadas = []
+        for carpeta in carpetas:
+            nombre = (carpeta.get('name') or '').strip()
+            if not nombre:
+                continue
+            with self._lock:
+                carpeta_id = self._carpetas.get((padre, nombre))
+                existia = carpeta_id is not None
+                if not existia:
+                    carpeta_id = self._carpetas[(padre, nombre)] = self._nuevo_id('carpeta')
+            info = {
+                'name': nombre,
+                'id': carpeta_id,
+                'url': f'https://drive.google.com/drive/folders/{carpeta_id}',
+                'existed': existia
+            }
+            if carpeta.get('subfolders'):
+                info['subfolders'] = self._crear_estructura(carpeta_id, carpeta['subfolders'])
+            creadas.append(info)
+        return creadas
+
+    def generar_documentos(self, data):
+        documentos = data.get('documents')
+        if not isinstance(documentos, list) or not documentos:
+            return _respuesta(False, 'Lista de documentos no proporcionada o vacía')
+        generados = []
+        for doc in documentos:
+            try:
+                generados.append(self._generar_documento(doc))
+            except FalloSimulado as e:
+                generados.append({
+                    'templateId': doc.get('templateId'),
+                    'fileName': doc.get('fileName') or 'Sin nombre',
+                    'error': str(e),
+                    'folderMissing': False,
+                    'success': False
+                })
+        return _respuesta(True, 'Procesamiento de documentos completado', {
+            'totalRequested': len(documentos),
+            'totalSuccess': sum(1 for doc in generados if doc['success']),
+            'totalErrors': sum(1 for doc in generados if not doc['success']),
+            'documents': generados
+        })
+
+    def _generar_documento(self, doc):
+        if not doc.get('templateId'):
+            raise FalloSimulado('ID de plantilla no proporcionado')
+        if not doc.get('fileName'):
+            raise FalloSimulado('Nombre del archivo no proporcionado')
+        self._operacion('generateDocuments')
+        self._consumir('documentos')
+        documento_id = self._nuevo_id('documento')
+        with self._lock:
+            self._archivos[documento_id] = {
+                'name': doc['fileName'], 'mimeType': 'application/vnd.google-apps.document',
+                'folderId': doc.get('folderId'), 'size': 0
+            }
+        pdf = None
+        pdf_error = None
+        if doc.get('exportPdf'):
+            try:
+                pdf = self._guardar_pdf(documento_id, doc.get('folderId'), doc['fileName'])
+            except FalloSimulado as e:
+                pdf_error = str(e)
+        campos = doc.get('fields') or {}
+        return {
+            'success': True,
+            'templateId': doc['templateId'],
+            'fileName': doc['fileName'],
+            'documentId': documento_id,
+            'documentUrl': f'https://docs.google.com/document/d/{documento_id}/edit',
+            'folderId': doc.get('folderId'),
+            'fieldsReplaced': len(campos),
+            'renderMode': ('documentApp' if doc.get('renderMode') == 'documentApp' else 'batchUpdate') if campos else None,
+            'renderMs': None,
+            'pdfFileId': pdf['pdfFileId'] if pdf else None,
+            'pdfUrl': pdf['pdfUrl'] if pdf else None,
+            'pdfError': pdf_error
+        }
+
+    def _guardar_pdf(self, documento_id, carpeta_id, nombre):
+        self._operacion('exportPdf')
+        self._consumir('urlfetch')
+        pdf_id = self._nuevo_id('pdf')
+        nombre_pdf = (nombre or documento_id).rsplit('.doc', 1)[0] + '.pdf'
+        tamano = 40000 + int(self._aleatorio() * 80000)
+        with self._lock:
+            self._archivos[pdf_id] = {
+                'name': nombre_pdf, 'mimeType': 'application/pdf', 'folderId': carpeta_id, 'size': tamano
+            }
+        return {
+            'pdfFileId': pdf_id,
+            'pdfFileName': nombre_pdf,
+            'pdfUrl': f'https://drive.google.com/file/d/{pdf_id}/view',
+            'size': tamano
+        }
+
+    def exportar_pdf(self, data):
+        documentos = data.get('documents')
+        if not isinstance(documentos, list) or not documentos:
+            return _respuesta(False, 'Lista de documentos no proporcionada o vacía')
+        resultados = []
+        for doc in documentos:
+            try:
+                pdf = self._guardar_pdf(doc.get('documentId'), doc.get('folderId'), doc.get('fileName'))
+                resultados.append({'success': True, 'documentId': doc.get('documentId'), **pdf})
+            except FalloSimulado as e:
+                resultados.append({'success': False, 'documentId': doc.get('documentId'), 'error': str(e)})
+        return _respuesta(True, 'Exportación de PDF completada', {
+            'totalRequested': len(resultados),
+            'totalSuccess': sum(1 for r in resultados if r['success']),
+            'totalErrors': sum(1 for r in resultados if not r['success']),
+            'documents': resultados
+        })
+
+    def _destinatarios(self, data):
+        return sum(len([d for d in str(data.get(campo) or '').split(',') if d.strip()]) for campo in ('to', 'cc', 'bcc'))
+
+    def _adjuntos(self, adjuntos):
+        """Equivalente a resolveAttachment: info de cada adjunto o FalloSimulado si no existe"""
+        procesados = []
+        for adjunto in adjuntos or []:
+            if not adjunto.get('fileId') and not adjunto.get('content'):
+                continue
+            if not adjunto.get('fileId'):
+                procesados.append({'id': None, 'name': adjunto.get('fileName'), 'conversion': 'inline'})
+                continue
+            with self._lock:
+                archivo = self._archivos.get(adjunto.get('storedFileId') or adjunto['fileId'])
+            if archivo is None:
+                raise FalloSimulado(f'Archivo no encontrado: {adjunto["fileId"]}')
+            if adjunto.get('storedFileId'):
+                procesados.append({'id': adjunto['storedFileId'], 'name': archivo['name'], 'conversion': 'stored'})
+            else:
+                # Conversión con UrlFetchApp
+                self._consumir('urlfetch')
+                procesados.append({'id': adjunto['fileId'], 'name': archivo['name'],
+                                   'conversion': adjunto.get('convertTo') or 'original'})
+        return procesados
+
+    def enviar_email(self, data):
+        if not data.get('to'):
+            return _respuesta(False, 'El destinatario (to) es obligatorio.')
+        if not data.get('subject'):
+            return _respuesta(False, 'El asunto (subject) es obligatorio.')
+        if not data.get('htmlBody'):
+            return _respuesta(False, 'El cuerpo del correo (htmlBody) es obligatorio.')
+        try:
+            try:
+                procesados = self._adjuntos(data.get('attachments'))
+            except FalloSimulado as e:
+                return _respuesta(False, 'Error crítico al procesar adjuntos. El correo NO fue enviado.',
+                                  {'failedFiles': [{'id': None, 'error': str(e)}]})
+            self._operacion('sendEmail')
+            self._consumir('email', self._destinatarios(data))
+        except FalloSimulado as e:
+            return _respuesta(False, 'Error al enviar el correo: ' + str(e))
+        return _respuesta(True, 'Correo enviado exitosamente.', {'processedFiles': procesados})
+
+    def enviar_resumen(self, data):
+        if not data.get('to'):
+            return _respuesta(False, 'El destinatario (to) es obligatorio.')
+        if not data.get('subject'):
+            return _respuesta(False, 'El asunto (subject) es obligatorio.')
+        if not isinstance(data.get('items'), list) or not data['items']:
+            return _respuesta(False, 'Lista de items no proporcionada o vacía')
+        enviados, postergados, fallidos = [], [], []
+        for item in data['items']:
+            try:
+                self._adjuntos(item.get('attachments'))
+                enviados.append(item.get('id'))
+            except FalloSimulado as e:
+                fallidos.append({'id': item.get('id'), 'error': str(e)})
+        datos = {'sentItems': enviados, 'deferredItems': postergados, 'failedItems': fallidos}
+        if not enviados:
+            return _respuesta(False, 'Ningún item del resumen pudo incluirse. El correo NO fue enviado.', datos)
+        try:
+            self._operacion('sendDigest')
+            self._consumir('email', self._destinatarios(data))
+        except FalloSimulado as e:
+            return _respuesta(False, 'Error al enviar el resumen: ' + str(e))
+        return _respuesta(True, f'Resumen enviado con {len(enviados)} items.', {**datos, 'totalBytes': 0})
+
+    def subir_archivos(self, data):
+        archivos = data.get('files')
+        if not isinstance(archivos, list) or not archivos:
+            return _respuesta(False, 'Lista de archivos (files) no proporcionada o vacía.')
+        resultados = []
+        for archivo in archivos:
+            try:
+                for campo in ('fileName', 'mimeType', 'fileContent'):
+                    if not archivo.get(campo):
+                        raise FalloSimulado(f'El campo "{campo}" es obligatorio para cada archivo.')
+                self._operacion('uploadFiles')
+                archivo_id = self._nuevo_id('archivo')
+                with self._lock:
+                    self._archivos[archivo_id] = {
+                        'name': archivo['fileName'], 'mimeType': archivo['mimeType'],
+                        'folderId': archivo.get('folderId'), 'size': len(archivo['fileContent']) * 3 // 4
+                    }
+                resultados.append({
+                    'success': True,
+                    'fileName': archivo['fileName'],
+                    'fileId': archivo_id,
+                    'fileUrl': f'https://drive.google.com/file/d/{archivo_id}/view',
+                    'folderId': archivo.get('folderId')
+                })
+            except FalloSimulado as e:
+                resultados.append({
+                    'success': False,
+                    'fileName': archivo.get('fileName') or 'Nombre no especificado',
+                    'error': str(e)
+                })
+        return _respuesta(True, 'Procesamiento de subida de archivos completado.', {
+            'totalRequested': len(archivos),
+            'totalSuccess': sum(1 for r in resultados if r['success']),
+            'totalErrors': sum(1 for r in resultados if not r['success']),
+            'results': resultados
+        })
+
+    def obtener_mime_type(self, data):
+        # app.gs enruta getMimeType pero no define handleGetMimeType; aquí se responde
+        # con el tipo del archivo para que las pruebas puedan ejercitar la acción
+        archivo_id = data.get('fileId')
+        if not archivo_id:
+            return _respuesta(False, 'ID de archivo (fileId) no proporcionado')
+        try:
+            self._operacion('getMimeType')
+        except FalloSimulado as e:
+            return _respuesta(False, 'Error al obtener el tipo de archivo: ' + str(e))
+        with self._lock:
+            archivo = self._archivos.get(archivo_id)
+        if archivo is None:
+            return _respuesta(False, 'Archivo no encontrado: ' + archivo_id)
+        return _respuesta(True, 'Tipo de archivo obtenido', {
+            'fileId': archivo_id, 'fileName': archivo['name'], 'mimeType': archivo['mimeType']
+        })
+
+    def procesar_envio(self, data):
+        pasos = data.get('steps')
+        if not isinstance(pasos, list) or not pasos:
+            return _respuesta(False, 'Lista de pasos (steps) no proporcionada o vacía')
+        salidas = {}
+        resultados = []
+        fallido = False
+        for i, paso in enumerate(pasos):
+            paso_id = paso.get('id') or f'paso{i}'
+            if fallido:
+                resultados.append({'id': paso_id, 'action': paso.get('action'), 'success': False, 'skipped': True})
+                continue
+            try:
+                if paso.get('action') not in self._pasos:
+                    raise FalloSimulado(f'Acción no válida en el paso {paso_id}: {paso.get("action")}')
+                parametros = _resolver_referencias(paso.get('params') or {}, salidas)
+                respuesta = self._acciones[paso['action']](parametros)
+                resultado = {
+                    'id': paso_id,
+                    'action': paso['action'],
+                    'success': respuesta['success'],
+                    'message': respuesta['message'],
+                    'data': respuesta['data']
+                }
+            except FalloSimulado as e:
+                resultado = {'id': paso_id, 'action': paso.get('action'), 'success': False,
+                             'message': str(e), 'data': None}
+            salidas[paso_id] = resultado['data']
+            resultados.append(resultado)
+            if not resultado['success'] and not paso.get('optional'):
+                fallido = True
+        return _respuesta(not fallido,
+                          'Procesamiento interrumpido por un paso fallido' if fallido else 'Procesamiento completado',
+                          {'steps': resultados})
+
+    # --- doPost ---
+
+    def atender(self, cuerpo):
+        """Atiende una petición a /exec. Devuelve (código HTTP, cuerpo, content-type)"""
+        with self._lock:
+            if self._simultaneas >= self.max_simultaneas:
+                self._estadisticas['rechazadas_simultaneas'] = self._estadisticas.get('rechazadas_simultaneas', 0) + 1
+                return 429, b'Too many simultaneous invocations', 'text/html; charset=utf-8'
+            self._simultaneas += 1
+        try:
+            if self.arranque:
+                self._esperar(self.arranque)
+            if self.errores_http and self._aleatorio() < self.errores_http:
+                with self._lock:
+                    self._estadisticas['errores_http'] = self._estadisticas.get('errores_http', 0) + 1
+                return 500, b'<html><body>Error simulado de Google Apps Script</body></html>', 'text/html; charset=utf-8'
+            respuesta = self._do_post(cuerpo)
+            return 200, json.dumps(respuesta, ensure_ascii=False).encode('utf-8'), 'application/json'
+        finally:
+            with self._lock:
+                self._simultaneas -= 1
+
+    def _do_post(self, cuerpo):
+        id_correlacion = ''
+        try:
+            data = json.loads(cuerpo)
+            id_correlacion = str(data.get('correlationId') or '')[:64]
+            if not self.token or data.get('token') != self.token:
+                respuesta = _respuesta(False, 'Token de seguridad inválido o no proporcionado', None, 401)
+            elif not data.get('action'):
+                respuesta = _respuesta(False, 'Acción no especificada')
+            elif data['action'] not in self._acciones:
+                respuesta = _respuesta(False, 'Acción no válida: ' + str(data['action']))
+            else:
+                self._contar(data['action'], 'llamadas')
+                respuesta = self._acciones[data['action']](data)
+                if respuesta['success']:
+                    self._contar(data['action'], 'exitosas')
+        except Exception as e:
+            respuesta = _respuesta(False, 'Error interno del servidor: ' + str(e))
+        # createResponse agrega la fecha y el ID de correlación
+        respuesta['timestamp'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        if id_correlacion:
+            respuesta['correlationId'] = id_correlacion
+        return respuesta
+
+    def estadisticas(self):
+        """Llamadas por acción, errores simulados, rechazos y consumo de cuotas del día"""
+        dia = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        with self._lock:
+            datos = json.loads(json.dumps(self._estadisticas))
+            datos['cuotas'] = {
+                cuota: {'usados': self._consumo.get((cuota, dia), 0), 'limite': limite}
+                for cuota, limite in self.cuotas.items()
+            }
+            datos['carpetas'] = len(self._carpetas)
+            datos['archivos'] = len(self._archivos)
+        return datos
+
+
+def _respuesta(success, message, data=None, status_code=None):
+    """Equivalente a createResponse de app.gs (sin fecha ni ID de correlación)"""
+    respuesta = {'success': success, 'message': message, 'data': data}
+    if status_code and not success:
+        respuesta['statusCode'] = status_code
+    return respuesta
+
+
+def _resolver_referencias(valor, salidas):
+    """Equivalente a resolveStepReferences de app.gs ('${idPaso.ruta}')"""
+    if isinstance(valor, str):
+        if not (valor.startswith('${') and valor.endswith('}')):
+            return valor
+        actual = salidas
+        for clave in valor[2:-1].split('.'):
+            if isinstance(actual, list) and clave.isdigit() and int(clave) < len(actual):
+                actual = actual[int(clave)]
+            elif isinstance(actual, dict) and clave in actual:
+                actual = actual[clave]
+            else:
+                raise FalloSimulado('Referencia no resuelta: ' + valor)
+        return actual
+    if isinstance(valor, list):
+        return [_resolver_referencias(item, salidas) for item in valor]
+    if isinstance(valor, dict):
+        return {clave: _resolver_referencias(item, salidas) for clave, item in valor.items()}
+    return valor
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        codigo, cuerpo, tipo = self.server.simulador.atender(self.rfile.read(largo))
+        self._responder(codigo, cuerpo, tipo)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/estadisticas':
+            cuerpo = json.dumps(self.server.simulador.estadisticas(), ensure_ascii=False).encode('utf-8')
+            self._responder(200, cuerpo, 'application/json')
+        else:
+            self._responder(404, b'Not Found', 'text/plain')
+
+    def _responder(self, codigo, cuerpo, tipo):
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        if self.server.verbose:
+            super().log_message(formato, *args)
+
+
+def crear_servidor(simulador, host='127.0.0.1', puerto=0, verbose=False):
+    """Servidor HTTP (un hilo por conexión) que atiende POST /exec y GET /estadisticas"""
+    servidor = ThreadingHTTPServer((host, puerto), _Handler)
+    servidor.daemon_threads = True
+    servidor.simulador = simulador
+    servidor.verbose = verbose
+    return servidor
+
+
+def agregar_argumentos(parser, prefijo=''):
+    """Opciones de la simulación (carga_formularios.py las usa con prefijo 'gas-')"""
+    parser.add_argument(f'--{prefijo}token', default='pilar-local')
+    parser.add_argument(f'--{prefijo}latencia', default='',
+                        help='Distribución por acción, ej. "sendEmail=lognormal:1.5:0.4,*=fija:0.5" '
+                             '(fija:S, uniforme:MIN:MAX, normal:MEDIA:DESV, lognormal:MEDIANA:SIGMA)')
+    parser.add_argument(f'--{prefijo}arranque', default=ARRANQUE_POR_DEFECTO,
+                        help='Distribución del arranque de cada ejecución de doPost')
+    parser.add_argument(f'--{prefijo}escala', type=float, default=1.0,
+                        help='Factor aplicado a todas las latencias (ej. 0.1 para pruebas rápidas)')
+    parser.add_argument(f'--{prefijo}errores', default='',
+                        help='Proporción de errores por acción, ej. "*=0.01,sendEmail=0.05"')
+    parser.add_argument(f'--{prefijo}errores-http', type=float, default=0.0,
+                        help='Proporción de respuestas HTTP 500')
+    parser.add_argument(f'--{prefijo}cuotas', default='',
+                        help='Cuotas diarias, ej. "email=100,documentos=250"')
+    parser.add_argument(f'--{prefijo}max-simultaneas', type=int, default=30,
+                        help='Ejecuciones simultáneas antes de responder 429')
+    parser.add_argument(f'--{prefijo}semilla', type=int, default=None)
+
+
+def desde_argumentos(args, prefijo=''):
+    """Crea el simulador a partir de las opciones de agregar_argumentos"""
+    opcion = lambda nombre: getattr(args, (prefijo + nombre).replace('-', '_'))
+    return AppsScriptLocal(
+        token=opcion('token'),
+        latencias=parse_pares(opcion('latencia'), str),
+        arranque=opcion('arranque'),
+        errores=parse_pares(opcion('errores'), float),
+        errores_http=opcion('errores-http'),
+        cuotas=parse_pares(opcion('cuotas'), int),
+        max_simultaneas=opcion('max-simultaneas'),
+        escala=opcion('escala'),
+        semilla=opcion('semilla')
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor local de Google Apps Script - Proyecto Pilar')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8090)
+    parser.add_argument('--verbose', action='store_true', help='Registrar cada petición')
+    agregar_argumentos(parser)
+    args = parser.parse_args()
+
+    servidor = crear_servidor(desde_argumentos(args), args.host, args.puerto, args.verbose)
+    print(f"🚀 Apps Script local en http://{args.host}:{servidor.server_address[1]}/exec")
+    print(f"🔑 Token: {args.token}")
+    print(f"📊 Estadísticas: http://{args.host}:{servidor.server_address[1]}/estadisticas")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(json.dumps(servidor.simulador.estadisticas(), indent=2, ensure_ascii=False))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del tiempo de importación de app.py (arranque en frío de un proceso)
+
+Ejecuta `python -X importtime -c "import app"` en procesos nuevos, suma el tiempo
+acumulado de los módulos de primer nivel y muestra los imports más costosos.
+Indica además si ReportLab quedó importado, lo que no debería ocurrir en el
+proceso web (solo en los procesos de utils/pdf_pool.py).
+
+Uso: python benchmarks/bench_importtime.py [--repeticiones 5] [--top 15] [--json salida.json]
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+# Directorio del proyecto
+project_dir = Path(__file__).parent.parent.absolute()
+
+
+def medir_importacion(modulo):
+    """Importa el módulo en un proceso nuevo y devuelve {modulo: (propio_us, acumulado_us, nivel)}"""
+    entorno = dict(os.environ)
+    entorno.setdefault('FLASK_ENV', 'development')
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=project_dir, env=entorno, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f'No se pudo importar {modulo}:\n{resultado.stderr[-2000:]}')
+
+    modulos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        modulos[nombre.strip()] = (int(propio), int(acumulado), nivel)
+    return modulos
+
+
+def ejecutar(modulo, repeticiones, top, salida_json):
+    mediciones = [medir_importacion(modulo) for _ in range(repeticiones)]
+    # Total: suma del acumulado de los imports de primer nivel
+    totales = [sum(acumulado for _, acumulado, nivel in m.values() if nivel == 0) for m in mediciones]
+    mejor = min(range(repeticiones), key=lambda i: totales[i])
+    modulos = mediciones[mejor]
+
+    con_reportlab = 'reportlab' in modulos
+    print(f"📊 import {modulo}, mejor de {repeticiones} repeticiones")
+    print(f"   Tiempo total:       {totales[mejor] / 1000:9.1f} ms")
+    print(f"   Módulos importados: {len(modulos):9d}")
+    print(f"   ReportLab:          {'importado' if con_reportlab else 'no importado'}")
+
+    # Imports hechos directamente por el módulo medido (nivel 1 del árbol de importtime)
+    print(f"\n   Imports de {modulo} más costosos (acumulado):")
+    directos = sorted(
+        ((nombre, acumulado) for nombre, (_, acumulado, nivel) in modulos.items() if nivel == 1),
+        key=lambda item: item[1], reverse=True
+    )
+    for nombre, acumulado in directos[:top]:
+        print(f"   {nombre:45s} {acumulado / 1000:9.1f} ms")
+
+    if salida_json:
+        with open(salida_json, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'modulo': modulo,
+                'total_ms': round(totales[mejor] / 1000, 1),
+                'totales_ms': [round(total / 1000, 1) for total in totales],
+                'modulos': len(modulos),
+                'reportlab': con_reportlab,
+                'top': [{'modulo': nombre, 'ms': round(acumulado / 1000, 1)} for nombre, acumulado in directos[:top]]
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultado guardado en {salida_json}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark de tiempo de importación - Proyecto Pilar')
+    parser.add_argument('--modulo', default='app')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', dest='salida_json',
+                       help='Archivo donde guardar el resultado para compararlo entre versiones')
+    args = parser.parse_args()
+
+    ejecutar(args.modulo, args.repeticiones, args.top, args.salida_json)
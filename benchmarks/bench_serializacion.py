@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark de serialización de FormularioActividad
+
+Compara, sobre N formularios en memoria, la ruta original (to_dict() + json.dumps,
+decodificando y recodificando los JSON almacenados) con la ruta directa de
+utils/serializacion.py (inserta los JSON almacenados sin decodificarlos).
+
+Uso: python benchmarks/bench_serializacion.py [--filas 10000] [--repeticiones 5]
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+
+def crear_formularios(cantidad):
+    """Crea formularios en memoria con equipo y períodos realistas"""
+    from models import FormularioActividad
+
+    formularios = []
+    for i in range(cantidad):
+        formulario = FormularioActividad(
+            id=i + 1,
+            titulo_actividad=f'Taller de observación científica {i}',
+            docente_responsable='García, María Elena',
+            email_responsable='maria.garcia@uncoma.edu.ar',
+            dni_responsable=str(20000000 + i),
+            departamento='Departamento de Biología',
+            fundamentacion='Fundamentación de la actividad. ' * 40,
+            objetivos='Objetivos de la actividad. ' * 20,
+            metodologia='Metodología de trabajo. ' * 30,
+            grados='5to Grado, 6to Grado',
+            materiales_presupuesto='Lupas, microscopios. ' * 10,
+            meses='2025: Marzo, Abril | 2026: Mayo',
+            fecha_creacion=datetime(2025, 3, 1, 12, 0, 0),
+            fecha_modificacion=datetime(2025, 3, 1, 12, 0, 0),
+            estado='procesado'
+        )
+        # Equipo como JSON almacenado (formato de los formularios no migrados)
+        formulario.equipo_json = json.dumps([
+            {'apellido_nombre': f'Miembro {j}', 'dni': str(30000000 + j),
+             'correo': f'miembro{j}@uncoma.edu.ar', 'claustro': 'Docente'}
+            for j in range(5)
+        ])
+        formulario.periodos = [{'ano': '2025', 'meses': ['Marzo', 'Abril']}, {'ano': '2026', 'meses': ['Mayo']}]
+        formularios.append(formulario)
+    return formularios
+
+
+def medir(nombre, funcion, repeticiones):
+    """Ejecuta la función varias veces y devuelve el mejor tiempo"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"   {nombre:45s} {mejor * 1000:9.1f} ms")
+    return mejor
+
+
+def ejecutar(filas, repeticiones):
+    from models import FormularioActividad
+    from utils import serializacion
+
+    formularios = crear_formularios(filas)
+
+    def ruta_original():
+        datos = []
+        for formulario in formularios:
+            dato = formulario.to_dict()
+            # Sin caché: decodificar los JSON en cada acceso, como antes
+            dato['equipo'] = json.loads(formulario.equipo_json)
+            dato['periodos'] = json.loads(formulario.periodos_json)
+            datos.append(dato)
+        return json.dumps({'success': True, 'data': datos})
+
+    def ruta_to_dict_memo():
+        return json.dumps({'success': True, 'data': [f.to_dict() for f in formularios]})
+
+    def ruta_directa():
+        return serializacion.respuesta_listado(
+            [serializacion.formulario_a_json(f) for f in formularios]
+        )
+
+    # Ambas rutas deben producir los mismos datos
+    assert json.loads(ruta_original()) == json.loads(ruta_directa())
+
+    print(f"📊 {filas} formularios, mejor de {repeticiones} repeticiones (backend: {serializacion.backend()})")
+    base = medir('to_dict + json.loads/json.dumps (original)', ruta_original, repeticiones)
+    memo = medir('to_dict con JSON memoizado + json.dumps', ruta_to_dict_memo, repeticiones)
+    directa = medir('serializacion.formulario_a_json (directa)', ruta_directa, repeticiones)
+    print(f"\n   Mejora con memoización: x{base / memo:.2f}")
+    print(f"   Mejora con ruta directa: x{base / directa:.2f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark de serialización - Proyecto Pilar')
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    ejecutar(args.filas, args.repeticiones)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de /enviar_formulario
+
+Envía formularios realistas a una tasa fija (carga abierta: cada envío sale en su
+horario aunque los anteriores no hayan respondido) y reporta el throughput, los
+percentiles p50/p95/p99 de latencia y los errores agrupados por causa. La latencia
+se mide desde el horario previsto de cada envío, de modo que incluye la espera si
+los hilos del generador se saturan.
+
+Con --local levanta en el mismo proceso la aplicación (con una base de datos y
+archivos de estado temporales) y benchmarks/apps_script_local.py en lugar de
+Google Apps Script, para comparar configuraciones sin conexión. La configuración
+de la aplicación se toma de las variables de entorno, ej:
+
+    APPS_SCRIPT_BATCH=True PROCESAMIENTO_ASINCRONO=False \\
+        python benchmarks/carga_formularios.py --local --tasa 2 --duracion 60 --gas-escala 0.2
+
+Con el procesamiento asíncrono, --esperar consulta /formulario/<id>/estado hasta que
+cada formulario termine y reporta también la latencia del procesamiento completo.
+
+Uso: python benchmarks/carga_formularios.py (--url http://localhost:5000 | --local)
+         [--tasa 1] [--duracion 60] [--concurrencia 20] [--esperar] [--semilla 1]
+         [--json salida.json] [opciones --gas-* de apps_script_local.py]
+"""
+
+import os
+import sys
+import atexit
+import json
+import math
+import time
+import uuid
+import random
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+import apps_script_local
+
+# Variables de entorno que definen la configuración comparada (se guardan en el JSON)
+VARIABLES_CONFIGURACION = (
+    'PROCESAMIENTO_ASINCRONO', 'APPS_SCRIPT_BATCH', 'PDF_RENDER_MODE', 'EMAIL_RESUMEN',
+    'GUARDAR_PDF_DRIVE', 'JOB_WORKERS', 'SQLITE_PROFILE', 'APPS_SCRIPT_POOL_SIZE',
+    'APPS_SCRIPT_RATE_LIMIT', 'APPS_SCRIPT_TASAS', 'PDF_WORKERS'
+)
+
+_APELLIDOS = ('García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Díaz')
+_NOMBRES = ('María Elena', 'Juan Carlos', 'Ana', 'Luis', 'Carolina', 'Pablo', 'Lucía', 'Martín', 'Sofía', 'Diego')
+_DEPARTAMENTOS = ('Departamento de Biología', 'Departamento de Física', 'Departamento de Química',
+                  'Departamento de Matemática', 'Departamento de Geología')
+_TEMAS = ('observación científica', 'energías renovables', 'química de los alimentos', 'geometría en el aula',
+          'los fósiles de la Patagonia', 'el agua y sus estados', 'astronomía para chicos')
+_GRADOS = ('4to Grado', '5to Grado', '6to Grado', '7mo Grado', '1er Año', '2do Año')
+_MESES = ('Marzo', 'Abril', 'Mayo', 'Junio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre')
+_CLAUSTROS = ('Docente', 'Estudiante', 'No docente', 'Graduado')
+
+
+def crear_formulario(rng, numero):
+    """Datos de un formulario como los envía formulario.html, con equipo y períodos"""
+    def persona():
+        return f'{rng.choice(_APELLIDOS)}, {rng.choice(_NOMBRES)}'
+
+    docente = persona()
+    usuario = docente.split(',')[0].lower().translate(str.maketrans('áéíóú', 'aeiou'))
+    equipo = [
+        {'apellido_nombre': persona(), 'dni': str(rng.randint(20000000, 45000000)),
+         'correo': f'miembro{j}.{numero}@uncoma.edu.ar', 'claustro': rng.choice(_CLAUSTROS)}
+        for j in range(rng.randint(0, 6))
+    ]
+    ano = 2025 + rng.randint(0, 1)
+    periodos = [{'ano': str(ano), 'meses': sorted(rng.sample(_MESES, rng.randint(1, 3)), key=_MESES.index)}]
+    tema = rng.choice(_TEMAS)
+    return {
+        'titulo_actividad': f'Taller de {tema} ({numero})',
+        'docente_responsable': docente,
+        'email_responsable': f'{usuario}.{numero}@uncoma.edu.ar',
+        'dni_responsable': str(rng.randint(20000000, 45000000)),
+        'departamento': rng.choice(_DEPARTAMENTOS),
+        'equipo': json.dumps(equipo, ensure_ascii=False),
+        'fundamentacion': f'La actividad sobre {tema} busca acercar la ciencia a las escuelas. ' * rng.randint(5, 30),
+        'objetivos': 'Promover la curiosidad y el trabajo en equipo. ' * rng.randint(3, 15),
+        'metodologia': 'Trabajo en grupos con experiencias guiadas y puesta en común. ' * rng.randint(3, 20),
+        'grados': ', '.join(rng.sample(_GRADOS, rng.randint(1, 3))),
+        'materiales_presupuesto': 'Lupas, microscopios y material impreso. ' * rng.randint(0, 5),
+        'periodos': json.dumps(periodos, ensure_ascii=False),
+        'idempotency_key': f'carga-{uuid.uuid4().hex}'
+    }
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def resumen_latencias(valores):
+    valores = sorted(valores)
+    return {
+        'cantidad': len(valores),
+        'p50': percentil(valores, 50),
+        'p95': percentil(valores, 95),
+        'p99': percentil(valores, 99),
+        'max': valores[-1] if valores else None
+    }
+
+
+class Carga:
+    """Envía formularios a una tasa fija y acumula los resultados"""
+
+    def __init__(self, url, tasa, duracion, concurrencia, esperar=False, timeout=120, semilla=None):
+        self.url = url.rstrip('/')
+        self.tasa = tasa
+        self.duracion = duracion
+        self.esperar = esperar
+        self.timeout = timeout
+        self.rng = random.Random(semilla)
+        self.executor = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='carga')
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencias = []
+        self.latencias_procesamiento = []
+        self.errores = {}
+        self.estados = {}
+        self.enviados = 0
+
+    def _sesion(self):
+        # Una sesión por hilo (requests.Session no es segura entre hilos)
+        if not hasattr(self.local, 'sesion'):
+            self.local.sesion = requests.Session()
+        return self.local.sesion
+
+    def _error(self, causa):
+        with self.lock:
+            self.errores[causa] = self.errores.get(causa, 0) + 1
+
+    def enviar(self, formulario, previsto):
+        try:
+            respuesta = self._sesion().post(f'{self.url}/enviar_formulario', data=formulario,
+                                            allow_redirects=False, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._error(type(e).__name__)
+            return
+        latencia = time.perf_counter() - previsto
+
+        if respuesta.status_code in (301, 302, 303) and '/confirmacion/' in respuesta.headers.get('Location', ''):
+            with self.lock:
+                self.latencias.append(latencia)
+            if self.esperar:
+                formulario_id = respuesta.headers['Location'].rstrip('/').rsplit('/', 1)[-1]
+                self.esperar_procesamiento(formulario_id, previsto)
+            return
+
+        try:
+            mensaje = respuesta.json().get('message', '')
+        except ValueError:
+            mensaje = ''
+        # Agrupar por código y comienzo del mensaje (sin el detalle variable)
+        self._error(f'HTTP {respuesta.status_code}: {mensaje[:70]}'.rstrip(': '))
+
+    def esperar_procesamiento(self, formulario_id, previsto):
+        limite = time.perf_counter() + self.timeout
+        estado = 'sin_terminar'
+        while time.perf_counter() < limite:
+            try:
+                respuesta = self._sesion().get(f'{self.url}/formulario/{formulario_id}/estado', timeout=10)
+                datos = respuesta.json()['data']
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                time.sleep(0.5)
+                continue
+            job = datos.get('job') or {}
+            if datos['estado'] == 'procesado' or (datos['estado'] == 'error' and job.get('estado') != 'pendiente'):
+                estado = datos['estado']
+                break
+            time.sleep(0.2)
+        with self.lock:
+            self.estados[estado] = self.estados.get(estado, 0) + 1
+            if estado == 'procesado':
+                self.latencias_procesamiento.append(time.perf_counter() - previsto)
+
+    def ejecutar(self):
+        """Programa los envíos y espera a que terminen todos"""
+        total = int(self.tasa * self.duracion)
+        futuros = []
+        inicio = time.perf_counter()
+        for i in range(total):
+            previsto = inicio + i / self.tasa
+            espera = previsto - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            futuros.append(self.executor.submit(self.enviar, crear_formulario(self.rng, i + 1), previsto))
+            self.enviados += 1
+        for futuro in futuros:
+            futuro.result()
+        self.executor.shutdown()
+        return time.perf_counter() - inicio
+
+
+def iniciar_local(args, directorio):
+    """Levanta Apps Script local y la aplicación en este proceso. Devuelve (url, servidores, simulador)"""
+    simulador = apps_script_local.desde_argumentos(args, 'gas-')
+    servidor_gas = apps_script_local.crear_servidor(simulador)
+    threading.Thread(target=servidor_gas.serve_forever, daemon=True).start()
+
+    # Base de datos y archivos de estado (caché, limitador, métricas) en el directorio temporal
+    os.environ['DATABASE_PATH'] = os.path.join(directorio, 'formularios.db')
+    os.environ['GOOGLE_APPS_SCRIPT_URL'] = f'http://127.0.0.1:{servidor_gas.server_address[1]}/exec'
+    os.environ['GOOGLE_APPS_SCRIPT_TOKEN'] = args.gas_token
+    os.environ.setdefault('GOOGLE_DRIVE_ROOT_FOLDER_ID', 'carpeta-raiz-local')
+    os.environ.setdefault('TEMPLATE_DOC_ID', 'plantilla-local')
+    os.environ.setdefault('EMAIL_SECRETARIA', 'secretaria@example.com')
+
+    os.environ.setdefault('LOG_NIVELES', 'werkzeug=WARNING')
+
+    from utils import logs
+    logs.configurar(os.path.join(directorio, 'pilar.log'), nivel=os.getenv('LOG_LEVEL', 'WARNING'))
+
+    import app as aplicacion
+    from models import db
+    from werkzeug.serving import make_server
+
+    with aplicacion.app.app_context():
+        db.create_all()
+    aplicacion.iniciar_cola_trabajos()
+    servidor_app = make_server('127.0.0.1', 0, aplicacion.app, threaded=True)
+    threading.Thread(target=servidor_app.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{servidor_app.server_port}', (servidor_app, servidor_gas), simulador
+
+
+def mostrar_latencias(titulo, resumen):
+    if not resumen['cantidad']:
+        return
+    print(f"   {titulo:32s} p50 {resumen['p50'] * 1000:8.0f} ms   p95 {resumen['p95'] * 1000:8.0f} ms"
+          f"   p99 {resumen['p99'] * 1000:8.0f} ms   max {resumen['max'] * 1000:8.0f} ms")
+
+
+def ejecutar(args):
+    directorio = None
+    if args.local:
+        directorio = tempfile.mkdtemp(prefix='pilar-carga-')
+        if not args.conservar:
+            # Registrado antes que el guardado final de las métricas, para que se ejecute después
+            atexit.register(shutil.rmtree, directorio, True)
+    servidores = ()
+    simulador = None
+    try:
+        url = args.url
+        if args.local:
+            url, servidores, simulador = iniciar_local(args, directorio)
+            print(f"🧪 Aplicación local en {url} (archivos en {directorio})")
+
+        configuracion = {variable: os.getenv(variable) for variable in VARIABLES_CONFIGURACION if os.getenv(variable)}
+        print(f"📨 {args.tasa} formularios/s durante {args.duracion} s contra {url}")
+        if configuracion:
+            print(f"   Configuración: {', '.join(f'{k}={v}' for k, v in configuracion.items())}")
+
+        carga = Carga(url, args.tasa, args.duracion, args.concurrencia, args.esperar, args.timeout, args.semilla)
+        duracion_real = carga.ejecutar()
+
+        exitosos = len(carga.latencias)
+        respuesta = resumen_latencias(carga.latencias)
+        procesamiento = resumen_latencias(carga.latencias_procesamiento)
+        print(f"\n📊 Resultados")
+        print(f"   Enviados:       {carga.enviados:8d}")
+        print(f"   Aceptados:      {exitosos:8d}")
+        print(f"   Duración:       {duracion_real:8.1f} s")
+        # Con --esperar, el throughput es el de formularios procesados
+        completados = len(carga.latencias_procesamiento) if args.esperar else exitosos
+        print(f"   Throughput:     {completados / duracion_real:8.2f} formularios/s")
+        mostrar_latencias('Respuesta de /enviar_formulario', respuesta)
+        if args.esperar:
+            mostrar_latencias('Procesamiento completo', procesamiento)
+            print(f"   Estados finales: {carga.estados}")
+        if carga.errores:
+            print("\n❌ Errores")
+            for causa, cantidad in sorted(carga.errores.items(), key=lambda item: -item[1]):
+                print(f"   {cantidad:6d}  {causa}")
+
+        estadisticas_gas = simulador.estadisticas() if simulador else None
+        if estadisticas_gas:
+            print("\n📡 Apps Script local")
+            for accion, contadores in sorted(estadisticas_gas.get('acciones', {}).items()):
+                print(f"   {accion:20s} {contadores['llamadas']:6d} llamadas  {contadores['exitosas']:6d} exitosas")
+            for clave in ('rechazadas_simultaneas', 'errores_http', 'cuotas_agotadas'):
+                if estadisticas_gas.get(clave):
+                    print(f"   {clave}: {estadisticas_gas[clave]}")
+
+        if args.salida_json:
+            with open(args.salida_json, 'w', encoding='utf-8') as archivo:
+                json.dump({
+                    'url': url if not args.local else 'local',
+                    'tasa': args.tasa,
+                    'duracion': args.duracion,
+                    'concurrencia': args.concurrencia,
+                    'semilla': args.semilla,
+                    'configuracion': configuracion,
+                    'enviados': carga.enviados,
+                    'aceptados': exitosos,
+                    'duracion_real': round(duracion_real, 3),
+                    'throughput': round(completados / duracion_real, 3),
+                    'latencia_respuesta': respuesta,
+                    'latencia_procesamiento': procesamiento if args.esperar else None,
+                    'estados_finales': carga.estados if args.esperar else None,
+                    'errores': carga.errores,
+                    'apps_script_local': estadisticas_gas
+                }, archivo, indent=2, ensure_ascii=False)
+            print(f"\n💾 Resultado guardado en {args.salida_json}")
+    finally:
+        for servidor in servidores:
+            servidor.shutdown()
+        if args.local:
+            from utils import logs
+            logs.detener()
+            if args.conservar:
+                print(f"📁 Archivos conservados en {directorio}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prueba de carga de /enviar_formulario - Proyecto Pilar')
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--url', help='URL base de una aplicación en ejecución')
+    destino.add_argument('--local', action='store_true',
+                         help='Levantar la aplicación y Apps Script local en este proceso')
+    parser.add_argument('--tasa', type=float, default=1.0, help='Formularios por segundo')
+    parser.add_argument('--duracion', type=float, default=60, help='Segundos de carga')
+    parser.add_argument('--concurrencia', type=int, default=20, help='Máximo de envíos en curso')
+    parser.add_argument('--esperar', action='store_true',
+                        help='Esperar el procesamiento de cada formulario (modo asíncrono)')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--conservar', action='store_true',
+                        help='Con --local, no borrar la base de datos y el log temporales')
+    parser.add_argument('--json', dest='salida_json',
+                       help='Archivo donde guardar el resultado para compararlo entre configuraciones')
+    apps_script_local.agregar_argumentos(parser, 'gas-')
+    args = parser.parse_args()
+
+    ejecutar(args)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporta a un archivo ZIP el PDF de cada formulario enviado,
+filtrando por rango de fechas y estado
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+def exportar(destino, filtros):
+    """Escribe el ZIP en destino a medida que se generan los PDF"""
+    try:
+        from app import app, construir_consulta_formularios, generar_zip_pdfs
+
+        print("📦 Iniciando exportación de formularios...")
+        print(f"📁 Archivo de salida: {destino}")
+
+        with app.app_context():
+            consulta = construir_consulta_formularios(filtros)
+            total = consulta.count()
+            print(f"📋 Formularios a exportar: {total}")
+
+            escritos = 0
+            with open(destino, 'wb') as archivo:
+                for parte in generar_zip_pdfs(consulta):
+                    archivo.write(parte)
+                    escritos += len(parte)
+
+            print(f"\n📊 Tamaño del ZIP: {escritos / (1024 * 1024):.1f} MB")
+            print(f"\n🎉 Exportación completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al exportar los formularios: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exportación de formularios en PDF - Proyecto Pilar')
+    parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD)')
+    parser.add_argument('--hasta', help='Fecha final inclusive (YYYY-MM-DD)')
+    parser.add_argument('--estado', help='Estado de los formularios (pendiente, procesado, error)')
+    parser.add_argument('--output', '-o', default='formularios.zip',
+                       help='Archivo ZIP de salida (por defecto formularios.zip)')
+
+    args = parser.parse_args()
+
+    filtros = {clave: valor for clave, valor in
+               (('desde', args.desde), ('hasta', args.hasta), ('estado', args.estado)) if valor}
+
+    print("=" * 60)
+    print("📦 EXPORTACIÓN DE FORMULARIOS - PROYECTO PILAR")
+    print("=" * 60)
+
+    success = exportar(args.output, filtros)
+
+    if success:
+        print(f"\n✅ Exportación exitosa: {args.output}")
+    else:
+        print("\n❌ La exportación falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de migración para agregar el campo id_correlacion (ID del request que
+envió el formulario, presente en los logs de Flask y de Apps Script)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+def migrate_database():
+    """Agregar la columna id_correlacion y su índice a la tabla existente"""
+    try:
+        from app import app
+        from models import db
+
+        print("🔧 Iniciando migración de base de datos...")
+        print(f"📁 Directorio del proyecto: {project_dir}")
+
+        with app.app_context():
+            from sqlalchemy import inspect
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('formularios_actividad')]
+
+            with db.engine.begin() as connection:
+                if 'id_correlacion' not in columns:
+                    print("➕ Agregando columna id_correlacion...")
+                    connection.execute(db.text(
+                        "ALTER TABLE formularios_actividad ADD COLUMN id_correlacion VARCHAR(64)"
+                    ))
+                    print("✅ Columna id_correlacion agregada")
+                else:
+                    print("ℹ️  Columna id_correlacion ya existe")
+
+                # Los formularios anteriores quedan con NULL
+                connection.execute(db.text(
+                    "CREATE INDEX IF NOT EXISTS ix_formularios_actividad_id_correlacion "
+                    "ON formularios_actividad (id_correlacion)"
+                ))
+                print("✅ Índice de id_correlacion disponible")
+
+            print(f"\n🎉 Migración completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al migrar la base de datos: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🗃️  MIGRACIÓN DE BASE DE DATOS - PROYECTO PILAR")
+    print("=" * 60)
+    print("Agregando campo: id_correlacion")
+    print("=" * 60)
+
+    success = migrate_database()
+
+    if success:
+        print("\n✅ Migración exitosa. Puede ejecutar la aplicación normalmente.")
+    else:
+        print("\n❌ La migración falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
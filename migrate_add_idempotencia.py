@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de migración para agregar el campo clave_idempotencia (con índice único)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+def migrate_database():
+    """Agregar la columna clave_idempotencia y su índice único a la tabla existente"""
+    try:
+        from app import app
+        from models import db
+
+        print("🔧 Iniciando migración de base de datos...")
+        print(f"📁 Directorio del proyecto: {project_dir}")
+
+        with app.app_context():
+            from sqlalchemy import inspect
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('formularios_actividad')]
+
+            print(f"📋 Columnas actuales en formularios_actividad: {columns}")
+
+            with db.engine.begin() as connection:
+                if 'clave_idempotencia' not in columns:
+                    print("➕ Agregando columna clave_idempotencia...")
+                    connection.execute(db.text(
+                        "ALTER TABLE formularios_actividad ADD COLUMN clave_idempotencia VARCHAR(80)"
+                    ))
+                    print("✅ Columna clave_idempotencia agregada")
+                else:
+                    print("ℹ️  Columna clave_idempotencia ya existe")
+
+                # Los registros anteriores quedan con NULL, que SQLite no considera duplicado
+                connection.execute(db.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_formularios_actividad_clave_idempotencia "
+                    "ON formularios_actividad (clave_idempotencia)"
+                ))
+                print("✅ Índice único de clave_idempotencia disponible")
+
+            print(f"\n🎉 Migración completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al migrar la base de datos: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🗃️  MIGRACIÓN DE BASE DE DATOS - PROYECTO PILAR")
+    print("=" * 60)
+    print("Agregando campo: clave_idempotencia")
+    print("=" * 60)
+
+    success = migrate_database()
+
+    if success:
+        print("\n✅ Migración exitosa. Puede ejecutar la aplicación normalmente.")
+    else:
+        print("\n❌ La migración falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de migración para crear los índices secundarios de formularios_actividad
+y verificar con EXPLAIN QUERY PLAN que las consultas habituales los utilizan
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+# Script que agrega cada columna posterior a la tabla original (ver DATABASE_SCHEMA.md)
+MIGRACION_DE_COLUMNA = {
+    'clave_idempotencia': 'migrate_add_idempotencia.py',
+    'pdf_file_id': 'migrate_add_pdf_file_id.py',
+    'id_correlacion': 'migrate_add_id_correlacion.py',
+}
+
+
+def columnas_faltantes(inspector):
+    """Columnas del modelo que todavía no existen en formularios_actividad"""
+    from models import FormularioActividad
+
+    existentes = {columna['name'] for columna in inspector.get_columns('formularios_actividad')}
+    return [columna.name for columna in FormularioActividad.__table__.columns if columna.name not in existentes]
+
+
+def avisar_columnas_faltantes(faltantes):
+    for columna in faltantes:
+        script = MIGRACION_DE_COLUMNA.get(columna, 'la migración correspondiente')
+        print(f"⚠️  Falta la columna {columna}: ejecutar antes python {script}")
+
+
+def migrate_database():
+    """Crear los índices declarados en el modelo que falten en la base de datos"""
+    try:
+        from app import app
+        from models import db, FormularioActividad
+
+        print("🔧 Iniciando migración de índices...")
+        print(f"📁 Directorio del proyecto: {project_dir}")
+
+        with app.app_context():
+            from sqlalchemy import inspect
+            inspector = inspect(db.engine)
+            existentes = {index['name'] for index in inspector.get_indexes('formularios_actividad')}
+
+            print(f"📋 Índices actuales en formularios_actividad: {sorted(existentes)}")
+            faltantes = set(columnas_faltantes(inspector))
+
+            # CREATE INDEX IF NOT EXISTS es idempotente; cada índice se crea en su propia
+            # transacción corta para no bloquear las escrituras de la aplicación más de lo necesario.
+            for index in sorted(FormularioActividad.__table__.indexes, key=lambda index: index.name):
+                if index.name in existentes:
+                    print(f"ℹ️  Índice {index.name} ya existe")
+                    continue
+                # Los índices de columnas agregadas por otra migración los crea esa migración
+                sin_columna = [columna.name for columna in index.columns if columna.name in faltantes]
+                if sin_columna:
+                    print(f"⏭️  Índice {index.name} omitido: falta la columna {', '.join(sin_columna)}")
+                    continue
+
+                print(f"➕ Creando índice {index.name}...")
+                with db.engine.begin() as connection:
+                    index.create(connection, checkfirst=True)
+                print(f"✅ Índice {index.name} creado")
+
+            # Actualizar estadísticas para que el planificador elija los índices
+            with db.engine.begin() as connection:
+                connection.execute(db.text("ANALYZE formularios_actividad"))
+
+            avisar_columnas_faltantes(sorted(faltantes))
+            print(f"\n🎉 Migración completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al migrar la base de datos: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+def query_plans():
+    """Devuelve el plan de ejecución de cada consulta auxiliar del modelo"""
+    from models import db, FormularioActividad
+
+    consultas = {
+        'recientes': FormularioActividad.recientes(),
+        'con_estado': FormularioActividad.con_estado('error'),
+        'por_dni': FormularioActividad.por_dni('12345678'),
+        'por_email': FormularioActividad.por_email('docente@uncoma.edu.ar'),
+    }
+
+    planes = {}
+    for nombre, consulta in consultas.items():
+        compilada = consulta.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        filas = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compilada}")).fetchall()
+        planes[nombre] = [fila[-1] for fila in filas]
+    return planes
+
+
+def verify_indexes():
+    """Verificar que las consultas auxiliares usan índices y no recorren toda la tabla"""
+    try:
+        from app import app
+
+        print("🔍 Verificando planes de ejecución...")
+
+        with app.app_context():
+            # Las consultas del modelo leen todas sus columnas: sin las columnas nuevas fallarían
+            from sqlalchemy import inspect
+            from models import db
+            faltantes = columnas_faltantes(inspect(db.engine))
+            if faltantes:
+                avisar_columnas_faltantes(faltantes)
+                return False
+
+            ok = True
+            for nombre, plan in query_plans().items():
+                usa_indice = any('USING INDEX' in paso or 'USING COVERING INDEX' in paso for paso in plan)
+                escaneo_completo = any(paso.startswith('SCAN') and 'INDEX' not in paso for paso in plan)
+                if usa_indice and not escaneo_completo:
+                    print(f"   ✅ {nombre}: {' | '.join(plan)}")
+                else:
+                    ok = False
+                    print(f"   ❌ {nombre}: {' | '.join(plan)}")
+            return ok
+
+    except Exception as e:
+        print(f"❌ Error al verificar los índices: {str(e)}")
+        return False
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Índices de formularios_actividad - Proyecto Pilar')
+    parser.add_argument('--check', action='store_true',
+                       help='Solo verificar los planes de ejecución, sin crear índices')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗃️  MIGRACIÓN DE ÍNDICES - PROYECTO PILAR")
+    print("=" * 60)
+
+    success = True
+    if not args.check:
+        success = migrate_database()
+
+    if success:
+        success = verify_indexes()
+
+    if success:
+        print("\n✅ Índices verificados. Puede ejecutar la aplicación normalmente.")
+    else:
+        print("\n❌ La migración o la verificación falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de migración para agregar el campo pdf_file_id (PDF del documento
+guardado en Google Drive) y, opcionalmente, exportar el PDF de los
+formularios ya procesados
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+def migrate_database(exportar=False, limite=None):
+    """Agregar la columna pdf_file_id y guardar en Drive el PDF de los formularios procesados"""
+    try:
+        from app import app, obtener_pdf_drive
+        from models import db, FormularioActividad
+        from utils.rate_limiter import CuotaAgotada
+
+        print("🔧 Iniciando migración de base de datos...")
+        print(f"📁 Directorio del proyecto: {project_dir}")
+
+        with app.app_context():
+            from sqlalchemy import inspect
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('formularios_actividad')]
+
+            with db.engine.begin() as connection:
+                if 'pdf_file_id' not in columns:
+                    print("➕ Agregando columna pdf_file_id...")
+                    connection.execute(db.text(
+                        "ALTER TABLE formularios_actividad ADD COLUMN pdf_file_id VARCHAR(100)"
+                    ))
+                    print("✅ Columna pdf_file_id agregada")
+                else:
+                    print("ℹ️  Columna pdf_file_id ya existe")
+
+            if exportar:
+                consulta = FormularioActividad.query.filter(
+                    FormularioActividad.estado == 'procesado',
+                    FormularioActividad.documento_id.isnot(None),
+                    FormularioActividad.pdf_file_id.is_(None)
+                ).order_by(FormularioActividad.id)
+                if limite:
+                    consulta = consulta.limit(limite)
+                ids = [fila.id for fila in consulta.with_entities(FormularioActividad.id)]
+                print(f"📋 Formularios sin PDF guardado: {len(ids)}")
+
+                exportados = 0
+                errores = []
+                for formulario_id in ids:
+                    formulario = db.session.get(FormularioActividad, formulario_id)
+                    try:
+                        pdf_file_id = obtener_pdf_drive(formulario)
+                    except CuotaAgotada as e:
+                        # Se puede volver a ejecutar: solo procesa los que siguen sin PDF
+                        print(f"⚠️  {e}. Se detiene la exportación.")
+                        break
+                    if pdf_file_id:
+                        exportados += 1
+                        print(f"   ➕ Formulario {formulario_id}: {pdf_file_id}")
+                    else:
+                        errores.append(formulario_id)
+
+                print(f"\n📊 PDF guardados: {exportados}")
+                if errores:
+                    print(f"⚠️  {len(errores)} formularios no se pudieron exportar: {errores}")
+
+            print(f"\n🎉 Migración completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al migrar la base de datos: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Campo pdf_file_id de formularios_actividad - Proyecto Pilar')
+    parser.add_argument('--exportar', action='store_true',
+                       help='Guardar en Drive el PDF de los formularios procesados que aún no lo tienen')
+    parser.add_argument('--limite', type=int,
+                       help='Cantidad máxima de formularios a exportar en esta ejecución')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗃️  MIGRACIÓN DE BASE DE DATOS - PROYECTO PILAR")
+    print("=" * 60)
+    print("Agregando campo: pdf_file_id")
+    print("=" * 60)
+
+    success = migrate_database(args.exportar, args.limite)
+
+    if success:
+        print("\n✅ Migración exitosa. Puede ejecutar la aplicación normalmente.")
+    else:
+        print("\n❌ La migración falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
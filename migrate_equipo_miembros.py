@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de migración para normalizar el equipo de trabajo:
+crea la tabla equipo_miembros y convierte por lotes el contenido de
+formularios_actividad.equipo_json en filas de esa tabla. También valida
+periodos_json: las respuestas JSON insertan ese texto tal cual, por lo que
+los valores que no son un arreglo JSON válido se borran (y se listan)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio del proyecto al path
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+# Configurar variables de entorno
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+def migrate_database(batch_size=200):
+    """Crear equipo_miembros y migrar los equipos guardados como JSON"""
+    try:
+        from app import app
+        from models import db, FormularioActividad, EquipoMiembro
+        from utils.serializacion import cargar_lista
+
+        print("🔧 Iniciando migración del equipo de trabajo...")
+        print(f"📁 Directorio del proyecto: {project_dir}")
+
+        with app.app_context():
+            # Crear la tabla (y sus índices) si no existe
+            EquipoMiembro.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla equipo_miembros disponible")
+
+            ultimo_id = 0
+            migrados = 0
+            miembros_creados = 0
+            errores = []
+            sin_migrar = []
+
+            while True:
+                # Lote de formularios con equipo en JSON, recorridos por id para poder
+                # interrumpir y reanudar la migración sin repetir trabajo
+                lote = db.session.query(
+                    FormularioActividad.id, FormularioActividad.equipo_json
+                ).filter(
+                    FormularioActividad.id > ultimo_id,
+                    FormularioActividad.equipo_json.isnot(None)
+                ).order_by(FormularioActividad.id).limit(batch_size).all()
+
+                if not lote:
+                    break
+
+                for formulario_id, equipo_json in lote:
+                    ultimo_id = formulario_id
+                    equipo = cargar_lista(equipo_json)
+                    if equipo is None or not all(isinstance(miembro, dict) for miembro in equipo):
+                        # La aplicación ya lo mostraba como equipo vacío
+                        errores.append((formulario_id, 'equipo_json', equipo_json))
+                        db.session.query(FormularioActividad).filter_by(id=formulario_id).update(
+                            {'equipo_json': None}, synchronize_session=False
+                        )
+                        continue
+
+                    try:
+                        miembros = [EquipoMiembro.from_dict(miembro, orden) for orden, miembro in enumerate(equipo)]
+                    except ValueError as e:
+                        # JSON válido con claves que la tabla no guarda: se conserva sin migrar
+                        sin_migrar.append((formulario_id, str(e)))
+                        continue
+
+                    for miembro_db in miembros:
+                        miembro_db.formulario_id = formulario_id
+                        db.session.add(miembro_db)
+                        miembros_creados += 1
+
+                    # El JSON ya está representado en la tabla normalizada
+                    db.session.query(FormularioActividad).filter_by(id=formulario_id).update(
+                        {'equipo_json': None}, synchronize_session=False
+                    )
+                    migrados += 1
+
+                # Una transacción por lote para no retener el lock de escritura
+                db.session.commit()
+                print(f"   ➕ Lote hasta id {ultimo_id}: {migrados} formularios, {miembros_creados} miembros")
+
+            errores.extend(limpiar_periodos_invalidos(batch_size))
+
+            print(f"\n📊 Formularios migrados: {migrados}")
+            print(f"📊 Miembros creados: {miembros_creados}")
+            if sin_migrar:
+                print(f"⚠️  {len(sin_migrar)} formularios con datos de miembros no admitidos (se dejaron en equipo_json):")
+                for formulario_id, error in sin_migrar:
+                    print(f"   - {formulario_id}: {error}")
+            if errores:
+                print(f"⚠️  {len(errores)} valores que no eran un arreglo JSON válido (se borraron):")
+                for formulario_id, columna, texto in errores:
+                    print(f"   - {formulario_id} {columna}: {texto}")
+
+            print(f"\n🎉 Migración completada exitosamente!")
+
+    except Exception as e:
+        print(f"❌ Error al migrar la base de datos: {str(e)}")
+        print(f"🔍 Tipo de error: {type(e).__name__}")
+        import traceback
+        print(f"📋 Traceback completo:\n{traceback.format_exc()}")
+        return False
+
+    return True
+
+
+def limpiar_periodos_invalidos(batch_size):
+    """Borra los periodos_json que no son un arreglo JSON válido.
+    Devuelve la lista de (id, columna, texto original)"""
+    from models import db, FormularioActividad
+    from utils.serializacion import cargar_lista
+
+    ultimo_id = 0
+    errores = []
+    while True:
+        lote = db.session.query(
+            FormularioActividad.id, FormularioActividad.periodos_json
+        ).filter(
+            FormularioActividad.id > ultimo_id,
+            FormularioActividad.periodos_json.isnot(None)
+        ).order_by(FormularioActividad.id).limit(batch_size).all()
+
+        if not lote:
+            break
+
+        for formulario_id, periodos_json in lote:
+            ultimo_id = formulario_id
+            if cargar_lista(periodos_json) is None:
+                errores.append((formulario_id, 'periodos_json', periodos_json))
+                db.session.query(FormularioActividad).filter_by(id=formulario_id).update(
+                    {'periodos_json': None}, synchronize_session=False
+                )
+        db.session.commit()
+
+    print(f"✅ periodos_json validado ({len(errores)} inválidos)")
+    return errores
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migración de equipo_json a equipo_miembros - Proyecto Pilar')
+    parser.add_argument('--batch-size', type=int, default=200,
+                       help='Cantidad de formularios por transacción (por defecto 200)')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗃️  MIGRACIÓN DE BASE DE DATOS - PROYECTO PILAR")
+    print("=" * 60)
+    print("Normalizando equipo_json en la tabla equipo_miembros")
+    print("=" * 60)
+
+    success = migrate_database(args.batch_size)
+
+    if success:
+        print("\n✅ Migración exitosa. Puede ejecutar la aplicación normalmente.")
+    else:
+        print("\n❌ La migración falló. Revise los errores anteriores.")
+
+    sys.exit(0 if success else 1)
@@ -16,17 +16,21 @@ class FormularioActividad(db.Model):
     dni_responsable = db.Column(db.String(20), nullable=False)  # DNI del docente responsable
     departamento = db.Column(db.String(200))  # Departamento/Instituto de pertenencia
     
-    # Equipo (guardado como JSON)
-    equipo_json = db.Column(db.Text)  # JSON string con el array de miembros del equipo
+    # Los campos de texto largo y los JSON son diferidos (grupo 'contenido'): solo se leen
+    # de la base de datos cuando se accede a ellos o la consulta los pide explícitamente.
     
-    fundamentacion = db.Column(db.Text, nullable=False)
-    objetivos = db.Column(db.Text, nullable=False)
-    metodologia = db.Column(db.Text, nullable=False)
+    # Equipo: normalizado en la tabla equipo_miembros (relación 'miembros').
+    # equipo_json se conserva solo para formularios anteriores aún no migrados.
+    equipo_json = db.deferred(db.Column(db.Text), group='contenido')  # JSON string con el array de miembros del equipo
+    
+    fundamentacion = db.deferred(db.Column(db.Text, nullable=False), group='contenido')
+    objetivos = db.deferred(db.Column(db.Text, nullable=False), group='contenido')
+    metodologia = db.deferred(db.Column(db.Text, nullable=False), group='contenido')
     grados = db.Column(db.Text)
-    materiales_presupuesto = db.Column(db.Text)
+    materiales_presupuesto = db.deferred(db.Column(db.Text), group='contenido')
     
     # Períodos (año + meses) guardado como JSON
-    periodos_json = db.Column(db.Text)  # JSON string con formato [{"ano": "2025", "meses": ["Marzo", "Abril"]}, ...]
+    periodos_json = db.deferred(db.Column(db.Text), group='contenido')  # JSON string con formato [{"ano": "2025", "meses": ["Marzo", "Abril"]}, ...]
     meses = db.Column(db.Text)  # Texto legible de períodos para mostrar (ej: "2025: Marzo, Abril | 2026: Mayo")
     
     # Metadatos del formulario
@@ -36,69 +40,307 @@ class FormularioActividad(db.Model):
     # IDs de Google Drive
     documento_id = db.Column(db.String(100))  # ID del documento generado en Google Drive
     carpeta_id = db.Column(db.String(100))    # ID de la carpeta en Google Drive
+    pdf_file_id = db.Column(db.String(100))   # ID del PDF del documento guardado en la misma carpeta
     
     # Estado del procesamiento
     estado = db.Column(db.String(50), default='pendiente')  # pendiente, procesado, error
     
+    # Clave de idempotencia del envío (del formulario web o derivada del contenido)
+    clave_idempotencia = db.Column(db.String(80), unique=True)
+    
+    # ID de correlación del request que lo envió (aparece en los logs de Flask y de Apps Script)
+    id_correlacion = db.Column(db.String(64), index=True)
+    
+    # Índices para los patrones de acceso habituales. id es el rowid de SQLite, por lo que
+    # cada índice queda implícitamente ordenado también por id (clave de paginación).
+    __table_args__ = (
+        db.Index('ix_formularios_actividad_fecha_creacion', 'fecha_creacion'),
+        db.Index('ix_formularios_actividad_estado_fecha', 'estado', 'fecha_creacion'),
+        db.Index('ix_formularios_actividad_dni_fecha', 'dni_responsable', 'fecha_creacion'),
+        db.Index('ix_formularios_actividad_email_fecha', 'email_responsable', 'fecha_creacion'),
+    )
+    
+    miembros = db.relationship(
+        'EquipoMiembro',
+        backref='formulario',
+        order_by='EquipoMiembro.orden',
+        cascade='all, delete-orphan'
+    )
+    
     @property
     def equipo(self):
-        """Deserializa el equipo desde JSON"""
-        if self.equipo_json:
-            try:
-                return json.loads(self.equipo_json)
-            except:
-                return []
-        return []
+        """Lista de miembros del equipo como diccionarios"""
+        if self.miembros:
+            return [miembro.to_dict() for miembro in self.miembros]
+        # Formularios anteriores a la tabla equipo_miembros
+        return self._decodificar_json('equipo_json')
     
     @equipo.setter
     def equipo(self, value):
-        """Serializa el equipo a JSON"""
-        if value:
-            self.equipo_json = json.dumps(value)
-        else:
-            self.equipo_json = None
+        """Reemplaza los miembros del equipo a partir de una lista de diccionarios.
+        Lanza ValueError si un miembro trae claves desconocidas (ver EquipoMiembro.validar)."""
+        self.miembros = [EquipoMiembro.from_dict(miembro, orden) for orden, miembro in enumerate(value or [])]
+        self.equipo_json = None
     
     @property
     def periodos(self):
-        """Deserializa los períodos desde JSON"""
-        if self.periodos_json:
-            try:
-                return json.loads(self.periodos_json)
-            except:
-                return []
-        return []
+        """Deserializa los períodos desde JSON (decodificado una sola vez por instancia)"""
+        return self._decodificar_json('periodos_json')
     
     @periodos.setter
     def periodos(self, value):
-        """Serializa los períodos a JSON"""
+        """Serializa los períodos a JSON. Solo se guardan listas de JSON estricto (sin NaN):
+        utils/serializacion.py inserta el texto almacenado tal cual en las respuestas."""
+        if value and not isinstance(value, list):
+            raise ValueError('Los períodos deben ser una lista')
         if value:
-            self.periodos_json = json.dumps(value)
+            self.periodos_json = json.dumps(value, allow_nan=False)
+            self._json_cache['periodos_json'] = (self.periodos_json, value)
         else:
             self.periodos_json = None
     
+    @property
+    def _json_cache(self):
+        """Caché por instancia de los JSON decodificados: {atributo: (texto, valor)}"""
+        return self.__dict__.setdefault('_json_cache_data', {})
+    
+    def _decodificar_json(self, atributo):
+        """Decodifica una columna JSON reutilizando el resultado mientras el texto no cambie.
+        El valor devuelto es compartido: no debe modificarse en el lugar."""
+        texto = getattr(self, atributo)
+        if not texto:
+            return []
+        
+        cache = self._json_cache
+        entrada = cache.get(atributo)
+        if entrada is not None and entrada[0] is texto:
+            return entrada[1]
+        
+        try:
+            valor = json.loads(texto)
+        except:
+            valor = []
+        cache[atributo] = (texto, valor)
+        return valor
+    
+    @classmethod
+    def recientes(cls):
+        """Formularios ordenados del más reciente al más antiguo (usa el índice de fecha)"""
+        return cls.query.order_by(cls.fecha_creacion.desc(), cls.id.desc())
+    
+    @classmethod
+    def con_estado(cls, estado):
+        """Formularios en un estado, del más antiguo al más reciente (ej. reintentar 'error')"""
+        return cls.query.filter(cls.estado == estado).order_by(cls.fecha_creacion, cls.id)
+    
+    @classmethod
+    def por_dni(cls, dni):
+        """Formularios de un docente responsable por DNI"""
+        return cls.query.filter(cls.dni_responsable == dni.strip()).order_by(cls.fecha_creacion.desc())
+    
+    @classmethod
+    def por_email(cls, email):
+        """Formularios de un docente responsable por email"""
+        return cls.query.filter(cls.email_responsable == email.strip()).order_by(cls.fecha_creacion.desc())
+    
+    # Campos disponibles en to_dict(), en orden
+    CAMPOS = (
+        'id', 'titulo_actividad', 'docente_responsable', 'email_responsable', 'dni_responsable',
+        'departamento', 'equipo', 'fundamentacion', 'objetivos', 'metodologia', 'grados',
+        'materiales_presupuesto', 'periodos', 'meses', 'fecha_creacion', 'fecha_modificacion',
+        'documento_id', 'carpeta_id', 'pdf_file_id', 'estado', 'id_correlacion'
+    )
+    
+    # Representación resumida para listados: no incluye ningún campo del grupo 'contenido'
+    CAMPOS_RESUMEN = (
+        'id', 'titulo_actividad', 'docente_responsable', 'email_responsable', 'dni_responsable',
+        'departamento', 'meses', 'fecha_creacion', 'fecha_modificacion', 'documento_id',
+        'carpeta_id', 'pdf_file_id', 'estado'
+    )
+    
+    # Campos de to_dict() que se calculan a partir de otra columna
+    COLUMNAS_POR_CAMPO = {
+        'equipo': 'equipo_json',
+        'periodos': 'periodos_json'
+    }
+    
+    @classmethod
+    def opciones_carga(cls, campos):
+        """Opciones de consulta que cargan solo las columnas necesarias para 'campos'.
+        id y fecha_creacion se cargan siempre (clave de paginación)."""
+        columnas = {'id', 'fecha_creacion'}
+        for campo in campos:
+            columnas.add(cls.COLUMNAS_POR_CAMPO.get(campo, campo))
+        opciones = [db.load_only(*[getattr(cls, columna) for columna in sorted(columnas)])]
+        if 'equipo' in campos:
+            # Una sola consulta adicional para los miembros de todos los formularios
+            opciones.append(db.selectinload(cls.miembros))
+        return opciones
+    
+    def to_dict(self, campos=None):
+        """Convierte el objeto a diccionario para facilitar el uso.
+        Con 'campos' solo se incluyen (y se leen) esas claves."""
+        if campos is None:
+            campos = self.CAMPOS
+        return {campo: self._valor_campo(campo) for campo in campos}
+    
+    def to_summary_dict(self):
+        """Representación resumida (sin textos largos ni JSON)"""
+        return self.to_dict(self.CAMPOS_RESUMEN)
+    
+    def _valor_campo(self, campo):
+        """Valor serializable de un campo de to_dict()"""
+        valor = getattr(self, campo)
+        if campo in ('fecha_creacion', 'fecha_modificacion'):
+            return valor.isoformat() if valor else None
+        return valor
+    
+    def __repr__(self):
+        return f'<FormularioActividad {self.id}: {self.titulo_actividad}>'
+
+class ProcesamientoJob(db.Model):
+    """Trabajo de procesamiento en segundo plano (Google Drive + Email) de un formulario"""
+    __tablename__ = 'procesamiento_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    formulario_id = db.Column(db.Integer, db.ForeignKey('formularios_actividad.id'), nullable=False, index=True)
+    
+    # Estado del trabajo: pendiente, en_proceso, completado, error
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=3)
+    mensaje_error = db.Column(db.Text)
+    
+    # Marcas de tiempo para planificación y recuperación de trabajos abandonados
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_procesamiento_jobs_estado_proximo', 'estado', 'proximo_intento'),
+    )
+    
     def to_dict(self):
-        """Convierte el objeto a diccionario para facilitar el uso"""
+        """Convierte el trabajo a diccionario"""
         return {
             'id': self.id,
-            'titulo_actividad': self.titulo_actividad,
-            'docente_responsable': self.docente_responsable,
-            'email_responsable': self.email_responsable,
-            'dni_responsable': self.dni_responsable,
-            'departamento': self.departamento,
-            'equipo': self.equipo,
-            'fundamentacion': self.fundamentacion,
-            'objetivos': self.objetivos,
-            'metodologia': self.metodologia,
-            'grados': self.grados,
-            'materiales_presupuesto': self.materiales_presupuesto,
-            'periodos': self.periodos,
-            'meses': self.meses,
+            'formulario_id': self.formulario_id,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'max_intentos': self.max_intentos,
+            'mensaje_error': self.mensaje_error,
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            'fecha_modificacion': self.fecha_modificacion.isoformat() if self.fecha_modificacion else None,
-            'documento_id': self.documento_id,
-            'carpeta_id': self.carpeta_id,
-            'estado': self.estado
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None
+        }
+    
+    def __repr__(self):
+        return f'<ProcesamientoJob {self.id}: formulario={self.formulario_id} estado={self.estado}>'
+
+
+class NotificacionResumen(db.Model):
+    """Formulario procesado a la espera de ser incluido en un email de resumen"""
+    __tablename__ = 'notificaciones_resumen'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    formulario_id = db.Column(db.Integer, db.ForeignKey('formularios_actividad.id'), nullable=False, unique=True)
+    
+    # Estado de la entrega: pendiente, enviando, enviado, error
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    mensaje_error = db.Column(db.Text)
+    
+    # Identificador del resumen que reclamó la notificación (uno por envío)
+    lote = db.Column(db.String(36), index=True)
+    
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_reclamo = db.Column(db.DateTime)
+    fecha_envio = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_notificaciones_resumen_estado_fecha', 'estado', 'fecha_creacion'),
+    )
+    
+    def to_dict(self):
+        """Convierte la notificación a diccionario"""
+        return {
+            'id': self.id,
+            'formulario_id': self.formulario_id,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'mensaje_error': self.mensaje_error,
+            'lote': self.lote,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_envio': self.fecha_envio.isoformat() if self.fecha_envio else None
+        }
+    
+    def __repr__(self):
+        return f'<NotificacionResumen {self.id}: formulario={self.formulario_id} estado={self.estado}>'
+
+
+class EquipoMiembro(db.Model):
+    """Miembro del equipo de trabajo de un formulario"""
+    __tablename__ = 'equipo_miembros'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    formulario_id = db.Column(
+        db.Integer,
+        db.ForeignKey('formularios_actividad.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    orden = db.Column(db.Integer, nullable=False, default=0)  # Posición en el formulario
+    
+    apellido_nombre = db.Column(db.String(200))
+    dni = db.Column(db.String(20), index=True)
+    correo = db.Column(db.String(200), index=True)
+    claustro = db.Column(db.String(100), index=True)  # Docente, Estudiante, Nodocente, Graduado u otro
+    
+    # Claves admitidas en el diccionario de cada miembro
+    CAMPOS = ('apellido_nombre', 'dni', 'correo', 'claustro')
+    
+    @classmethod
+    def validar(cls, data):
+        """Lanza ValueError si el miembro no es un diccionario o trae claves desconocidas
+        (no hay dónde guardarlas y se perderían sin aviso)"""
+        if not isinstance(data, dict):
+            raise ValueError('Cada miembro del equipo debe ser un objeto')
+        desconocidos = sorted(str(clave) for clave in data if clave not in cls.CAMPOS)
+        if desconocidos:
+            raise ValueError(f"Datos de miembro del equipo no admitidos: {', '.join(desconocidos)}")
+    
+    @classmethod
+    def from_dict(cls, data, orden=0):
+        """Crea un miembro a partir del diccionario enviado por el formulario.
+        Los valores no textuales (ej. un DNI numérico del JSON anterior) se convierten a texto."""
+        cls.validar(data)
+        return cls(orden=orden, **{
+            campo: '' if data.get(campo) is None else str(data[campo]).strip() for campo in cls.CAMPOS
+        })
+    
+    @classmethod
+    def formularios_de_dni(cls, dni):
+        """Formularios en los que participa una persona (por DNI), más recientes primero"""
+        return FormularioActividad.query.filter(
+            FormularioActividad.miembros.any(cls.dni == dni.strip())
+        ).order_by(FormularioActividad.fecha_creacion.desc())
+    
+    @classmethod
+    def conteo_por_claustro(cls):
+        """Cantidad de miembros por claustro: [(claustro, cantidad), ...]"""
+        return db.session.query(cls.claustro, db.func.count(cls.id)).group_by(
+            cls.claustro
+        ).order_by(db.func.count(cls.id).desc()).all()
+    
+    def to_dict(self):
+        """Convierte el miembro al mismo formato que usa el formulario"""
+        return {
+            'apellido_nombre': self.apellido_nombre,
+            'dni': self.dni,
+            'correo': self.correo,
+            'claustro': self.claustro
         }
     
     def __repr__(self):
-        return f'<FormularioActividad {self.id}: {self.titulo_actividad}>'
\ No newline at end of file
+        return f'<EquipoMiembro {self.id}: {self.apellido_nombre} ({self.dni})>'
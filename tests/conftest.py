@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Las pruebas no deben escribir el estado de métricas en instance/
+os.environ.setdefault('METRICAS', 'False')
+
+from models import db
+
+
+@pytest.fixture
+def ruta_db(tmp_path):
+    """Ruta de un archivo SQLite temporal"""
+    return str(tmp_path / 'formularios.db')
+
+
+@pytest.fixture
+def app_db(ruta_db):
+    """Aplicación Flask mínima con el esquema de models.py creado en un SQLite temporal"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta_db}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,30 @@
+import pytest
+
+from models import db, EquipoMiembro, FormularioActividad
+
+
+def test_from_dict_convierte_valores_no_textuales():
+    miembro = EquipoMiembro.from_dict({'apellido_nombre': ' Pérez, Ana ', 'dni': 30111222, 'correo': None}, 2)
+    assert (miembro.orden, miembro.apellido_nombre, miembro.dni, miembro.correo, miembro.claustro) == \
+        (2, 'Pérez, Ana', '30111222', '', '')
+
+
+@pytest.mark.parametrize('miembro', [{'dni': '1', 'telefono': '299'}, ['Pérez', '1'], None])
+def test_from_dict_rechaza_datos_no_admitidos(miembro):
+    with pytest.raises(ValueError):
+        EquipoMiembro.from_dict(miembro)
+
+
+def test_setter_guarda_los_miembros(app_db):
+    formulario = FormularioActividad(
+        titulo_actividad='T', docente_responsable='D', email_responsable='d@x.com', dni_responsable='1',
+        fundamentacion='f', objetivos='o', metodologia='m'
+    )
+    formulario.equipo = [{'apellido_nombre': 'Ana', 'dni': 1}, {'apellido_nombre': 'Luis', 'claustro': 'Docente'}]
+    db.session.add(formulario)
+    db.session.commit()
+    db.session.expire_all()
+    assert FormularioActividad.query.one().equipo == [
+        {'apellido_nombre': 'Ana', 'dni': '1', 'correo': '', 'claustro': ''},
+        {'apellido_nombre': 'Luis', 'dni': '', 'correo': '', 'claustro': 'Docente'},
+    ]
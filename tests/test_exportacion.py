@@ -0,0 +1,54 @@
+import csv
+import io
+import zipfile
+
+import openpyxl
+
+from utils import exportacion
+
+ENCABEZADOS = ['id', 'titulo_actividad', 'cantidad_miembros', 'miembro_1_dni', 'meses_2025']
+FILAS = [
+    [1, 'Taller de óptica & <lentes>', 2, '30111222', 'Marzo, Abril'],
+    [2, 'Texto con control\x0b y "comillas"', 0, None, ''],
+    [3, 'x' * 40000, 1.5, '', 'Mayo'],
+]
+
+
+def leer_xlsx(filas, lote=2):
+    contenido = b''.join(exportacion.generar_xlsx(ENCABEZADOS, iter(filas), lote=lote))
+    return contenido, openpyxl.load_workbook(io.BytesIO(contenido))
+
+
+def test_xlsx_se_abre_con_openpyxl():
+    contenido, libro = leer_xlsx(FILAS)
+    hoja = libro['Formularios']
+    assert [celda.value for celda in hoja[1]] == ENCABEZADOS
+    assert [celda.value for celda in hoja[2]] == FILAS[0]
+    assert [celda.value for celda in hoja[3]] == [2, 'Texto con control y "comillas"', 0, None, None]
+    assert len(hoja['B4'].value) == 32767
+    assert hoja['C4'].value == 1.5
+    assert hoja.max_row == 4
+
+    with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+        assert archivo.testzip() is None
+        assert 'xl/styles.xml' in archivo.namelist()
+
+
+def test_xlsx_muchas_columnas_y_filas():
+    encabezados = [f'c{numero}' for numero in range(30)]
+    filas = [[fila * 100 + columna for columna in range(30)] for fila in range(1200)]
+    contenido = b''.join(exportacion.generar_xlsx(encabezados, iter(filas)))
+    hoja = openpyxl.load_workbook(io.BytesIO(contenido), read_only=True)['Formularios']
+    leidas = list(hoja.iter_rows(values_only=True))
+    assert list(leidas[0]) == encabezados
+    assert list(leidas[-1]) == filas[-1]
+    assert len(leidas) == 1201
+
+
+def test_csv_con_bom_y_todas_las_filas():
+    contenido = b''.join(exportacion.generar_csv(ENCABEZADOS, iter(FILAS), lote=2)).decode('utf-8')
+    assert contenido.startswith('﻿')
+    filas = list(csv.reader(io.StringIO(contenido[1:])))
+    assert filas[0] == ENCABEZADOS
+    assert filas[1] == ['1', 'Taller de óptica & <lentes>', '2', '30111222', 'Marzo, Abril']
+    assert len(filas) == 4
@@ -0,0 +1,33 @@
+import pytest
+
+from models import db, FormularioActividad
+
+# Consulta auxiliar -> índice que debe usar
+CONSULTAS = {
+    'recientes': (lambda: FormularioActividad.recientes(), 'ix_formularios_actividad_fecha_creacion'),
+    'con_estado': (lambda: FormularioActividad.con_estado('error'), 'ix_formularios_actividad_estado_fecha'),
+    'por_dni': (lambda: FormularioActividad.por_dni('12345678'), 'ix_formularios_actividad_dni_fecha'),
+    'por_email': (lambda: FormularioActividad.por_email('docente@uncoma.edu.ar'), 'ix_formularios_actividad_email_fecha'),
+}
+
+
+def plan(consulta):
+    """Pasos de EXPLAIN QUERY PLAN de la consulta compilada"""
+    compilada = consulta.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [fila[-1] for fila in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compilada}'))]
+
+
+@pytest.mark.parametrize('nombre', CONSULTAS)
+def test_consulta_usa_indice(app_db, nombre):
+    consulta, indice = CONSULTAS[nombre]
+    pasos = plan(consulta())
+    assert any(f'USING INDEX {indice}' in paso or f'USING COVERING INDEX {indice}' in paso for paso in pasos), pasos
+    assert not any(paso.startswith('SCAN formularios_actividad') and 'INDEX' not in paso for paso in pasos), pasos
+    assert not any('USE TEMP B-TREE' in paso for paso in pasos), pasos
+
+
+@pytest.mark.parametrize('nombre', ['con_estado', 'por_dni', 'por_email'])
+def test_filtro_no_recorre_la_tabla(app_db, nombre):
+    """Los filtros buscan en el índice (SEARCH) en lugar de recorrerlo entero"""
+    consulta, _ = CONSULTAS[nombre]
+    assert not any(paso.startswith('SCAN formularios_actividad') for paso in plan(consulta())), nombre
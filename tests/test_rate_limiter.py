@@ -0,0 +1,81 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from utils import apps_script_client
+from utils.rate_limiter import RateLimiter, consumo_de
+
+
+def test_email_cuenta_destinatarios():
+    assert consumo_de('sendEmail', {'to': 'a@x.com, b@x.com', 'cc': ['c@x.com'], 'bcc': ''}) == \
+        {'email': 3, 'urlfetch': 1}
+    assert consumo_de('sendDigest', {'to': 'a@x.com'}) == {'email': 1}
+
+
+def test_process_submission_suma_solo_los_pasos_incluidos():
+    pasos = [
+        {'action': 'createFolders', 'params': {}},
+        {'action': 'generateDocuments', 'params': {'documents': [{}, {}]}},
+    ]
+    assert consumo_de('processSubmission', {'steps': pasos}) == {'documentos': 2}
+    pasos.append({'action': 'sendEmail', 'params': {'to': 'a@x.com,b@x.com'}})
+    assert consumo_de('processSubmission', {'steps': pasos}) == {'documentos': 2, 'email': 2, 'urlfetch': 1}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    codigo = 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(self.codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def limiter(tmp_path, monkeypatch):
+    limiter = RateLimiter(str(tmp_path / 'rate_limits.db'), cuotas={'email': 10})
+    monkeypatch.setattr(apps_script_client, 'get_limiter', lambda: limiter)
+    return limiter
+
+
+def servidor(codigo):
+    handler = type('Handler', (_Handler,), {'codigo': codigo})
+    http = HTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    return http
+
+
+def email_usados(limiter):
+    return limiter.estadisticas()['cuotas']['email']['usados']
+
+
+@pytest.mark.parametrize('codigo, usados', [(200, 2), (500, 0)])
+def test_cobra_solo_las_llamadas_que_llegan_a_ejecutarse(limiter, codigo, usados):
+    http = servidor(codigo)
+    try:
+        cliente = apps_script_client.AppsScriptClient(f'http://127.0.0.1:{http.server_port}/exec', 'token')
+        try:
+            cliente.post('sendEmail', {'to': 'a@x.com,b@x.com', 'subject': 's'})
+        except requests.exceptions.HTTPError:
+            assert codigo == 500
+        assert email_usados(limiter) == usados
+    finally:
+        http.shutdown()
+        http.server_close()
+
+
+def test_reembolsa_errores_de_conexion(limiter):
+    http = servidor(200)
+    puerto = http.server_port
+    http.server_close()
+    cliente = apps_script_client.AppsScriptClient(f'http://127.0.0.1:{puerto}/exec', 'token')
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cliente.post('sendEmail', {'to': 'a@x.com', 'subject': 's'})
+    assert email_usados(limiter) == 0
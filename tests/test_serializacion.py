@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from models import FormularioActividad
+from utils import serializacion
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('[{"ano":"2025","meses":["Marzo"]}]', [{'ano': '2025', 'meses': ['Marzo']}]),
+    ('[]', []),
+    ('[1,NaN]', None),
+    ('{"ano":"2025"}', None),
+    ('no json', None),
+    (None, None),
+])
+def test_cargar_lista(texto, esperado):
+    assert serializacion.cargar_lista(texto) == esperado
+
+
+def test_setter_rechaza_json_no_estricto():
+    formulario = FormularioActividad()
+    with pytest.raises(ValueError):
+        formulario.periodos = [{'ano': float('nan')}]
+    with pytest.raises(ValueError):
+        formulario.periodos = {'ano': '2025'}
+
+
+def test_inserta_el_json_almacenado():
+    formulario = FormularioActividad(id=1, periodos_json='[{"ano":"2025","meses":["Marzo","Abril"]}]')
+    texto = serializacion.formulario_a_json(formulario, ('id', 'periodos'))
+    assert texto == '{"id":1,"periodos":[{"ano":"2025","meses":["Marzo","Abril"]}]}'
+
+
+def test_texto_que_no_es_arreglo_usa_el_valor_del_modelo():
+    formulario = FormularioActividad(id=1, periodos_json='no json')
+    assert json.loads(serializacion.formulario_a_json(formulario, ('id', 'periodos'))) == {'id': 1, 'periodos': []}
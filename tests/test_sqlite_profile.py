@@ -0,0 +1,83 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from utils import sqlite_profile
+
+
+def crear_engine(ruta_db, perfil, timeout):
+    """Engine con el perfil aplicado y una tabla con una fila"""
+    engine = create_engine(f'sqlite:///{ruta_db}', connect_args={'timeout': timeout})
+    sqlite_profile.register(engine, perfil)
+    with engine.begin() as conexion:
+        conexion.execute(text('CREATE TABLE formularios (id INTEGER PRIMARY KEY, titulo TEXT)'))
+        conexion.execute(text("INSERT INTO formularios (titulo) VALUES ('existente')"))
+    return engine
+
+
+def escritura_abierta(ruta_db):
+    """Otra conexión con una transacción de escritura sin confirmar (lock exclusivo)"""
+    escritor = sqlite3.connect(ruta_db, isolation_level=None)
+    escritor.execute('BEGIN EXCLUSIVE')
+    escritor.execute("INSERT INTO formularios (titulo) VALUES ('sin confirmar')")
+    return escritor
+
+
+def leer(engine):
+    with engine.connect() as conexion:
+        return conexion.execute(text('SELECT titulo FROM formularios')).scalars().all()
+
+
+def test_produccion_lee_durante_una_escritura(ruta_db, monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT', '200')
+    engine = crear_engine(ruta_db, 'produccion', timeout=0.2)
+    with engine.connect() as conexion:
+        assert conexion.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+    escritor = escritura_abierta(ruta_db)
+    try:
+        inicio = time.monotonic()
+        assert leer(engine) == ['existente']
+        assert time.monotonic() - inicio < 0.1
+    finally:
+        escritor.execute('ROLLBACK')
+        escritor.close()
+        engine.dispose()
+
+
+def test_default_bloquea_la_lectura_durante_una_escritura(ruta_db):
+    engine = crear_engine(ruta_db, 'default', timeout=0.2)
+    escritor = escritura_abierta(ruta_db)
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(OperationalError, match='database is locked'):
+            leer(engine)
+        assert time.monotonic() - inicio >= 0.2
+    finally:
+        escritor.execute('ROLLBACK')
+        escritor.close()
+        engine.dispose()
+
+
+@pytest.mark.parametrize('variable, valor', [
+    ('SQLITE_SYNCHRONOUS', 'NORMAL; DROP TABLE formularios'),
+    ('SQLITE_SYNCHRONOUS', 'rapido'),
+    ('SQLITE_BUSY_TIMEOUT', '5000; PRAGMA writable_schema=1'),
+    ('SQLITE_CACHE_SIZE', '16MB'),
+])
+def test_rechaza_ajustes_invalidos(monkeypatch, variable, valor):
+    monkeypatch.setenv(variable, valor)
+    with pytest.raises(ValueError):
+        sqlite_profile.get_pragmas('produccion')
+
+
+def test_normaliza_ajustes(monkeypatch):
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'full')
+    monkeypatch.setenv('SQLITE_MMAP_SIZE', ' 0 ')
+    pragmas = sqlite_profile.get_pragmas('produccion')
+    assert pragmas['synchronous'] == 'FULL'
+    assert pragmas['mmap_size'] == 0
+    assert pragmas['busy_timeout'] == 5000
@@ -1 +1,13 @@
-# Archivo __init__.py para el paquete utils
\ No newline at end of file
+# Archivo __init__.py para el paquete utils
+import os
+
+
+def ruta_instancia(nombre_archivo, variable=None):
+    """Ruta de un archivo de estado local de la aplicación: el valor de la variable
+    de entorno indicada o, si no está definida, el archivo junto a la base de datos"""
+    if variable and os.getenv(variable):
+        return os.getenv(variable)
+    if os.getenv('DATABASE_PATH'):
+        return os.path.join(os.path.dirname(os.getenv('DATABASE_PATH')), nombre_archivo)
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, 'instance', nombre_archivo)
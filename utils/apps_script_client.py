@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from flask import has_request_context
+from requests.adapters import HTTPAdapter
+
+from utils import correlacion
+from utils import metricas
+from utils.rate_limiter import consumo_de, get_limiter
+
+logger = logging.getLogger(__name__)
+
+# Timeouts por defecto (segundos) para las peticiones a Google Apps Script
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+# Últimas peticiones del proceso (fin, duración, código), para /health?deep=1
+_recientes = deque(maxlen=int(os.getenv('APPS_SCRIPT_RECIENTES', 500)))
+
+
+def get_session():
+    """Devuelve la sesión HTTP compartida por todo el proceso.
+
+    La sesión mantiene conexiones keep-alive tanto con script.google.com como con
+    script.googleusercontent.com (destino de la redirección de /exec), de modo que
+    solo la primera petición de cada proceso paga los handshakes TCP+TLS.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                # Tras un fork no se deben compartir sockets con el proceso padre
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def _create_session():
+    """Crea una sesión con un pool de conexiones dimensionado para los hilos del proceso"""
+    pool_size = int(os.getenv('APPS_SCRIPT_POOL_SIZE', 10))
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        pool_block=False,
+        max_retries=0
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': 'ProyectoPilar/1.0'})
+    return session
+
+
+def _parse_timeouts(value):
+    """Parsea APPS_SCRIPT_TIMEOUTS con formato 'accion=connect:read,accion2=read'"""
+    timeouts = {}
+    if not value:
+        return timeouts
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        action, spec = item.split('=', 1)
+        parts = spec.split(':')
+        try:
+            if len(parts) == 2:
+                timeouts[action.strip()] = (float(parts[0]), float(parts[1]))
+            else:
+                timeouts[action.strip()] = (None, float(parts[0]))
+        except ValueError:
+            logger.error(f"Timeout inválido para {action}: {spec}")
+    return timeouts
+
+
+class AppsScriptClient:
+    """Cliente único para la API de Google Apps Script (app.gs).
+
+    Usado por GoogleDriveManager y EmailSender. Todas las instancias comparten la
+    sesión HTTP del proceso; los timeouts de conexión y lectura se pueden ajustar
+    por acción con APPS_SCRIPT_TIMEOUTS (ej: "createFolders=5:20,sendEmail=5:90").
+    """
+
+    def __init__(self, script_url=None, token=None):
+        self.script_url = script_url if script_url is not None else os.getenv('GOOGLE_APPS_SCRIPT_URL')
+        self.token = token if token is not None else os.getenv('GOOGLE_APPS_SCRIPT_TOKEN')
+        self.connect_timeout = float(os.getenv('APPS_SCRIPT_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT))
+        self.read_timeout = float(os.getenv('APPS_SCRIPT_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+        self.action_timeouts = _parse_timeouts(os.getenv('APPS_SCRIPT_TIMEOUTS'))
+        # Espera máxima del limitador cuando la llamada bloquea un request (modo síncrono)
+        self.max_espera_request = float(os.getenv('APPS_SCRIPT_MAX_ESPERA_REQUEST', 10))
+
+    def get_timeout(self, action):
+        """Devuelve la tupla (connect, read) para una acción"""
+        connect, read = self.action_timeouts.get(action, (None, None))
+        return (connect or self.connect_timeout, read or self.read_timeout)
+
+    def build_payload(self, action, data):
+        """Arma el cuerpo JSON común a todas las acciones (con el ID de correlación del
+        request o trabajo en curso, que app.gs registra en sus logs y devuelve)"""
+        payload = {
+            'token': self.token,
+            'action': action,
+            **data
+        }
+        id_correlacion = correlacion.actual()
+        if id_correlacion:
+            payload['correlationId'] = id_correlacion
+        return payload
+
+    def post(self, action, data):
+        """Ejecuta una acción y devuelve el requests.Response (el llamador lee response.json()).
+
+        Lanza requests.exceptions.RequestException ante errores de red o HTTP,
+        igual que requests.post, para que cada llamador decida cómo reportarlos.
+        Antes de la petición espera el turno del limitador de cuotas y cobra las cuotas
+        diarias que consumirá la llamada (rate_limiter.consumo_de); si la cuota está
+        agotada, o la espera superaría APPS_SCRIPT_MAX_ESPERA_REQUEST dentro de un
+        request, lanza rate_limiter.CuotaAgotada sin llamar a Apps Script. Si la petición
+        falla por un error de red o HTTP el cobro se reembolsa, salvo que se haya agotado
+        el tiempo de lectura: en ese caso Apps Script pudo haber ejecutado la acción.
+        Registra la duración (sin la espera del limitador), el código de respuesta y
+        el tamaño de la petición y la respuesta en utils/metricas.py.
+        """
+        limiter = get_limiter()
+        consumo = consumo_de(action, data)
+        if limiter is not None:
+            limiter.adquirir(action, consumo,
+                             max_espera=self.max_espera_request if has_request_context() else None)
+        # Serializado aquí (como lo haría requests con json=) para medir el tamaño
+        try:
+            cuerpo = json.dumps(self.build_payload(action, data), allow_nan=False).encode('utf-8')
+        except ValueError:
+            if limiter is not None:
+                limiter.reembolsar(action, consumo)
+            raise
+        codigo = 'error'
+        recibido = 0
+        inicio = time.perf_counter()
+        try:
+            response = get_session().post(self.script_url, data=cuerpo, timeout=self.get_timeout(action),
+                                          headers={'Content-Type': 'application/json'})
+            codigo = str(response.status_code)
+            recibido = len(response.content)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.Timeout):
+                codigo = 'timeout'
+            if limiter is not None and not isinstance(e, requests.exceptions.ReadTimeout):
+                limiter.reembolsar(action, consumo)
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            _recientes.append((time.time(), duracion, codigo))
+            metricas.observar('pilar_apps_script_segundos', duracion, accion=action, codigo=codigo)
+            metricas.observar('pilar_apps_script_bytes', len(cuerpo), accion=action, sentido='peticion')
+            if recibido:
+                metricas.observar('pilar_apps_script_bytes', recibido, accion=action, sentido='respuesta')
+
+
+def resumen_reciente(ventana=300):
+    """Peticiones a Apps Script de este proceso en los últimos `ventana` segundos:
+    cantidad, exitosas (HTTP 2xx), timeouts y latencias p50/p95/máxima en ms"""
+    desde = time.time() - ventana
+    # list() copia el deque de una vez, sin competir con los append de otros hilos
+    recientes = [(duracion, codigo) for fin, duracion, codigo in list(_recientes) if fin >= desde]
+    duraciones = sorted(duracion for duracion, _ in recientes)
+    exitosas = sum(1 for _, codigo in recientes if codigo.startswith('2'))
+
+    def percentil(p):
+        return round(duraciones[min(len(duraciones) - 1, int(p * len(duraciones)))] * 1000, 1)
+
+    return {
+        'ventana_segundos': ventana,
+        'peticiones': len(recientes),
+        'exitosas': exitosas,
+        'timeouts': sum(1 for _, codigo in recientes if codigo == 'timeout'),
+        'tasa_exito': round(exitosas / len(recientes), 3) if recientes else None,
+        'p50_ms': percentil(0.5) if duraciones else None,
+        'p95_ms': percentil(0.95) if duraciones else None,
+        'max_ms': round(duraciones[-1] * 1000, 1) if duraciones else None
+    }
@@ -0,0 +1,86 @@
+# Campos de reemplazo del template de Google Docs. Están separados de pdf_generator
+# para que el proceso web los arme sin importar ReportLab.
+from datetime import datetime
+
+
+def create_template_fields(formulario_data):
+    """Crear los campos para reemplazar en el template de Google Docs"""
+
+    # Formatear información del equipo
+    equipo_text = _formatear_equipo_para_template(formulario_data.get('equipo', []))
+
+    # Formatear fechas
+    fechas_text = ""
+    if formulario_data.get('fechas'):
+        fechas_text = ", ".join(formulario_data['fechas'])
+    if not fechas_text.strip():
+        fechas_text = "No especificado"
+
+    # Procesar información de firma
+    firma_info = _procesar_firma_para_template(formulario_data.get('firma_docente'))
+
+    # Crear el diccionario de campos para reemplazar
+    # Función auxiliar para asegurar que no haya campos vacíos
+    def ensure_not_empty(value, default="No especificado"):
+        if not value or not str(value).strip():
+            return default
+        return str(value).strip()
+
+    fields = {
+        'TITULO_ACTIVIDAD': ensure_not_empty(formulario_data.get('titulo_actividad', '')),
+        'DOCENTE_RESPONSABLE': ensure_not_empty(formulario_data.get('docente_responsable', '')),
+        'EMAIL_RESPONSABLE': ensure_not_empty(formulario_data.get('email_responsable', '')),
+        'DNI_RESPONSABLE': ensure_not_empty(formulario_data.get('dni_responsable', '')),
+        'DEPARTAMENTO': ensure_not_empty(formulario_data.get('departamento', '')),
+        'EQUIPO': ensure_not_empty(equipo_text),
+        'FUNDAMENTACION': ensure_not_empty(formulario_data.get('fundamentacion', '')),
+        'OBJETIVOS': ensure_not_empty(formulario_data.get('objetivos', '')),
+        'METODOLOGIA': ensure_not_empty(formulario_data.get('metodologia', '')),
+        'GRADOS': ensure_not_empty(formulario_data.get('grados', '')),
+        'MATERIALES_PRESUPUESTO': ensure_not_empty(formulario_data.get('materiales_presupuesto', '')),
+        'PERIODOS': ensure_not_empty(formulario_data.get('meses', '')),
+        'FECHA_GENERACION': datetime.now().strftime("%d/%m/%Y"),
+        'AÑO_CONVOCATORIA': str(datetime.now().year),
+        'CUADRO_FIRMA': ensure_not_empty(firma_info)
+    }
+
+    return fields
+
+
+def _procesar_firma_para_template(firma_data):
+    """Procesa la firma para el template de Google Docs"""
+    if firma_data and firma_data.startswith('data:image/'):
+        # Usar solo el placeholder - la imagen real se insertará via Google Apps Script
+        return '[[CUADRO_FIRMA]]'
+    else:
+        return '\n\n\nFirma del Docente Responsable:\n\n_________________________________\n\n'
+
+
+def _formatear_equipo_para_template(equipo_data):
+    """Formatear información del equipo para el template de Google Docs (incluye claustro)"""
+    if not equipo_data:
+        return "No se especificó equipo de trabajo."
+
+    # Crear texto formateado para el equipo
+    equipo_text = ""
+    for i, miembro in enumerate(equipo_data, 1):
+        nombre = miembro.get('apellido_nombre', '').strip()
+        dni = miembro.get('dni', '').strip()
+        correo = miembro.get('correo', '').strip()
+        claustro = miembro.get('claustro', '').strip()
+
+        if nombre:  # Solo agregar si hay al menos un nombre
+            equipo_text += f"{i}. {nombre}"
+            if dni:
+                equipo_text += f" (DNI: {dni})"
+            if correo:
+                equipo_text += f" - {correo}"
+            if claustro:
+                equipo_text += f" - Claustro: {claustro}"
+            equipo_text += "\n"
+
+    # Si no hay miembros válidos
+    if not equipo_text.strip():
+        return "No se especificó equipo de trabajo."
+
+    return equipo_text.strip()
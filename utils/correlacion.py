@@ -0,0 +1,55 @@
+import contextvars
+import logging
+import re
+import uuid
+from contextlib import contextmanager
+
+# Cabeceras de las que se toma el ID de un request entrante (la primera presente)
+CABECERAS = ('X-Correlation-ID', 'X-Request-ID')
+
+_VALIDO = re.compile(r'[A-Za-z0-9._:-]{8,64}')
+
+_actual = contextvars.ContextVar('id_correlacion', default=None)
+
+
+def nuevo():
+    return uuid.uuid4().hex
+
+
+def actual():
+    """ID de correlación del request o trabajo en curso, o None"""
+    return _actual.get()
+
+
+def desde_cabeceras(cabeceras):
+    """ID enviado por el cliente o el proxy si es válido; si no, uno nuevo"""
+    for nombre in CABECERAS:
+        valor = (cabeceras.get(nombre) or '').strip()
+        if _VALIDO.fullmatch(valor):
+            return valor
+    return nuevo()
+
+
+def establecer(id_correlacion):
+    """Fija el ID del contexto actual (None al terminar el request)"""
+    _actual.set(id_correlacion)
+
+
+@contextmanager
+def usar(id_correlacion=None):
+    """Ejecuta el bloque con el ID indicado (o uno nuevo), ej. en un trabajo de la cola"""
+    token = _actual.set(id_correlacion or nuevo())
+    try:
+        yield _actual.get()
+    finally:
+        _actual.reset(token)
+
+
+class FiltroCorrelacion(logging.Filter):
+    """Agrega record.id_correlacion ('-' fuera de un request) a cada registro.
+    Debe aplicarse en el hilo que emite el registro, antes de encolarlo."""
+
+    def filter(self, record):
+        if not hasattr(record, 'id_correlacion'):
+            record.id_correlacion = _actual.get() or '-'
+        return True
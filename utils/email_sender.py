@@ -1,26 +1,33 @@
 import requests
 import os
+import base64
+import logging
+from html import escape
+from datetime import datetime
+from utils.apps_script_client import AppsScriptClient
+from utils.rate_limiter import CuotaAgotada
+from utils.logs import resumir
+
+logger = logging.getLogger(__name__)
 
 class EmailSender:
     def __init__(self):
         self.script_url = os.getenv('GOOGLE_APPS_SCRIPT_URL')
         self.token = os.getenv('GOOGLE_APPS_SCRIPT_TOKEN')
         self.email_secretaria = os.getenv('EMAIL_SECRETARIA')
+        self.client = AppsScriptClient(self.script_url, self.token)
     
     def _make_request(self, action, data):
         """Hace una petición a la API de Google Apps Script"""
-        payload = {
-            'token': self.token,
-            'action': action,
-            **data
-        }
-        
         try:
-            response = requests.post(self.script_url, json=payload, timeout=30)
-            response.raise_for_status()
+            response = self.client.post(action, data)
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error en petición a Google Apps Script: {e}")
+            logger.error(f"Error en petición a Google Apps Script: {e}")
+            return None
+        except CuotaAgotada as e:
+            # Sin cupo para enviar: se informa como email no enviado
+            logger.warning(f"Email no enviado por límite de Apps Script: {e}")
             return None
     
     def send_notification_email(self, formulario_data, document_id):
@@ -47,42 +54,178 @@ class EmailSender:
         if result and result.get('success'):
             return True
         else:
-            print(f"Error al enviar email: {result}")
+            logger.error('Error al enviar email: %s', resumir(result))
             return False
     
-    def send_notification_email_with_pdf(self, formulario_data, document_id):
-        """Envía un email de notificación convirtiendo el documento a PDF"""
+    def send_notification_email_with_pdf(self, formulario_data, document_id, pdf_file_id=None):
+        """Envía un email de notificación con el PDF guardado del documento (o convirtiéndolo si no hay)"""
+        
+        logger.debug(f"Enviando email con PDF para documento: {document_id} (PDF guardado: {pdf_file_id})")
+        
+        email_data = self.create_notification_email_with_pdf(formulario_data, document_id, pdf_file_id)
+        
+        logger.debug('Enviando email con datos: %s', resumir(email_data))
+        result = self._make_request('sendEmail', email_data)
+        logger.debug('Resultado del envío: %s', resumir(result))
         
-        print(f"[DEBUG] Enviando email con conversión a PDF para documento: {document_id}")
+        if result and result.get('success'):
+            logger.debug("Email con PDF enviado exitosamente")
+            return True
+        else:
+            logger.error('Error al enviar email con PDF: %s', resumir(result))
+            return False
+    
+    def create_notification_email_with_pdf(self, formulario_data, document_id, pdf_file_id=None):
+        """Arma los datos de la acción sendEmail con el documento convertido a PDF.
+        Si hay un PDF guardado (pdf_file_id) se adjunta ese archivo sin volver a convertir.
+        Ambos IDs pueden ser referencias a un paso previo de processSubmission."""
         
         # Crear el contenido HTML del email
         html_body = self._create_email_body(formulario_data)
         
+        # La conversión del documento queda como respaldo si el PDF guardado no está disponible
+        adjunto = {
+            'fileId': document_id,
+            'convertTo': 'pdf'
+        }
+        if pdf_file_id:
+            adjunto['storedFileId'] = pdf_file_id
+        
         # Preparar los datos del email con conversión a PDF
-        email_data = {
+        return {
             'to': self.email_secretaria,
             'subject': f'Nuevo Formulario de Actividad - {formulario_data["titulo_actividad"]} (PDF)',
             'htmlBody': html_body,
             'senderName': 'Sistema de Formularios UNCOMA',
-            'attachments': [
-                {
-                    'fileId': document_id,
-                    'convertTo': 'pdf'  # ¡Esta es la línea clave!
-                }
-            ]
+            'attachments': [adjunto]
         }
+    
+    def send_notification_email_with_attachment(self, formulario_data, pdf_content, filename):
+        """Envía un email de notificación adjuntando un PDF ya generado (sin exportar en Apps Script)"""
+        
+        email_data = self.create_notification_email_with_attachment(formulario_data, pdf_content, filename)
         
-        print(f"[DEBUG] Enviando email con datos: {email_data}")
+        logger.debug(f"Enviando email con PDF local: {filename} ({len(pdf_content)} bytes)")
         result = self._make_request('sendEmail', email_data)
-        print(f"[DEBUG] Resultado del envío: {result}")
         
         if result and result.get('success'):
-            print(f"[DEBUG] Email con PDF enviado exitosamente")
+            logger.debug("Email con PDF local enviado exitosamente")
             return True
         else:
-            print(f"[DEBUG] Error al enviar email con PDF: {result}")
+            logger.error('Error al enviar email con PDF local: %s', resumir(result))
             return False
     
+    def create_notification_email_with_attachment(self, formulario_data, pdf_content, filename):
+        """Arma los datos de la acción sendEmail con el PDF adjunto en Base64"""
+        return {
+            'to': self.email_secretaria,
+            'subject': f'Nuevo Formulario de Actividad - {formulario_data["titulo_actividad"]} (PDF)',
+            'htmlBody': self._create_email_body(formulario_data),
+            'senderName': 'Sistema de Formularios UNCOMA',
+            'attachments': [
+                {
+                    'fileName': filename,
+                    'mimeType': 'application/pdf',
+                    'content': base64.b64encode(pdf_content).decode('ascii')
+                }
+            ]
+        }
+    
+    def send_digest_email(self, items):
+        """Envía un único email de resumen con varios formularios y sus PDF (acción sendDigest).
+        
+        items: lista de {'id', 'formulario', 'attachments'}. Devuelve los datos de la
+        respuesta ({'sentItems', 'deferredItems', 'failedItems'}) o None si la petición falló.
+        """
+        email_data = self.create_digest_email(items)
+        
+        logger.debug(f"Enviando resumen con {len(items)} formularios")
+        result = self._make_request('sendDigest', email_data)
+        
+        if result and result.get('data'):
+            logger.debug(f"Resultado del resumen: {result.get('message')}")
+            return result['data']
+        else:
+            logger.error('Error al enviar el resumen: %s', resumir(result))
+            return None
+    
+    def create_digest_email(self, items):
+        """Arma los datos de la acción sendDigest: encabezado y pie del cuerpo HTML y una
+        fila de tabla por formulario. Apps Script solo incluye en el cuerpo las filas
+        cuyos adjuntos se pudieron agregar."""
+        fecha = datetime.now().strftime('%d/%m/%Y %H:%M')
+        return {
+            'to': self.email_secretaria,
+            'subject': f'Resumen de Formularios de Actividad - {len(items)} formularios ({fecha})',
+            'senderName': 'Sistema de Formularios UNCOMA',
+            'htmlHeader': self._create_digest_header(),
+            'htmlFooter': self._create_digest_footer(),
+            'items': [
+                {
+                    'id': item['id'],
+                    'rowHtml': self._create_digest_row(item['formulario']),
+                    'attachments': item['attachments']
+                }
+                for item in items
+            ]
+        }
+    
+    def _create_digest_header(self):
+        """Inicio del cuerpo HTML del resumen (hasta el encabezado de la tabla)"""
+        return """
+        <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .header { background-color: #f4f4f4; padding: 20px; text-align: center; }
+                .content { padding: 20px; }
+                table { border-collapse: collapse; width: 100%; }
+                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; vertical-align: top; }
+                th { background-color: #2c3e50; color: #fff; }
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h2>Resumen de Formularios de Actividad Educativa</h2>
+                <p>Se recibieron los siguientes formularios de actividad</p>
+            </div>
+            
+            <div class="content">
+                <table>
+                    <tr>
+                        <th>N°</th>
+                        <th>Título de la Actividad</th>
+                        <th>Docente Responsable</th>
+                        <th>Departamento</th>
+                        <th>Equipo</th>
+                        <th>Períodos</th>
+                    </tr>
+        """
+    
+    def _create_digest_footer(self):
+        """Cierre del cuerpo HTML del resumen"""
+        return """
+                </table>
+                <p><strong>Nota:</strong> Cada formulario se adjunta como archivo PDF.</p>
+                <p><em>Este email fue generado automáticamente por el Sistema de Formularios UNCOMA.</em></p>
+            </div>
+        </body>
+        </html>
+        """
+    
+    def _create_digest_row(self, formulario_data):
+        """Fila de la tabla del resumen para un formulario"""
+        return f"""
+                    <tr>
+                        <td>{escape(str(formulario_data.get('id', '')))}</td>
+                        <td>{escape(formulario_data.get('titulo_actividad') or '')}</td>
+                        <td>{escape(formulario_data.get('docente_responsable') or '')}<br>{escape(formulario_data.get('email_responsable') or '')}</td>
+                        <td>{escape(formulario_data.get('departamento') or '')}</td>
+                        <td>{len(formulario_data.get('equipo') or [])} miembros</td>
+                        <td>{escape(formulario_data.get('meses') or '')}</td>
+                    </tr>
+        """
+    
     def _create_email_body(self, formulario_data):
         """Crea el cuerpo HTML del email con el resumen del formulario"""
         
@@ -0,0 +1,228 @@
+import csv
+import io
+import re
+import zipfile
+from collections import deque
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from utils import pdf_pool
+
+
+class _SalidaStream:
+    """Destino de escritura no posicionable para zipfile.
+
+    zipfile detecta que no puede hacer seek y escribe cada entrada con un
+    descriptor de datos; lo escrito se acumula hasta que el generador lo entrega.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        """Devuelve y descarta lo escrito desde la última llamada"""
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def generar_zip(entradas):
+    """Genera un ZIP por partes a partir de (nombre, bytes), sin armar el archivo en memoria.
+    Los PDF ya vienen comprimidos, por lo que las entradas se guardan sin recomprimir."""
+    salida = _SalidaStream()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_STORED) as archivo:
+        for nombre, contenido in entradas:
+            info = zipfile.ZipInfo(nombre, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            archivo.writestr(info, contenido)
+            yield salida.vaciar()
+    # Directorio central del ZIP
+    yield salida.vaciar()
+
+
+def renderizar_pdfs(trabajos, ventana=8, timeout=60):
+    """Genera los PDF en el pool de procesos manteniendo a lo sumo `ventana` en curso.
+
+    Recibe (nombre, datos_formulario) y produce (nombre, pdf_bytes, error) en el
+    mismo orden, de modo que la memoria queda acotada por la ventana y no por la
+    cantidad de formularios.
+    """
+    pendientes = deque()
+    for nombre, datos in trabajos:
+        pendientes.append((nombre, pdf_pool.submit(datos)))
+        if len(pendientes) >= ventana:
+            yield _resultado(*pendientes.popleft(), timeout)
+    while pendientes:
+        yield _resultado(*pendientes.popleft(), timeout)
+
+
+def _resultado(nombre, futuro, timeout):
+    try:
+        return nombre, futuro.result(timeout=timeout), None
+    except Exception as e:
+        return nombre, None, f'{type(e).__name__}: {e}'
+
+
+def entradas_pdf(resultados):
+    """Convierte los resultados de renderizar_pdfs en entradas del ZIP.
+    Los formularios que no se pudieron generar se listan en ERRORES.txt al final."""
+    errores = []
+    for nombre, contenido, error in resultados:
+        if error:
+            errores.append(f'{nombre}: {error}')
+            continue
+        yield nombre, contenido
+    if errores:
+        yield 'ERRORES.txt', ('\n'.join(errores) + '\n').encode('utf-8')
+
+
+def generar_csv(encabezados, filas, lote=500):
+    """Genera un CSV por partes, enviando un bloque cada `lote` filas.
+    Se escribe en UTF-8 con BOM para que Excel reconozca los acentos."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(encabezados)
+
+    for numero, fila in enumerate(filas, start=1):
+        escritor.writerow(fila)
+        if numero % lote == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# Partes fijas de un libro XLSX mínimo (una hoja, un estilo, celdas con texto en línea).
+# tests/test_exportacion.py abre el resultado con openpyxl (ver README).
+_XLSX_PARTES = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Formularios" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo por defecto: Excel lo espera aunque ninguna celda tenga formato
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+}
+
+# Caracteres de control no admitidos en XML 1.0
+_XML_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Largo máximo de texto en una celda de Excel
+_XLSX_MAX_TEXTO = 32767
+
+
+def _columna_xlsx(indice):
+    """Letra de la columna (0 -> A, 26 -> AA)"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda_xlsx(referencia, valor):
+    if valor is None or valor == '':
+        return ''
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c r="{referencia}"><v>{valor}</v></c>'
+    texto = _XML_INVALIDOS.sub('', str(valor))[:_XLSX_MAX_TEXTO]
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila_xlsx(numero, valores, columnas):
+    """Fila con referencias explícitas (r="A1"); las celdas vacías se omiten"""
+    celdas = ''.join(
+        _celda_xlsx(f'{columnas[posicion]}{numero}', valor) for posicion, valor in enumerate(valores)
+    )
+    return f'<row r="{numero}">{celdas}</row>'
+
+
+def generar_xlsx(encabezados, filas, lote=500):
+    """Genera un libro XLSX por partes con memoria constante.
+
+    La hoja se escribe como una única entrada del ZIP que se va comprimiendo a
+    medida que llegan las filas; cada `lote` filas se entrega lo ya comprimido.
+    Las entradas no usan ZIP64 (la hoja puede ocupar hasta 4 GB).
+    """
+    columnas = [_columna_xlsx(indice) for indice in range(len(encabezados))]
+    salida = _SalidaStream()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in _XLSX_PARTES.items():
+            archivo.writestr(nombre, contenido)
+
+        with archivo.open('xl/worksheets/sheet1.xml', mode='w') as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _fila_xlsx(1, encabezados, columnas)
+            ).encode('utf-8'))
+            yield salida.vaciar()
+
+            partes = []
+            for numero, fila in enumerate(filas, start=1):
+                partes.append(_fila_xlsx(numero + 1, fila, columnas))
+                if numero % lote == 0:
+                    hoja.write(''.join(partes).encode('utf-8'))
+                    partes = []
+                    yield salida.vaciar()
+            hoja.write((''.join(partes) + '</sheetData></worksheet>').encode('utf-8'))
+    yield salida.vaciar()
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils import ruta_instancia
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS carpetas (
+    clave TEXT PRIMARY KEY,
+    folder_id TEXT NOT NULL,
+    creado REAL NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_carpetas_usado ON carpetas (usado);
+"""
+
+
+class FolderCache:
+    """Caché persistente nombre de carpeta -> ID de carpeta de Google Drive.
+
+    Se guarda en un archivo SQLite compartido por todos los procesos. Las entradas
+    vencen a los `ttl` segundos y, si se superan `max_entradas`, se descartan las
+    usadas hace más tiempo. Una entrada puede quedar desactualizada si la carpeta
+    se borra en Drive; quien la use debe llamar a invalidar() cuando Apps Script
+    informe que la carpeta ya no existe.
+    """
+
+    def __init__(self, db_path, ttl=None, max_entradas=None):
+        self.db_path = db_path
+        self.ttl = ttl or int(os.getenv('DRIVE_FOLDER_CACHE_TTL', 86400))
+        self.max_entradas = max_entradas or int(os.getenv('DRIVE_FOLDER_CACHE_MAX', 1000))
+        self._local = threading.local()
+        self._esquema_creado = False
+
+    def _conexion(self):
+        """Conexión SQLite por hilo (y por proceso, para no heredarla tras un fork)"""
+        pid = os.getpid()
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != pid:
+            directorio = os.path.dirname(self.db_path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            if not self._esquema_creado:
+                conexion.executescript(_ESQUEMA)
+                self._esquema_creado = True
+            self._local.conexion = conexion
+            self._local.pid = pid
+        return conexion
+
+    def get(self, clave):
+        """ID de carpeta guardado para la clave, o None si no hay o ya venció"""
+        conexion = self._conexion()
+        ahora = time.time()
+        fila = conexion.execute('SELECT folder_id, creado FROM carpetas WHERE clave = ?', (clave,)).fetchone()
+        if fila is None:
+            return None
+        if ahora - fila[1] > self.ttl:
+            conexion.execute('DELETE FROM carpetas WHERE clave = ?', (clave,))
+            return None
+        conexion.execute('UPDATE carpetas SET usado = ? WHERE clave = ?', (ahora, clave))
+        return fila[0]
+
+    def set(self, clave, folder_id):
+        """Guarda el ID de carpeta y descarta las entradas vencidas o sobrantes"""
+        conexion = self._conexion()
+        ahora = time.time()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.execute(
+                'INSERT OR REPLACE INTO carpetas (clave, folder_id, creado, usado) VALUES (?, ?, ?, ?)',
+                (clave, folder_id, ahora, ahora)
+            )
+            conexion.execute('DELETE FROM carpetas WHERE creado < ?', (ahora - self.ttl,))
+            conexion.execute(
+                'DELETE FROM carpetas WHERE clave IN ('
+                'SELECT clave FROM carpetas ORDER BY usado DESC LIMIT -1 OFFSET ?)',
+                (self.max_entradas,)
+            )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+
+    def invalidar(self, clave):
+        """Elimina la entrada. Devuelve True si existía"""
+        return self._conexion().execute('DELETE FROM carpetas WHERE clave = ?', (clave,)).rowcount > 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_folder_cache():
+    """Caché compartida del proceso, o None si DRIVE_FOLDER_CACHE=False"""
+    global _cache
+    if os.getenv('DRIVE_FOLDER_CACHE', 'True').lower() != 'true':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FolderCache(ruta_instancia('drive_folders.db', 'DRIVE_FOLDER_CACHE_DB'))
+    return _cache
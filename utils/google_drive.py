@@ -1,73 +1,101 @@
 import requests
 import os
+import io
+import time
 from datetime import datetime
 import base64
+import logging
+from utils.apps_script_client import AppsScriptClient
+from utils.folder_cache import get_folder_cache
+from utils.logs import resumir
+
+logger = logging.getLogger(__name__)
+
+
+class CarpetaNoEncontrada(Exception):
+    """La carpeta de destino (ej. un ID tomado de la caché) ya no existe en Google Drive"""
+
+
+class SubidaInterrumpida(Exception):
+    """Una subida por partes no se pudo completar. Si upload_id no es None, se retoma
+    llamando de nuevo a upload_file con ese upload_id y el mismo contenido."""
+
+    def __init__(self, mensaje, upload_id, recibido):
+        super().__init__(mensaje)
+        self.upload_id = upload_id
+        self.recibido = recibido
 
 class GoogleDriveManager:
+    # Referencias a salidas de pasos previos dentro de processSubmission (ver app.gs)
+    FOLDER_REF = '${carpeta.createdFolders.0.id}'
+    DOCUMENT_REF = '${documento.documents.0.documentId}'
+    PDF_REF = '${documento.documents.0.pdfFileId}'
+    
+    # Las partes de una subida deben ser múltiplo de 256 KB (requisito de la API de Drive)
+    UPLOAD_GRANULARIDAD = 256 * 1024
+    
     def __init__(self):
         self.script_url = os.getenv('GOOGLE_APPS_SCRIPT_URL')
         self.token = os.getenv('GOOGLE_APPS_SCRIPT_TOKEN')
         self.root_folder_id = os.getenv('GOOGLE_DRIVE_ROOT_FOLDER_ID')
+        self.client = AppsScriptClient(self.script_url, self.token)
+        self.folder_cache = get_folder_cache()
+        parte = int(os.getenv('DRIVE_UPLOAD_CHUNK', 2 * 1024 * 1024))
+        self.upload_chunk_size = max(1, parte // self.UPLOAD_GRANULARIDAD) * self.UPLOAD_GRANULARIDAD
+        self.upload_reintentos = int(os.getenv('DRIVE_UPLOAD_REINTENTOS', 3))
         
-        # Debug: Imprimir los valores cargados
-        print(f"[DEBUG] GoogleDriveManager inicializado:")
-        print(f"[DEBUG]   script_url: {self.script_url}")
-        print(f"[DEBUG]   token: {self.token[:10] if self.token else 'None'}...")
-        print(f"[DEBUG]   root_folder_id: {self.root_folder_id}")
+        logger.debug(f"GoogleDriveManager inicializado (script_url: {self.script_url}, "
+                     f"root_folder_id: {self.root_folder_id})")
         
         # Validar que las variables estén configuradas
         if not self.script_url or 'TU_SCRIPT_ID' in self.script_url:
-            print(f"[ERROR] script_url no está configurada correctamente: {self.script_url}")
+            logger.error(f"script_url no está configurada correctamente: {self.script_url}")
         if not self.token:
-            print(f"[ERROR] token no está configurado")
+            logger.error("token no está configurado")
         if not self.root_folder_id:
-            print(f"[ERROR] root_folder_id no está configurado")
+            logger.error("root_folder_id no está configurado")
     
-    def _make_request(self, action, data):
+    def _make_request(self, action, data, mostrar_datos=True):
         """Hace una petición a la API de Google Apps Script"""
-        payload = {
-            'token': self.token,
-            'action': action,
-            **data
-        }
-        
-        print(f"[DEBUG] Haciendo petición a {self.script_url}")
-        print(f"[DEBUG] Acción: {action}")
-        print(f"[DEBUG] Datos: {data}")
+        # Los payloads se recortan y sin datos personales (ver utils/logs.py)
+        if mostrar_datos:
+            logger.debug('Petición %s: %s', action, resumir(data))
+        else:
+            logger.debug('Petición %s', action)
         
         try:
-            response = requests.post(self.script_url, json=payload, timeout=30)
-            print(f"[DEBUG] Código de respuesta: {response.status_code}")
+            response = self.client.post(action, data)
+            logger.debug('Código de respuesta de %s: %s', action, response.status_code)
             response.raise_for_status()
             result = response.json()
-            print(f"[DEBUG] Respuesta: {result}")
+            logger.debug('Respuesta de %s: %s', action, resumir(result))
             return result
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Error en petición a Google Apps Script: {e}")
+            logger.error(f"Error en petición a Google Apps Script: {e}")
             if hasattr(e, 'response') and e.response is not None:
-                print(f"[ERROR] Respuesta del servidor: {e.response.text}")
+                logger.error('Respuesta del servidor: %s', resumir(e.response.text))
             return None
     
     def create_folder(self, folder_name):
         """Crea una carpeta en Google Drive"""
-        print(f"[DEBUG] Intentando crear carpeta: {folder_name}")
-        print(f"[DEBUG] Root folder ID: {self.root_folder_id}")
+        logger.debug(f"Intentando crear carpeta: {folder_name}")
+        logger.debug(f"Root folder ID: {self.root_folder_id}")
         
         # Validaciones previas
         if not self.script_url:
-            print(f"[ERROR] script_url no configurada")
+            logger.error("script_url no configurada")
             raise Exception("Google Apps Script URL no configurada. Verificar GOOGLE_APPS_SCRIPT_URL en .env")
         
         if not self.token:
-            print(f"[ERROR] token no configurado")
+            logger.error("token no configurado")
             raise Exception("Google Apps Script token no configurado. Verificar GOOGLE_APPS_SCRIPT_TOKEN en .env")
         
         if not self.root_folder_id:
-            print(f"[ERROR] root_folder_id no configurado")
+            logger.error("root_folder_id no configurado")
             raise Exception("Google Drive root folder ID no configurado. Verificar GOOGLE_DRIVE_ROOT_FOLDER_ID en .env")
         
         if 'TU_SCRIPT_ID' in self.script_url:
-            print(f"[ERROR] script_url parece ser un valor de ejemplo")
+            logger.error("script_url parece ser un valor de ejemplo")
             raise Exception("Google Apps Script URL parece ser un valor de ejemplo. Actualizar con la URL real del script desplegado.")
         
         data = {
@@ -76,18 +104,19 @@ class GoogleDriveManager:
         }
         
         result = self._make_request('createFolders', data)
-        print(f"[DEBUG] Resultado de createFolders: {result}")
+        logger.debug('Resultado de createFolders: %s', resumir(result))
         
         if result and result.get('success'):
             folder_info = result['data']['createdFolders'][0]
             folder_id = folder_info['id']
-            print(f"[DEBUG] Carpeta creada exitosamente con ID: {folder_id}")
+            logger.info(f"Carpeta creada exitosamente con ID: {folder_id}")
+            self._cache_folder(folder_name, folder_id)
             return folder_id
         else:
             error_msg = "Error desconocido"
             if result:
                 error_msg = result.get('message', 'Error desconocido')
-                print(f"[ERROR] Error del servidor: {error_msg}")
+                logger.error(f"Error del servidor: {error_msg}")
                 if 'token' in error_msg.lower():
                     raise Exception(f"Error de autenticación: {error_msg}. Verificar GOOGLE_APPS_SCRIPT_TOKEN")
                 elif 'folder' in error_msg.lower():
@@ -95,22 +124,53 @@ class GoogleDriveManager:
                 else:
                     raise Exception(f"Error de Google Apps Script: {error_msg}")
             else:
-                print(f"[ERROR] No se recibió respuesta del servidor")
+                logger.error("No se recibió respuesta del servidor")
                 raise Exception("No se recibió respuesta del Google Apps Script. Verificar URL y conectividad")
             return None
     
-    def upload_file(self, file_content, filename, mime_type, folder_id=None):
-        """Sube un archivo a Google Drive"""
-        # Convertir el contenido del archivo a base64
-        if isinstance(file_content, bytes):
-            file_base64 = base64.b64encode(file_content).decode('utf-8')
-        else:
-            file_base64 = base64.b64encode(file_content.encode('utf-8')).decode('utf-8')
+    def get_or_create_folder(self, folder_name):
+        """Devuelve (folder_id, desde_cache): usa la caché local si tiene la carpeta y,
+        si no, la pide a Apps Script (que reutiliza la carpeta si ya existe en Drive)"""
+        if self.folder_cache is not None:
+            folder_id = self.folder_cache.get(self._folder_cache_key(folder_name))
+            if folder_id:
+                logger.debug(f"Carpeta {folder_name} tomada de la caché: {folder_id}")
+                return folder_id, True
+        return self.create_folder(folder_name), False
+    
+    def invalidate_folder(self, folder_name):
+        """Olvida la carpeta guardada en la caché (ej. porque se borró en Drive)"""
+        if self.folder_cache is not None:
+            self.folder_cache.invalidar(self._folder_cache_key(folder_name))
+    
+    def _folder_cache_key(self, folder_name):
+        # La misma carpeta puede existir bajo distintas carpetas raíz
+        return f'{self.root_folder_id}/{folder_name}'
+    
+    def _cache_folder(self, folder_name, folder_id):
+        if self.folder_cache is not None and folder_id:
+            self.folder_cache.set(self._folder_cache_key(folder_name), folder_id)
+    
+    def upload_file(self, file_content, filename, mime_type, folder_id=None, upload_id=None):
+        """Sube un archivo a Google Drive. Devuelve el ID del archivo o None.
+        
+        file_content puede ser bytes, texto o un archivo abierto en modo binario. Los
+        archivos de más de DRIVE_UPLOAD_CHUNK bytes (o con upload_id, para retomar una
+        subida interrumpida) se suben por partes con upload_file_chunked.
+        """
+        if isinstance(file_content, str):
+            file_content = file_content.encode('utf-8')
+        archivo = io.BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+        size = archivo.seek(0, io.SEEK_END)
+        archivo.seek(0)
+        
+        if upload_id or size > self.upload_chunk_size:
+            return self.upload_file_chunked(archivo, size, filename, mime_type, folder_id, upload_id)
         
         file_data = {
             'fileName': filename,
             'mimeType': mime_type,
-            'fileContent': file_base64
+            'fileContent': base64.b64encode(archivo.read()).decode('ascii')
         }
         
         if folder_id:
@@ -118,33 +178,103 @@ class GoogleDriveManager:
         
         data = {'files': [file_data]}
         
-        result = self._make_request('uploadFiles', data)
+        result = self._make_request('uploadFiles', data, mostrar_datos=False)
         if result and result.get('success'):
             file_info = result['data']['results'][0]
             if file_info.get('success'):
                 return file_info['fileId']
         return None
     
-    def generate_document_from_template(self, template_id, filename, fields, folder_id=None, signature_data=None, equipo_data=None):
-        """Genera un documento a partir de una plantilla con soporte para firmas y tablas de equipo"""
+    def upload_file_chunked(self, archivo, size, filename, mime_type, folder_id=None, upload_id=None):
+        """Sube un archivo por partes de DRIVE_UPLOAD_CHUNK bytes.
+        
+        app.gs abre una sesión de subida reanudable de Drive y le reenvía cada parte,
+        de modo que en memoria (aquí y en Apps Script) hay una sola parte por vez. Si
+        una parte falla se consulta cuántos bytes recibió Drive y se sigue desde ahí
+        (si era la última, uploadStatus devuelve el archivo ya creado en lugar de
+        subirlo de nuevo); agotados los reintentos se lanza SubidaInterrumpida con
+        el upload_id.
+        """
+        if upload_id:
+            estado = self._upload_request('uploadStatus', {'uploadId': upload_id})
+            if estado is None:
+                raise SubidaInterrumpida(f'No se pudo consultar la subida {upload_id}', upload_id, 0)
+            logger.debug(f"Retomando subida {upload_id} desde el byte {estado['received']}")
+        else:
+            estado = self._upload_request('startUpload', {
+                'fileName': filename,
+                'mimeType': mime_type,
+                'size': size,
+                'folderId': folder_id
+            })
+            if estado is None:
+                return None
+            upload_id = estado['uploadId']
+            logger.debug(f"Subida {upload_id} iniciada: {size} bytes en partes de {self.upload_chunk_size}")
+        
+        fallos = 0
+        while not estado.get('completed'):
+            offset = estado['received']
+            archivo.seek(offset)
+            contenido = base64.b64encode(archivo.read(self.upload_chunk_size)).decode('ascii')
+            
+            nuevo = self._upload_request('uploadChunk', {'uploadId': upload_id, 'offset': offset, 'content': contenido})
+            contenido = None
+            if nuevo is None:
+                fallos += 1
+                if fallos > self.upload_reintentos:
+                    raise SubidaInterrumpida(
+                        f'Subida {upload_id} interrumpida en el byte {offset} de {size}', upload_id, offset
+                    )
+                time.sleep(min(2 ** fallos, 30))
+                # La parte pudo haber llegado aunque falló la respuesta: preguntar a Drive
+                nuevo = self._upload_request('uploadStatus', {'uploadId': upload_id})
+                if nuevo is None:
+                    continue
+            else:
+                fallos = 0
+            estado = nuevo
+        
+        logger.info(f"Subida {upload_id} completada: {estado.get('fileId')}")
+        return estado.get('fileId')
+    
+    def _upload_request(self, action, data):
+        """Acción de subida por partes. Devuelve result['data'] o None si falló.
+        Si la sesión de Drive venció lanza SubidaInterrumpida sin upload_id (hay que empezar de nuevo)."""
+        result = self._make_request(action, data, mostrar_datos=(action != 'uploadChunk'))
+        if result and result.get('success'):
+            return result['data']
+        if result and (result.get('data') or {}).get('expired'):
+            raise SubidaInterrumpida(result.get('message'), None, 0)
+        return None
+    
+    def generate_document_from_template(self, template_id, filename, fields, folder_id=None, signature_data=None,
+                                        equipo_data=None, export_pdf=False):
+        """Genera un documento a partir de una plantilla con soporte para firmas y tablas de equipo.
+        Con export_pdf también guarda su PDF en la carpeta (pdf_file_id en el resultado).
+        Lanza CarpetaNoEncontrada si folder_id ya no existe en Drive."""
         doc_data = {
             'templateId': template_id,
             'fileName': filename,
             'fields': fields
         }
+        if export_pdf:
+            doc_data['exportPdf'] = True
         
         if folder_id:
             doc_data['folderId'] = folder_id
+            # Fallar en lugar de dejar el documento fuera de la carpeta si ya no existe
+            doc_data['requireFolder'] = True
             
         # Agregar datos de firma si están disponibles
         if signature_data:
             doc_data['signatureData'] = signature_data
-            print(f"[DEBUG] Enviando datos de firma a Google Apps Script")
+            logger.debug("Enviando datos de firma a Google Apps Script")
             
         # Agregar datos del equipo si están disponibles
         if equipo_data:
             doc_data['equipoData'] = equipo_data
-            print(f"[DEBUG] Enviando datos de equipo a Google Apps Script: {len(equipo_data)} miembros")
+            logger.debug(f"Enviando datos de equipo a Google Apps Script: {len(equipo_data)} miembros")
         
         data = {'documents': [doc_data]}
         
@@ -152,116 +282,117 @@ class GoogleDriveManager:
         if result and result.get('success'):
             doc_info = result['data']['documents'][0]
             if doc_info.get('success'):
+                if doc_info.get('renderMode'):
+                    logger.debug(f"Documento completado con {doc_info['renderMode']} en {doc_info.get('renderMs')} ms")
+                if doc_info.get('pdfError'):
+                    logger.warning(f"No se pudo guardar el PDF del documento: {doc_info['pdfError']}")
                 return {
                     'document_id': doc_info['documentId'],
-                    'document_url': doc_info['documentUrl']
+                    'document_url': doc_info['documentUrl'],
+                    'pdf_file_id': doc_info.get('pdfFileId')
                 }
+            if doc_info.get('folderMissing'):
+                raise CarpetaNoEncontrada(doc_info.get('error'))
         return None
     
-    def convert_to_pdf(self, document_id, pdf_filename=None, folder_id=None):
-        """Convierte un documento de Google Docs a PDF real usando la funcionalidad de email"""
+    def process_submission(self, folder_name, template_id, filename, fields, equipo_data=None, email_data=None,
+                           export_pdf=False):
+        """Crea la carpeta, genera el documento y envía el email en una sola petición
+        usando la acción compuesta processSubmission de app.gs.
         
-        try:
-            print(f"[DEBUG] Iniciando conversión real a PDF para documento: {document_id}")
-            
-            # Estrategia: Usar la funcionalidad existente de sendEmail para convertir a PDF
-            # pero interceptar el proceso para obtener el archivo PDF resultante
-            
-            # Primero, intentemos crear un PDF real usando la API de conversión de email
-            # pero enviándolo a una dirección que no cause problemas
-            
-            email_data = {
-                'to': 'conversion-temp@domain-that-does-not-exist.invalid',  # Dirección inválida
-                'subject': 'Conversión temporal a PDF - No enviar',
-                'htmlBody': 'Conversión temporal de documento a PDF.',
-                'attachments': [
-                    {
-                        'fileId': document_id,
-                        'convertTo': 'pdf'
-                    }
-                ]
-            }
-            
-            print(f"[DEBUG] Enviando petición para conversión a PDF...")
-            result = self._make_request('sendEmail', email_data)
-            print(f"[DEBUG] Resultado de conversión via email: {result}")
-            
-            # Independientemente del resultado del email, proporcionamos acceso al PDF
-            pdf_download_url = f'https://docs.google.com/document/d/{document_id}/export?format=pdf'
-            pdf_url = f'https://drive.google.com/file/d/{document_id}/view'
-            
-            return {
-                'pdf_file_id': document_id,  # Usamos el mismo ID del documento
-                'pdf_filename': pdf_filename or 'documento.pdf',
-                'pdf_url': pdf_url,
-                'pdf_download_url': pdf_download_url,
-                'folder_id': folder_id,
-                'size': 0,  # No disponible sin crear archivo separado
-                'note': 'PDF disponible para descarga desde Google Docs',
-                'conversion_attempted': True
-            }
-            
-        except Exception as e:
-            print(f"[DEBUG] Error en conversión a PDF: {e}")
-            # Aún así, proporcionamos URLs de descarga
-            return {
-                'pdf_file_id': document_id,
-                'pdf_filename': pdf_filename or 'documento.pdf',
-                'pdf_url': f'https://drive.google.com/file/d/{document_id}/view',
-                'pdf_download_url': f'https://docs.google.com/document/d/{document_id}/export?format=pdf',
-                'folder_id': folder_id,
-                'size': 0,
-                'note': 'PDF disponible para descarga (conversión falló)',
-                'conversion_attempted': False
-            }
-    
-    def create_real_pdf_file(self, document_id, pdf_filename=None, folder_id=None):
-        """Crea un archivo PDF real en Google Drive descargando y resubiendo el documento"""
+        email_data son los datos de sendEmail; su adjunto puede usar las referencias
+        DOCUMENT_REF y PDF_REF (con export_pdf) al documento generado en el mismo lote.
+        """
+        if not self.root_folder_id:
+            raise Exception("Google Drive root folder ID no configurado. Verificar GOOGLE_DRIVE_ROOT_FOLDER_ID en .env")
         
-        try:
-            import requests
-            
-            print(f"[DEBUG] Creando archivo PDF real para: {document_id}")
-            
-            # 1. Descargar el documento como PDF usando la URL de exportación de Google
-            export_url = f'https://docs.google.com/document/d/{document_id}/export?format=pdf'
-            
-            # Obtener token de acceso para la descarga
-            # Nota: Esto requeriría implementar OAuth, por ahora usamos el método de email
-            
-            # Método alternativo: Usar la conversión de email para crear el PDF
-            email_data = {
-                'to': 'secretaria.extension@uncobariloche.com',  # Email real para que funcione
-                'subject': f'Documento generado: {pdf_filename or "formulario.pdf"}',
-                'htmlBody': 'Se adjunta el documento solicitado en formato PDF.',
-                'attachments': [
-                    {
-                        'fileId': document_id,
-                        'convertTo': 'pdf'
-                    }
-                ]
+        doc_data = {
+            'templateId': template_id,
+            'fileName': filename,
+            'fields': fields,
+            'folderId': self.FOLDER_REF
+        }
+        if equipo_data:
+            doc_data['equipoData'] = equipo_data
+        if export_pdf:
+            doc_data['exportPdf'] = True
+        
+        steps = [
+            {
+                'id': 'carpeta',
+                'action': 'createFolders',
+                'params': {
+                    'rootFolderId': self.root_folder_id,
+                    'folders': [{'name': folder_name}]
+                }
+            },
+            {
+                'id': 'documento',
+                'action': 'generateDocuments',
+                'params': {'documents': [doc_data]}
             }
-            
-            print(f"[DEBUG] Enviando email con PDF adjunto...")
-            result = self._make_request('sendEmail', email_data)
-            print(f"[DEBUG] Resultado de envío con PDF: {result}")
-            
-            if result and result.get('success'):
-                return {
-                    'pdf_file_id': document_id,  # ID del documento original
-                    'pdf_filename': pdf_filename or 'documento.pdf',
-                    'pdf_url': f'https://drive.google.com/file/d/{document_id}/view',
-                    'pdf_download_url': f'https://docs.google.com/document/d/{document_id}/export?format=pdf',
-                    'folder_id': folder_id,
-                    'email_sent': True,
-                    'note': 'PDF enviado por email y disponible para descarga'
+        ]
+        if email_data:
+            # El email es opcional: si falla, el documento igualmente queda generado
+            steps.append({
+                'id': 'email',
+                'action': 'sendEmail',
+                'optional': True,
+                'params': email_data
+            })
+        
+        result = self._make_request('processSubmission', {'steps': steps})
+        if not result or not result.get('data'):
+            error_msg = result.get('message', 'Error desconocido') if result else 'Sin respuesta de Google Apps Script'
+            raise Exception(f"Error en processSubmission: {error_msg}")
+        
+        pasos = {step['id']: step for step in result['data']['steps']}
+        
+        folder_id = None
+        carpeta = pasos.get('carpeta', {})
+        if carpeta.get('success') and carpeta.get('data'):
+            folder_id = carpeta['data']['createdFolders'][0].get('id')
+            self._cache_folder(folder_name, folder_id)
+        
+        document = None
+        documento = pasos.get('documento', {})
+        if documento.get('success') and documento.get('data'):
+            doc_info = documento['data']['documents'][0]
+            if doc_info.get('success'):
+                document = {
+                    'document_id': doc_info['documentId'],
+                    'document_url': doc_info['documentUrl'],
+                    'pdf_file_id': doc_info.get('pdfFileId')
                 }
-            else:
-                return None
-                
-        except Exception as e:
-            print(f"[DEBUG] Error creando archivo PDF real: {e}")
-            return None
+        
+        return {
+            'success': bool(folder_id and document),
+            'message': result.get('message'),
+            'folder_id': folder_id,
+            'document': document,
+            'email_sent': bool(pasos.get('email', {}).get('success'))
+        }
+    
+    def export_pdf(self, document_id, folder_id=None, filename=None):
+        """Guarda en Drive el PDF de un documento ya generado (en folder_id o en la
+        carpeta del documento). Devuelve el ID del PDF o None."""
+        data = {'documents': [{'documentId': document_id, 'folderId': folder_id, 'fileName': filename}]}
+        
+        result = self._make_request('exportPdf', data)
+        if result and result.get('success'):
+            pdf_info = result['data']['documents'][0]
+            if pdf_info.get('success'):
+                logger.debug(f"PDF guardado en Drive: {pdf_info['pdfFileId']} ({pdf_info.get('size')} bytes)")
+                return pdf_info['pdfFileId']
+            logger.warning(f"Error exportando PDF de {document_id}: {pdf_info.get('error')}")
+        return None
+    
+    @staticmethod
+    def pdf_download_url(document_id, pdf_file_id=None):
+        """URL de descarga del PDF: el archivo guardado o, si no hay, la exportación del documento"""
+        if pdf_file_id:
+            return f'https://drive.google.com/uc?export=download&id={pdf_file_id}'
+        return f'https://docs.google.com/document/d/{document_id}/export?format=pdf'
     
     def create_folder_name(self, docente_apellido, fecha=None):
         """Crea un nombre de carpeta basado en el apellido del docente y la fecha"""
@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import db, FormularioActividad, ProcesamientoJob
+from utils import metricas
+from utils.rate_limiter import CuotaAgotada
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Cola de trabajos persistida en SQLite con un pool de hilos trabajadores.
+
+    Los trabajos se guardan en la tabla procesamiento_jobs, por lo que sobreviven
+    a reinicios del proceso. Cada trabajador reclama un trabajo con un UPDATE
+    condicional, lo que permite tener varios procesos de mod_wsgi consumiendo la
+    misma cola sin procesar dos veces el mismo formulario.
+    """
+
+    def __init__(self, processor, num_workers=None, poll_interval=None, lease_seconds=None):
+        # processor(formulario_id) -> (success, message)
+        self.processor = processor
+        self.num_workers = num_workers or int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL', 2))
+        # Tiempo tras el cual un trabajo 'en_proceso' se considera abandonado
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', 300))
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._last_recover = 0.0
+
+    def start(self, app):
+        """Arranca los trabajadores (una sola vez por proceso)"""
+        if self._threads:
+            return
+        self.app = app
+
+        with app.app_context():
+            self.recover()
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f'JobQueue iniciada con {self.num_workers} trabajadores')
+
+    def stop(self, timeout=5):
+        """Detiene los trabajadores"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, formulario_id, max_intentos=None):
+        """Crea un trabajo para el formulario. Debe llamarse dentro de una sesión activa;
+        el trabajo queda persistido con el siguiente commit."""
+        job = ProcesamientoJob(formulario_id=formulario_id)
+        if max_intentos:
+            job.max_intentos = max_intentos
+        else:
+            job.max_intentos = int(os.getenv('JOB_MAX_INTENTOS', 3))
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Despierta a los trabajadores locales tras encolar un trabajo"""
+        self._wakeup.set()
+
+    def recover(self):
+        """Recupera trabajos abandonados y encola formularios pendientes sin trabajo"""
+        limite = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        reclamados = ProcesamientoJob.query.filter(
+            ProcesamientoJob.estado == 'en_proceso',
+            ProcesamientoJob.fecha_inicio < limite
+        ).update({'estado': 'pendiente'}, synchronize_session=False)
+
+        # Formularios guardados en estado 'pendiente' que nunca recibieron un trabajo.
+        # Se hace con un único INSERT ... SELECT para que sea atómico entre procesos.
+        ahora = datetime.utcnow()
+        huerfanos = db.select(
+            FormularioActividad.id,
+            db.literal('pendiente'),
+            db.literal(0),
+            db.literal(int(os.getenv('JOB_MAX_INTENTOS', 3))),
+            db.literal(ahora),
+            db.literal(ahora)
+        ).where(
+            FormularioActividad.estado == 'pendiente',
+            ~FormularioActividad.id.in_(db.select(ProcesamientoJob.formulario_id))
+        )
+        encolados = db.session.execute(
+            db.insert(ProcesamientoJob).from_select(
+                ['formulario_id', 'estado', 'intentos', 'max_intentos', 'fecha_creacion', 'proximo_intento'],
+                huerfanos
+            )
+        ).rowcount
+
+        db.session.commit()
+        self._last_recover = time.monotonic()
+        if reclamados or encolados:
+            logger.info(f'JobQueue: {reclamados} trabajos recuperados, {encolados} formularios encolados')
+
+    def claim(self):
+        """Reclama atómicamente el próximo trabajo disponible. Devuelve el trabajo o None."""
+        ahora = datetime.utcnow()
+        candidatos = ProcesamientoJob.query.filter(
+            ProcesamientoJob.estado == 'pendiente',
+            ProcesamientoJob.proximo_intento <= ahora
+        ).order_by(ProcesamientoJob.proximo_intento, ProcesamientoJob.id).with_entities(
+            ProcesamientoJob.id
+        ).limit(self.num_workers).all()
+
+        for (job_id,) in candidatos:
+            actualizados = ProcesamientoJob.query.filter(
+                ProcesamientoJob.id == job_id,
+                ProcesamientoJob.estado == 'pendiente'
+            ).update({
+                'estado': 'en_proceso',
+                'fecha_inicio': ahora,
+                'intentos': ProcesamientoJob.intentos + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if actualizados == 1:
+                return db.session.get(ProcesamientoJob, job_id)
+        return None
+
+    def run_pending(self):
+        """Procesa un trabajo disponible. Devuelve True si se procesó alguno."""
+        job = self.claim()
+        if job is None:
+            return False
+
+        try:
+            success, message = self.processor(job.formulario_id)
+        except CuotaAgotada as e:
+            # Sin cupo en Apps Script: se pospone sin consumir un intento
+            db.session.rollback()
+            job = db.session.get(ProcesamientoJob, job.id)
+            job.estado = 'pendiente'
+            job.intentos -= 1
+            job.mensaje_error = str(e)
+            job.proximo_intento = datetime.utcnow() + timedelta(seconds=e.reintentar_en)
+            db.session.commit()
+            logger.info(f'Trabajo {job.id} pospuesto {e.reintentar_en:.0f}s: {e}')
+            return True
+        except Exception as e:
+            logger.exception(f'Error procesando trabajo {job.id}')
+            db.session.rollback()
+            success, message = False, str(e)
+
+        job = db.session.get(ProcesamientoJob, job.id)
+        job.fecha_fin = datetime.utcnow()
+        if success:
+            job.estado = 'completado'
+            job.mensaje_error = None
+        elif job.intentos < job.max_intentos:
+            # Reintento con espera exponencial: 30s, 60s, 120s...
+            job.estado = 'pendiente'
+            job.mensaje_error = message
+            job.proximo_intento = datetime.utcnow() + timedelta(seconds=30 * 2 ** (job.intentos - 1))
+        else:
+            job.estado = 'error'
+            job.mensaje_error = message
+            formulario = db.session.get(FormularioActividad, job.formulario_id)
+            if formulario:
+                formulario.estado = 'error'
+        db.session.commit()
+        if job.estado == 'error':
+            metricas.incrementar('pilar_formularios_total', estado='error')
+        logger.info(f'Trabajo {job.id} (formulario {job.formulario_id}): {job.estado}')
+        return True
+
+    def _worker_loop(self):
+        """Bucle principal de cada hilo trabajador"""
+        while not self._stop.is_set():
+            procesado = False
+            try:
+                with self.app.app_context():
+                    procesado = self.run_pending()
+                    if not procesado and time.monotonic() - self._last_recover > self.lease_seconds / 5:
+                        self.recover()
+            except Exception:
+                logger.exception('Error en el trabajador de la cola')
+
+            if not procesado:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
@@ -0,0 +1,175 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from utils.correlacion import FiltroCorrelacion
+
+FORMATO_TEXTO = '%(asctime)s - %(process)d - [%(id_correlacion)s] - %(name)s - %(levelname)s - %(message)s'
+
+# Largo máximo de cada texto de un payload en los logs
+LARGO_MAXIMO = int(os.getenv('LOG_MAX_TEXTO', 200))
+
+# Claves (en minúsculas) cuyo valor no se escribe en los logs: datos personales,
+# credenciales y contenidos en Base64
+_CLAVES_OCULTAS = {
+    'dni', 'dni_responsable', 'email', 'email_responsable', 'correo', 'to', 'cc', 'token',
+    'equipo', 'firma', 'firma_docente', 'signaturedata', 'content', 'filecontent'
+}
+
+# Atributos estándar de LogRecord (lo demás viene de extra=...)
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_destinos = []
+_lock = threading.Lock()
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en extra=..."""
+
+    def format(self, record):
+        datos = {
+            'fecha': self.formatTime(record),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'proceso': record.process,
+            'hilo': record.threadName,
+            'mensaje': record.getMessage()
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD:
+                datos[clave] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class _ColaHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta registros si la cola está llena en lugar de bloquear"""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def _parse_niveles(valor):
+    """Parsea LOG_NIVELES con formato 'logger=NIVEL,logger2=NIVEL'"""
+    niveles = {}
+    for item in (valor or '').split(','):
+        if '=' not in item:
+            continue
+        nombre, nivel = item.split('=', 1)
+        niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar(archivo=None, nivel=None):
+    """Configura el logging del proceso (una sola vez).
+
+    Los hilos que atienden requests solo encolan el registro; un QueueListener
+    en un hilo aparte lo escribe en stderr y, si se indica, en `archivo`. Se
+    configura con LOG_LEVEL, LOG_NIVELES (nivel por logger), LOG_FORMATO
+    ('texto' o 'json'), LOG_FILE y LOG_COLA_MAX.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        formato = FormatoJSON() if os.getenv('LOG_FORMATO', 'texto').lower() == 'json' \
+            else logging.Formatter(FORMATO_TEXTO)
+        _destinos.append(logging.StreamHandler())
+        archivo = archivo or os.getenv('LOG_FILE')
+        if archivo:
+            os.makedirs(os.path.dirname(str(archivo)) or '.', exist_ok=True)
+            _destinos.append(logging.FileHandler(archivo, encoding='utf-8'))
+        for destino in _destinos:
+            destino.setFormatter(formato)
+            destino.addFilter(FiltroCorrelacion())
+
+        cola = queue.Queue(int(os.getenv('LOG_COLA_MAX', 10000)))
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        # El ID de correlación se toma en el hilo del request, antes de encolar
+        cola_handler = _ColaHandler(cola)
+        cola_handler.addFilter(FiltroCorrelacion())
+        raiz.addHandler(cola_handler)
+        raiz.setLevel((nivel or os.getenv('LOG_LEVEL', 'INFO')).upper())
+        for nombre, nivel_logger in _parse_niveles(os.getenv('LOG_NIVELES')).items():
+            logging.getLogger(nombre).setLevel(nivel_logger)
+
+        _listener = logging.handlers.QueueListener(cola, *_destinos, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener)
+        # Los procesos de pdf_pool (fork) no heredan el hilo del listener
+        os.register_at_fork(after_in_child=_escribir_directo)
+        return _listener
+
+
+def detener():
+    """Escribe los registros pendientes y detiene el listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def descartados():
+    """Registros descartados en este proceso por tener la cola llena"""
+    return sum(h.descartados for h in logging.getLogger().handlers if isinstance(h, _ColaHandler))
+
+
+def _escribir_directo():
+    """En un proceso hijo, escribe directamente en los destinos en lugar de la cola"""
+    global _listener
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        if isinstance(handler, _ColaHandler):
+            raiz.removeHandler(handler)
+            for destino in _destinos:
+                raiz.addHandler(destino)
+    _listener = None
+
+
+def _recortar(valor, clave=None):
+    if clave is not None and str(clave).lower() in _CLAVES_OCULTAS:
+        return f'<oculto {len(valor)}>' if isinstance(valor, (str, bytes, list)) else '<oculto>'
+    if isinstance(valor, dict):
+        return {k: _recortar(v, k) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_recortar(v) for v in valor]
+    if isinstance(valor, bytes):
+        return f'<{len(valor)} bytes>'
+    if isinstance(valor, str) and len(valor) > LARGO_MAXIMO:
+        return f'{valor[:LARGO_MAXIMO]}...(+{len(valor) - LARGO_MAXIMO})'
+    return valor
+
+
+class _Resumen:
+    __slots__ = ('valor',)
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def __str__(self):
+        return str(_recortar(self.valor))
+
+
+def resumir(valor):
+    """Representación de un payload para los logs: textos recortados a LARGO_MAXIMO
+    y datos personales ocultos. Se calcula solo si el registro se llega a escribir:
+
+        logger.debug('Datos: %s', resumir(data))
+    """
+    return _Resumen(valor)
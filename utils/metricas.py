@@ -0,0 +1,279 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from utils import ruta_instancia
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# nombre -> (tipo, descripción, buckets)
+METRICAS = {
+    'pilar_etapa_segundos': (
+        'histogram', 'Duración de cada etapa del envío y procesamiento de formularios', BUCKETS_SEGUNDOS
+    ),
+    'pilar_apps_script_segundos': (
+        'histogram', 'Duración de las peticiones a Google Apps Script por acción y código de respuesta',
+        BUCKETS_SEGUNDOS
+    ),
+    'pilar_apps_script_bytes': (
+        'histogram', 'Tamaño de las peticiones y respuestas de Google Apps Script', BUCKETS_BYTES
+    ),
+    'pilar_formularios_total': ('counter', 'Formularios que llegaron a un estado final', None),
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metricas (
+    proceso TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    etiquetas TEXT NOT NULL,
+    valores TEXT NOT NULL,
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (proceso, nombre, etiquetas)
+);
+"""
+
+# Filas de los procesos que ya no existen (ej. tras un reinicio de mod_wsgi)
+_ACUMULADO = 'acumulado'
+
+
+class Metricas:
+    """Histogramas y contadores agregados entre todos los procesos de la aplicación.
+
+    Cada proceso acumula en memoria (los hilos de los requests no tocan el disco) y
+    un hilo guarda cada `intervalo` segundos sus valores totales en un archivo
+    SQLite compartido, una fila por proceso y serie. exponer() suma las filas de
+    todos los procesos. Las filas de procesos que dejaron de actualizarse se
+    suman a una fila común para que los contadores no retrocedan.
+    """
+
+    def __init__(self, db_path, intervalo=None):
+        self.db_path = db_path
+        self.intervalo = intervalo or float(os.getenv('METRICAS_INTERVALO', 15))
+        self._valores = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._esquema_creado = False
+        self._pid = None
+        self._proceso = None
+        self._thread = None
+
+    def _verificar_proceso(self):
+        """Tras un fork, el hijo empieza sin los valores del padre y con su propio hilo"""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._valores = {}
+                    self._proceso = f'{pid}-{uuid.uuid4().hex[:8]}'
+                    self._thread = threading.Thread(target=self._loop, name='metricas', daemon=True)
+                    self._thread.start()
+                    self._pid = pid
+
+    def observar(self, nombre, valor, **etiquetas):
+        """Agrega una observación a un histograma"""
+        self._verificar_proceso()
+        buckets = METRICAS[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            serie = self._valores.get(clave)
+            if serie is None:
+                # Cantidad por bucket (el último es +Inf), suma y cantidad total
+                serie = self._valores[clave] = [0] * (len(buckets) + 1) + [0.0, 0]
+            serie[bisect_left(buckets, valor)] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        """Incrementa un contador"""
+        self._verificar_proceso()
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def _conexion(self):
+        """Conexión SQLite por hilo (y por proceso, para no heredarla tras un fork)"""
+        pid = os.getpid()
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != pid:
+            directorio = os.path.dirname(self.db_path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            if not self._esquema_creado:
+                conexion.executescript(_ESQUEMA)
+                self._esquema_creado = True
+            self._local.conexion = conexion
+            self._local.pid = pid
+        return conexion
+
+    def guardar(self):
+        """Escribe los valores de este proceso en el archivo compartido"""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            filas = [
+                (self._proceso, nombre, json.dumps(etiquetas), json.dumps(valores), time.time())
+                for (nombre, etiquetas), valores in self._valores.items()
+            ]
+        if not filas:
+            return
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            conexion.executemany(
+                'INSERT OR REPLACE INTO metricas (proceso, nombre, etiquetas, valores, actualizado) '
+                'VALUES (?, ?, ?, ?, ?)', filas
+            )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+
+    def compactar(self):
+        """Suma a la fila común las filas de los procesos que ya no se actualizan"""
+        conexion = self._conexion()
+        limite = time.time() - 10 * self.intervalo
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            viejas = conexion.execute(
+                'SELECT proceso, nombre, etiquetas, valores FROM metricas WHERE proceso != ? AND actualizado < ?',
+                (_ACUMULADO, limite)
+            ).fetchall()
+            for proceso, nombre, etiquetas, valores in viejas:
+                fila = conexion.execute(
+                    'SELECT valores FROM metricas WHERE proceso = ? AND nombre = ? AND etiquetas = ?',
+                    (_ACUMULADO, nombre, etiquetas)
+                ).fetchone()
+                total = json.loads(valores) if fila is None else _sumar(json.loads(fila[0]), json.loads(valores))
+                conexion.execute(
+                    'INSERT OR REPLACE INTO metricas (proceso, nombre, etiquetas, valores, actualizado) '
+                    'VALUES (?, ?, ?, ?, ?)', (_ACUMULADO, nombre, etiquetas, json.dumps(total), time.time())
+                )
+                conexion.execute(
+                    'DELETE FROM metricas WHERE proceso = ? AND nombre = ? AND etiquetas = ?',
+                    (proceso, nombre, etiquetas)
+                )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+
+    def exponer(self):
+        """Métricas de todos los procesos en formato de texto de Prometheus"""
+        self._verificar_proceso()
+        self.guardar()
+        series = {}
+        for nombre, etiquetas, valores in self._conexion().execute(
+            'SELECT nombre, etiquetas, valores FROM metricas'
+        ):
+            if nombre not in METRICAS:
+                continue
+            clave = (nombre, tuple(tuple(par) for par in json.loads(etiquetas)))
+            valores = json.loads(valores)
+            series[clave] = _sumar(series[clave], valores) if clave in series else valores
+
+        lineas = []
+        for nombre, (tipo, descripcion, buckets) in METRICAS.items():
+            lineas.append(f'# HELP {nombre} {descripcion}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for (serie_nombre, etiquetas), valores in sorted(series.items()):
+                if serie_nombre != nombre:
+                    continue
+                if tipo == 'counter':
+                    lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valores)}')
+                    continue
+                acumulado = 0
+                for limite, cantidad in zip(buckets + ('+Inf',), valores[:-2]):
+                    acumulado += cantidad
+                    lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", _numero(limite)),))} {acumulado}')
+                lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(valores[-2])}')
+                lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {valores[-1]}')
+        return '\n'.join(lineas) + '\n'
+
+    def _loop(self):
+        """Bucle del hilo que guarda los valores del proceso"""
+        ultima_compactacion = 0.0
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.guardar()
+                if time.monotonic() - ultima_compactacion > 10 * self.intervalo:
+                    self.compactar()
+                    ultima_compactacion = time.monotonic()
+            except Exception:
+                logger.exception('Error guardando las métricas')
+
+
+def _sumar(a, b):
+    if isinstance(a, list):
+        return [x + y for x, y in zip(a, b)]
+    return a + b
+
+
+def _numero(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(clave, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for clave, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+def get_metricas():
+    """Métricas compartidas del proceso, o None si METRICAS=False"""
+    global _metricas
+    if os.getenv('METRICAS', 'True').lower() != 'true':
+        return None
+    if _metricas is None:
+        with _metricas_lock:
+            if _metricas is None:
+                _metricas = Metricas(ruta_instancia('metricas.db', 'METRICAS_DB'))
+                atexit.register(_metricas.guardar)
+    return _metricas
+
+
+def observar(nombre, valor, **etiquetas):
+    metricas = get_metricas()
+    if metricas is not None:
+        metricas.observar(nombre, valor, **etiquetas)
+
+
+def incrementar(nombre, cantidad=1, **etiquetas):
+    metricas = get_metricas()
+    if metricas is not None:
+        metricas.incrementar(nombre, cantidad, **etiquetas)
+
+
+@contextmanager
+def medir(etapa):
+    """Mide la duración de una etapa (pilar_etapa_segundos). Sirve también como decorador.
+    Con DEBUG, cada duración queda también en el log con el ID de correlación del request."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        observar('pilar_etapa_segundos', duracion, etapa=etapa)
+        logger.debug('Etapa %s: %.3f s', etapa, duracion)
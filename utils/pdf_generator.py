@@ -5,10 +5,13 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from io import BytesIO
+from xml.sax.saxutils import escape
 import os
 import base64
 from datetime import datetime
 
+from utils import campos_template
+
 class PDFGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
@@ -89,6 +92,10 @@ class PDFGenerator:
         
         return pdf_content
     
+    def _texto(self, valor):
+        """Escapa el texto ingresado por el usuario para usarlo en un Paragraph"""
+        return escape(str(valor or '')).replace('\n', '<br/>')
+    
     def _add_header(self, story):
         """Agregar encabezado del documento"""
         
@@ -108,22 +115,22 @@ class PDFGenerator:
         
         # Título de la actividad
         story.append(Paragraph("Título de la Actividad", self.styles['SubtitleStyle']))
-        story.append(Paragraph(data.get('titulo_actividad', ''), self.styles['JustifiedStyle']))
+        story.append(Paragraph(self._texto(data.get('titulo_actividad')), self.styles['JustifiedStyle']))
         story.append(Spacer(1, 15))
         
         # Docente responsable
         story.append(Paragraph("Docente Responsable", self.styles['SubtitleStyle']))
-        story.append(Paragraph(data.get('docente_responsable', ''), self.styles['Normal']))
+        story.append(Paragraph(self._texto(data.get('docente_responsable')), self.styles['Normal']))
         story.append(Spacer(1, 10))
         
         # Email del docente responsable
         story.append(Paragraph("Correo electrónico", self.styles['FieldLabelStyle']))
-        story.append(Paragraph(data.get('email_responsable', ''), self.styles['Normal']))
+        story.append(Paragraph(self._texto(data.get('email_responsable')), self.styles['Normal']))
         story.append(Spacer(1, 10))
         
         # DNI del docente responsable
         story.append(Paragraph("DNI", self.styles['FieldLabelStyle']))
-        story.append(Paragraph(data.get('dni_responsable', ''), self.styles['Normal']))
+        story.append(Paragraph(self._texto(data.get('dni_responsable')), self.styles['Normal']))
         story.append(Spacer(1, 15))
     
     def _add_team_section(self, story, data):
@@ -172,19 +179,19 @@ class PDFGenerator:
         # Fundamentación
         story.append(Paragraph("Fundamentación", self.styles['SubtitleStyle']))
         fundamentacion = data.get('fundamentacion', '')
-        story.append(Paragraph(fundamentacion, self.styles['JustifiedStyle']))
+        story.append(Paragraph(self._texto(fundamentacion), self.styles['JustifiedStyle']))
         story.append(Spacer(1, 15))
         
         # Objetivos o Propósitos
         story.append(Paragraph("Objetivos o Propósitos", self.styles['SubtitleStyle']))
         objetivos = data.get('objetivos', '')
-        story.append(Paragraph(objetivos, self.styles['JustifiedStyle']))
+        story.append(Paragraph(self._texto(objetivos), self.styles['JustifiedStyle']))
         story.append(Spacer(1, 15))
         
         # Metodología
         story.append(Paragraph("Metodología", self.styles['SubtitleStyle']))
         metodologia = data.get('metodologia', '')
-        story.append(Paragraph(metodologia, self.styles['JustifiedStyle']))
+        story.append(Paragraph(self._texto(metodologia), self.styles['JustifiedStyle']))
         story.append(Spacer(1, 15))
     
     def _add_practical_info(self, story, data):
@@ -192,14 +199,14 @@ class PDFGenerator:
         
         # Grados incluidos / Requisitos
         story.append(Paragraph("Grados que estarían incluidos en la actividad / Requisitos", self.styles['SubtitleStyle']))
-        grados = data.get('grados_requisitos', '')
-        story.append(Paragraph(grados, self.styles['Normal']))
+        grados = data.get('grados_requisitos') or data.get('grados', '')
+        story.append(Paragraph(self._texto(grados), self.styles['Normal']))
         story.append(Spacer(1, 15))
         
         # Materiales e insumos / Presupuesto
         story.append(Paragraph("(Materiales e insumos) Presupuesto", self.styles['SubtitleStyle']))
         materiales = data.get('materiales_presupuesto', '')
-        story.append(Paragraph(materiales, self.styles['Normal']))
+        story.append(Paragraph(self._texto(materiales), self.styles['Normal']))
         story.append(Spacer(1, 15))
         
         # Fechas propuestas
@@ -207,9 +214,12 @@ class PDFGenerator:
         fechas = data.get('fechas', [])
         if fechas:
             fechas_text = ", ".join(fechas)
+        elif data.get('meses'):
+            # Formularios actuales: períodos como texto legible (ej. "2025: Marzo, Abril")
+            fechas_text = data['meses']
         else:
             fechas_text = "No se especificaron fechas"
-        story.append(Paragraph(fechas_text, self.styles['Normal']))
+        story.append(Paragraph(self._texto(fechas_text), self.styles['Normal']))
         story.append(Spacer(1, 20))
         
         # Firma del docente
@@ -268,81 +278,5 @@ class PDFGenerator:
             return False
     
     def create_template_fields(self, formulario_data):
-        """Crear los campos para reemplazar en el template de Google Docs"""
-        
-        # Formatear información del equipo
-        equipo_text = self._formatear_equipo_para_template(formulario_data.get('equipo', []))
-        
-        # Formatear fechas
-        fechas_text = ""
-        if formulario_data.get('fechas'):
-            fechas_text = ", ".join(formulario_data['fechas'])
-        if not fechas_text.strip():
-            fechas_text = "No especificado"
-        
-        # Procesar información de firma
-        firma_info = self._procesar_firma_para_template(formulario_data.get('firma_docente'))
-        
-        # Crear el diccionario de campos para reemplazar
-        # Función auxiliar para asegurar que no haya campos vacíos
-        def ensure_not_empty(value, default="No especificado"):
-            if not value or not str(value).strip():
-                return default
-            return str(value).strip()
-        
-        fields = {
-            'TITULO_ACTIVIDAD': ensure_not_empty(formulario_data.get('titulo_actividad', '')),
-            'DOCENTE_RESPONSABLE': ensure_not_empty(formulario_data.get('docente_responsable', '')),
-            'EMAIL_RESPONSABLE': ensure_not_empty(formulario_data.get('email_responsable', '')),
-            'DNI_RESPONSABLE': ensure_not_empty(formulario_data.get('dni_responsable', '')),
-            'DEPARTAMENTO': ensure_not_empty(formulario_data.get('departamento', '')),
-            'EQUIPO': ensure_not_empty(equipo_text),
-            'FUNDAMENTACION': ensure_not_empty(formulario_data.get('fundamentacion', '')),
-            'OBJETIVOS': ensure_not_empty(formulario_data.get('objetivos', '')),
-            'METODOLOGIA': ensure_not_empty(formulario_data.get('metodologia', '')),
-            'GRADOS': ensure_not_empty(formulario_data.get('grados', '')),
-            'MATERIALES_PRESUPUESTO': ensure_not_empty(formulario_data.get('materiales_presupuesto', '')),
-            'PERIODOS': ensure_not_empty(formulario_data.get('meses', '')),
-            'FECHA_GENERACION': datetime.now().strftime("%d/%m/%Y"),
-            'AÑO_CONVOCATORIA': str(datetime.now().year),
-            'CUADRO_FIRMA': ensure_not_empty(firma_info)
-        }
-        
-        return fields
-    
-    def _procesar_firma_para_template(self, firma_data):
-        """Procesa la firma para el template de Google Docs"""
-        if firma_data and firma_data.startswith('data:image/'):
-            # Usar solo el placeholder - la imagen real se insertará via Google Apps Script
-            return '[[CUADRO_FIRMA]]'
-        else:
-            return '\n\n\nFirma del Docente Responsable:\n\n_________________________________\n\n'
-    
-    def _formatear_equipo_para_template(self, equipo_data):
-        """Formatear información del equipo para el template de Google Docs (incluye claustro)"""
-        if not equipo_data:
-            return "No se especificó equipo de trabajo."
-        
-        # Crear texto formateado para el equipo
-        equipo_text = ""
-        for i, miembro in enumerate(equipo_data, 1):
-            nombre = miembro.get('apellido_nombre', '').strip()
-            dni = miembro.get('dni', '').strip()
-            correo = miembro.get('correo', '').strip()
-            claustro = miembro.get('claustro', '').strip()
-            
-            if nombre:  # Solo agregar si hay al menos un nombre
-                equipo_text += f"{i}. {nombre}"
-                if dni:
-                    equipo_text += f" (DNI: {dni})"
-                if correo:
-                    equipo_text += f" - {correo}"
-                if claustro:
-                    equipo_text += f" - Claustro: {claustro}"
-                equipo_text += "\n"
-        
-        # Si no hay miembros válidos
-        if not equipo_text.strip():
-            return "No se especificó equipo de trabajo."
-        
-        return equipo_text.strip()
\ No newline at end of file
+        """Crear los campos para reemplazar en el template de Google Docs (ver utils/campos_template.py)"""
+        return campos_template.create_template_fields(formulario_data)
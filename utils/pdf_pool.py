@@ -0,0 +1,130 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Generador de cada proceso del pool (creado una vez por proceso en _init_worker)
+_generator = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Inicializa el proceso trabajador: importa ReportLab y construye la hoja de estilos"""
+    global _generator
+    from utils.pdf_generator import PDFGenerator
+    _generator = PDFGenerator()
+
+
+def _render(formulario_data):
+    """Genera el PDF en el proceso trabajador"""
+    return _generator.generate_formulario_pdf(formulario_data)
+
+
+def _ping():
+    """Tarea vacía usada para forzar el arranque de los trabajadores"""
+    return os.getpid()
+
+
+def _start_method():
+    """Método de arranque de los procesos del pool.
+
+    'fork' es lo más rápido y funciona bajo mod_wsgi (donde sys.executable no es el
+    intérprete de Python), pero solo es seguro mientras el proceso tiene un único
+    hilo: con la cola de trabajos, el resumen o el listener de logs corriendo, el
+    hijo heredaría locks tomados por esos hilos. Si el pool se crea tarde (por
+    ejemplo en la primera exportación) se usa PDF_POOL_START_METHOD_TARDIO.
+    """
+    if os.getenv('PDF_POOL_START_METHOD'):
+        return os.getenv('PDF_POOL_START_METHOD')
+    if threading.active_count() == 1:
+        return 'fork'
+    return os.getenv('PDF_POOL_START_METHOD_TARDIO', 'forkserver')
+
+
+def get_pool():
+    """Devuelve el pool de procesos compartido, creándolo la primera vez.
+
+    La generación de PDF con ReportLab es CPU pura; ejecutarla en procesos aparte
+    evita retener el GIL en los hilos que atienden requests.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = int(os.getenv('PDF_POOL_WORKERS', 2))
+                start_method = _start_method()
+                if start_method != 'fork' and os.getenv('PDF_POOL_PYTHON'):
+                    # Bajo mod_wsgi: intérprete con el que arrancar los procesos
+                    multiprocessing.set_executable(os.getenv('PDF_POOL_PYTHON'))
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(start_method),
+                    initializer=_init_worker
+                )
+                logger.info(f'Pool de PDF creado con {workers} procesos ({start_method})')
+    return _pool
+
+
+def _descartar(pool):
+    """Descarta el pool si un trabajador murió; el próximo uso crea uno nuevo"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            logger.warning('El pool de PDF quedó inutilizable (murió un trabajador); se vuelve a crear')
+            pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def warmup():
+    """Arranca todos los procesos del pool (y su hoja de estilos) antes del primer uso.
+    Conviene llamarlo al iniciar la aplicación, antes de que existan otros hilos,
+    para que los procesos se creen con fork."""
+    pool = get_pool()
+    futures = [pool.submit(_ping) for _ in range(pool._max_workers)]
+    for future in futures:
+        future.result()
+
+
+def _enviar(formulario_data):
+    """Encola la generación en el pool (recreándolo si está roto). Devuelve (pool, Future)"""
+    pool = get_pool()
+    try:
+        return pool, pool.submit(_render, formulario_data)
+    except BrokenProcessPool:
+        _descartar(pool)
+        pool = get_pool()
+        return pool, pool.submit(_render, formulario_data)
+
+
+def submit(formulario_data):
+    """Encola la generación del PDF y devuelve un Future con los bytes"""
+    return _enviar(formulario_data)[1]
+
+
+def render_pdf(formulario_data, timeout=None):
+    """Genera el PDF del formulario en el pool y devuelve los bytes.
+    Lanza la excepción del trabajador o TimeoutError si tarda demasiado. Si el pool
+    se rompe durante la generación, lo vuelve a crear y reintenta una vez."""
+    if timeout is None:
+        timeout = float(os.getenv('PDF_RENDER_TIMEOUT', 60))
+    pool, futuro = _enviar(formulario_data)
+    try:
+        return futuro.result(timeout=timeout)
+    except BrokenProcessPool:
+        _descartar(pool)
+        return submit(formulario_data).result(timeout=timeout)
+
+
+def shutdown():
+    """Detiene el pool (los trabajadores se vuelven a crear en el próximo uso)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
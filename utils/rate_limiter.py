@@ -0,0 +1,367 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from utils import ruta_instancia
+
+logger = logging.getLogger(__name__)
+
+# Ritmo de cada acción: (tokens por segundo, capacidad de la ráfaga).
+# Apps Script no limita llamadas por segundo sino ejecuciones simultáneas (30 por
+# usuario); con ejecuciones de 3-5 s eso permite unas 6-10 por segundo. '*' es un
+# bucket común a todas las acciones que se queda en 5/s (unas 25 simultáneas) para
+# dejar margen; los buckets por acción solo evitan que una acción acapare ese ritmo.
+# Los presupuestos diarios se controlan aparte con CUOTAS_POR_DEFECTO.
+TASAS_POR_DEFECTO = {
+    '*': (5.0, 30),
+    'createFolders': (3.0, 15),
+    'generateDocuments': (2.0, 10),
+    'sendEmail': (2.0, 10),
+    'sendDigest': (0.2, 2),
+    'processSubmission': (2.0, 10),
+    'exportPdf': (2.0, 10),
+    'uploadChunk': (4.0, 20)
+}
+
+# Presupuestos diarios de Apps Script (valores de Google Workspace; en cuentas
+# gratuitas son 100 emails y 250 documentos). Se reinician a las 0 h UTC.
+CUOTAS_POR_DEFECTO = {
+    'email': 1500,        # destinatarios de email por día
+    'documentos': 1500,   # documentos creados por día
+    'urlfetch': 100000    # llamadas a UrlFetchApp (exportación a PDF en sendEmail)
+}
+
+# Consumo de cada cuota diaria por llamada a una acción. consumo_de lo ajusta a los
+# datos de la llamada: la cuota de email cuenta destinatarios (to, cc y bcc, como Gmail),
+# la de documentos cuenta documentos y processSubmission suma solo los pasos incluidos;
+# su entrada aquí es el caso con todos los pasos.
+CONSUMO_POR_ACCION = {
+    'generateDocuments': {'documentos': 1},
+    'sendEmail': {'email': 1, 'urlfetch': 1},
+    'sendDigest': {'email': 1},
+    'processSubmission': {'documentos': 1, 'email': 1, 'urlfetch': 1},
+    'exportPdf': {'urlfetch': 1},
+    'startUpload': {'urlfetch': 1},
+    'uploadChunk': {'urlfetch': 1},
+    'uploadStatus': {'urlfetch': 1}
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    accion TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consumo_diario (
+    cuota TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    usados INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cuota, dia)
+);
+CREATE TABLE IF NOT EXISTS contadores (
+    accion TEXT NOT NULL,
+    dia TEXT NOT NULL,
+    llamadas INTEGER NOT NULL DEFAULT 0,
+    esperas INTEGER NOT NULL DEFAULT 0,
+    segundos_espera REAL NOT NULL DEFAULT 0,
+    rechazos INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (accion, dia)
+);
+"""
+
+
+class CuotaAgotada(Exception):
+    """No se puede llamar a la acción ahora. reintentar_en indica en cuántos segundos
+    conviene volver a intentarlo (hasta el próximo día para las cuotas diarias)."""
+
+    def __init__(self, mensaje, reintentar_en):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
+
+
+def contar_destinatarios(data):
+    """Direcciones en to, cc y bcc (texto separado por comas o lista)"""
+    cantidad = 0
+    for campo in ('to', 'cc', 'bcc'):
+        valor = data.get(campo)
+        direcciones = valor.split(',') if isinstance(valor, str) else valor or []
+        cantidad += sum(1 for direccion in direcciones if str(direccion).strip())
+    return cantidad
+
+
+def consumo_de(accion, data=None):
+    """Consumo de cuotas de una llamada según sus datos (ver CONSUMO_POR_ACCION)"""
+    if data is None:
+        return CONSUMO_POR_ACCION.get(accion, {})
+    if accion == 'processSubmission':
+        consumo = {}
+        for paso in data.get('steps') or []:
+            for cuota, cantidad in consumo_de(paso.get('action'), paso.get('params') or {}).items():
+                consumo[cuota] = consumo.get(cuota, 0) + cantidad
+        return consumo
+
+    consumo = dict(CONSUMO_POR_ACCION.get(accion, {}))
+    if 'email' in consumo:
+        consumo['email'] = max(contar_destinatarios(data), 1)
+    if 'documentos' in consumo and data.get('documents'):
+        consumo['documentos'] = len(data['documents'])
+    return consumo
+
+
+def _parse_pares(value, convertir):
+    """Parsea variables con formato 'clave=valor,clave2=valor2'"""
+    resultado = {}
+    if not value:
+        return resultado
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        clave, spec = item.split('=', 1)
+        try:
+            resultado[clave.strip()] = convertir(spec.strip())
+        except ValueError:
+            logger.error(f"Valor inválido para {clave}: {spec}")
+    return resultado
+
+
+def _parse_tasa(spec):
+    """'tokens_por_segundo:capacidad' o solo 'tokens_por_segundo'"""
+    partes = spec.split(':')
+    tasa = float(partes[0])
+    capacidad = float(partes[1]) if len(partes) > 1 else max(1.0, tasa)
+    return tasa, capacidad
+
+
+class RateLimiter:
+    """Token bucket por acción y presupuestos diarios compartidos entre procesos.
+
+    El estado vive en un archivo SQLite propio; cada operación es una transacción
+    BEGIN IMMEDIATE, por lo que todos los procesos de mod_wsgi (y sus hilos) ven
+    los mismos tokens y el mismo consumo diario. Cuando no hay tokens la llamada
+    espera su turno en lugar de fallar, lo que suaviza las ráfagas; solo se
+    rechaza si la espera supera max_espera o si se agotó una cuota diaria.
+    """
+
+    def __init__(self, db_path, tasas=None, cuotas=None, max_espera=None):
+        self.db_path = db_path
+        self.tasas = dict(TASAS_POR_DEFECTO)
+        self.tasas.update(tasas or {})
+        self.cuotas = dict(CUOTAS_POR_DEFECTO)
+        self.cuotas.update(cuotas or {})
+        self.max_espera = max_espera if max_espera is not None else float(os.getenv('APPS_SCRIPT_MAX_ESPERA', 120))
+        self._local = threading.local()
+        self._esquema_creado = False
+
+    def _conexion(self):
+        """Conexión SQLite por hilo (y por proceso, para no heredarla tras un fork)"""
+        pid = os.getpid()
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != pid:
+            directorio = os.path.dirname(self.db_path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            if not self._esquema_creado:
+                conexion.executescript(_ESQUEMA)
+                self._esquema_creado = True
+            self._local.conexion = conexion
+            self._local.pid = pid
+        return conexion
+
+    @staticmethod
+    def _dia():
+        return datetime.utcnow().strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _segundos_hasta_manana():
+        ahora = datetime.utcnow()
+        manana = (ahora + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (manana - ahora).total_seconds()
+
+    def _buckets(self, accion):
+        return [nombre for nombre in (accion, '*') if nombre in self.tasas]
+
+    def adquirir(self, accion, consumo=None, max_espera=None):
+        """Espera hasta poder llamar a la acción y consume su token y sus cuotas
+        (`consumo`, por defecto el de CONSUMO_POR_ACCION). Devuelve los segundos
+        esperados. Lanza CuotaAgotada si no es posible en max_espera segundos."""
+        if consumo is None:
+            consumo = CONSUMO_POR_ACCION.get(accion, {})
+        if max_espera is None:
+            max_espera = self.max_espera
+        inicio = time.monotonic()
+        esperado = 0.0
+        while True:
+            espera = self._intentar(accion, esperado, consumo)
+            if espera == 0:
+                return esperado
+            if esperado + espera > max_espera:
+                self._contar(accion, rechazos=1)
+                raise CuotaAgotada(
+                    f'Límite de ritmo de Apps Script para {accion}: se necesitaría esperar {espera:.0f}s',
+                    espera
+                )
+            time.sleep(espera)
+            esperado = time.monotonic() - inicio
+
+    def _intentar(self, accion, esperado, consumo):
+        """Intenta consumir en una transacción. Devuelve 0 si lo logró o los segundos a esperar"""
+        conexion = self._conexion()
+        dia = self._dia()
+        ahora = time.time()
+
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            for cuota, cantidad in consumo.items():
+                limite = self.cuotas.get(cuota)
+                if limite is None:
+                    continue
+                fila = conexion.execute(
+                    'SELECT usados FROM consumo_diario WHERE cuota = ? AND dia = ?', (cuota, dia)
+                ).fetchone()
+                if (fila[0] if fila else 0) + cantidad > limite:
+                    self._contar(accion, rechazos=1, conexion=conexion)
+                    conexion.execute('COMMIT')
+                    raise CuotaAgotada(
+                        f'Cuota diaria de Apps Script agotada ({cuota}: {limite}) para {accion}',
+                        self._segundos_hasta_manana()
+                    )
+
+            disponibles = {}
+            espera = 0
+            for nombre in self._buckets(accion):
+                tasa, capacidad = self.tasas[nombre]
+                fila = conexion.execute(
+                    'SELECT tokens, actualizado FROM buckets WHERE accion = ?', (nombre,)
+                ).fetchone()
+                tokens = capacidad if fila is None else min(capacidad, fila[0] + (ahora - fila[1]) * tasa)
+                disponibles[nombre] = tokens
+                if tokens < 1:
+                    espera = max(espera, (1 - tokens) / tasa)
+
+            if espera > 0:
+                conexion.execute('COMMIT')
+                return espera
+
+            for nombre, tokens in disponibles.items():
+                conexion.execute(
+                    'INSERT OR REPLACE INTO buckets (accion, tokens, actualizado) VALUES (?, ?, ?)',
+                    (nombre, tokens - 1, ahora)
+                )
+            for cuota, cantidad in consumo.items():
+                conexion.execute(
+                    'INSERT INTO consumo_diario (cuota, dia, usados) VALUES (?, ?, ?) '
+                    'ON CONFLICT (cuota, dia) DO UPDATE SET usados = usados + excluded.usados',
+                    (cuota, dia, cantidad)
+                )
+            self._contar(accion, llamadas=1, esperas=1 if esperado > 0 else 0,
+                         segundos_espera=esperado, conexion=conexion)
+            conexion.execute('COMMIT')
+            return 0
+        except CuotaAgotada:
+            raise
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+
+    def _contar(self, accion, llamadas=0, esperas=0, segundos_espera=0.0, rechazos=0, conexion=None):
+        """Acumula los contadores de monitoreo del día"""
+        (conexion or self._conexion()).execute(
+            'INSERT INTO contadores (accion, dia, llamadas, esperas, segundos_espera, rechazos) '
+            'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (accion, dia) DO UPDATE SET '
+            'llamadas = llamadas + excluded.llamadas, esperas = esperas + excluded.esperas, '
+            'segundos_espera = segundos_espera + excluded.segundos_espera, '
+            'rechazos = rechazos + excluded.rechazos',
+            (accion, self._dia(), llamadas, esperas, segundos_espera, rechazos)
+        )
+
+    def reembolsar(self, accion, consumo):
+        """Devuelve a las cuotas diarias lo cobrado por una llamada que no llegó a ejecutarse"""
+        if not consumo:
+            return
+        conexion = self._conexion()
+        dia = self._dia()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            for cuota, cantidad in consumo.items():
+                conexion.execute(
+                    'UPDATE consumo_diario SET usados = MAX(usados - ?, 0) WHERE cuota = ? AND dia = ?',
+                    (cantidad, cuota, dia)
+                )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        logger.debug(f'Cuotas reembolsadas por {accion}: {consumo}')
+
+    def hay_cupo(self, accion):
+        """True si a la acción le queda presupuesto diario (no consume nada)"""
+        conexion = self._conexion()
+        dia = self._dia()
+        for cuota, cantidad in CONSUMO_POR_ACCION.get(accion, {}).items():
+            limite = self.cuotas.get(cuota)
+            if limite is None:
+                continue
+            fila = conexion.execute(
+                'SELECT usados FROM consumo_diario WHERE cuota = ? AND dia = ?', (cuota, dia)
+            ).fetchone()
+            if (fila[0] if fila else 0) + cantidad > limite:
+                return False
+        return True
+
+    def estadisticas(self):
+        """Contadores del día por acción y consumo de cada cuota diaria"""
+        conexion = self._conexion()
+        dia = self._dia()
+        ahora = time.time()
+
+        acciones = {}
+        for accion, llamadas, esperas, segundos, rechazos in conexion.execute(
+            'SELECT accion, llamadas, esperas, segundos_espera, rechazos FROM contadores WHERE dia = ?', (dia,)
+        ):
+            acciones[accion] = {
+                'llamadas': llamadas,
+                'esperas': esperas,
+                'segundos_espera': round(segundos, 3),
+                'rechazos': rechazos
+            }
+
+        buckets = {}
+        for nombre, (tasa, capacidad) in self.tasas.items():
+            fila = conexion.execute('SELECT tokens, actualizado FROM buckets WHERE accion = ?', (nombre,)).fetchone()
+            tokens = capacidad if fila is None else min(capacidad, fila[0] + (ahora - fila[1]) * tasa)
+            buckets[nombre] = {'tokens': round(tokens, 3), 'tasa': tasa, 'capacidad': capacidad}
+
+        usados = dict(conexion.execute('SELECT cuota, usados FROM consumo_diario WHERE dia = ?', (dia,)).fetchall())
+        cuotas = {
+            cuota: {'usados': usados.get(cuota, 0), 'limite': limite, 'restante': max(0, limite - usados.get(cuota, 0))}
+            for cuota, limite in self.cuotas.items()
+        }
+
+        return {'dia': dia, 'acciones': acciones, 'buckets': buckets, 'cuotas': cuotas}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Limitador compartido del proceso, o None si APPS_SCRIPT_RATE_LIMIT=False"""
+    global _limiter
+    if os.getenv('APPS_SCRIPT_RATE_LIMIT', 'True').lower() != 'true':
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    ruta_instancia('rate_limits.db', 'APPS_SCRIPT_RATE_DB'),
+                    tasas=_parse_pares(os.getenv('APPS_SCRIPT_TASAS'), _parse_tasa),
+                    cuotas=_parse_pares(os.getenv('APPS_SCRIPT_CUOTAS'), int)
+                )
+    return _limiter
+
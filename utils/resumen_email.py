@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from models import db, FormularioActividad, NotificacionResumen
+from utils import correlacion
+from utils.rate_limiter import get_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class ResumenEmail:
+    """Agrupa las notificaciones de formularios procesados en emails de resumen.
+
+    En lugar de un email (y una exportación a PDF en Apps Script) por formulario,
+    cada formulario procesado se registra en la tabla notificaciones_resumen y se
+    envía un único email con la tabla de formularios y todos los PDF cuando se
+    juntan EMAIL_RESUMEN_MAXIMO pendientes o el más antiguo supera
+    EMAIL_RESUMEN_INTERVALO segundos.
+
+    La entrega es al menos una vez: las notificaciones se reclaman con un UPDATE
+    condicional y solo se marcan 'enviado' con la confirmación de Apps Script; un
+    resumen interrumpido se vuelve a enviar al vencer su reclamo.
+    """
+
+    def __init__(self, email_sender, crear_adjunto, intervalo=None, maximo=None,
+                 lease_seconds=None, max_intentos=None):
+        # crear_adjunto(formulario) -> datos de adjunto de sendEmail o None
+        self.email_sender = email_sender
+        self.crear_adjunto = crear_adjunto
+        self.intervalo = intervalo or int(os.getenv('EMAIL_RESUMEN_INTERVALO', 3600))
+        self.maximo = maximo or int(os.getenv('EMAIL_RESUMEN_MAXIMO', 20))
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', 300))
+        self.max_intentos = max_intentos or int(os.getenv('EMAIL_RESUMEN_MAX_INTENTOS', 5))
+        # Frecuencia con la que se revisa si corresponde enviar
+        self.poll_interval = min(60, max(1, self.intervalo / 4))
+        self.app = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self, app):
+        """Arranca el hilo que envía los resúmenes (una sola vez por proceso)"""
+        if self._thread:
+            return
+        self.app = app
+        self._thread = threading.Thread(target=self._loop, name='resumen-email', daemon=True)
+        self._thread.start()
+        logger.info(f'ResumenEmail iniciado (cada {self.intervalo}s o {self.maximo} formularios)')
+
+    def stop(self, timeout=5):
+        """Detiene el hilo de envío"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def registrar(self, formulario_id):
+        """Agrega el formulario al próximo resumen. Debe llamarse dentro de una sesión
+        activa; la notificación queda persistida con el siguiente commit."""
+        if NotificacionResumen.query.filter_by(formulario_id=formulario_id).first() is None:
+            db.session.add(NotificacionResumen(formulario_id=formulario_id))
+
+    def notify(self):
+        """Despierta al hilo local para que evalúe si ya alcanzó el tamaño del resumen"""
+        self._wakeup.set()
+
+    def recover(self):
+        """Devuelve a 'pendiente' las notificaciones de resúmenes interrumpidos"""
+        limite = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        recuperadas = NotificacionResumen.query.filter(
+            NotificacionResumen.estado == 'enviando',
+            NotificacionResumen.fecha_reclamo < limite
+        ).update({'estado': 'pendiente', 'lote': None}, synchronize_session=False)
+        db.session.commit()
+        if recuperadas:
+            logger.info(f'ResumenEmail: {recuperadas} notificaciones recuperadas')
+
+    def debe_enviar(self):
+        """True si hay suficientes pendientes o la más antigua ya esperó el intervalo"""
+        limiter = get_limiter()
+        if limiter is not None and not limiter.hay_cupo('sendDigest'):
+            # Cuota diaria de email agotada: las notificaciones esperan al día siguiente
+            return False
+        pendientes = NotificacionResumen.query.filter_by(estado='pendiente')
+        if pendientes.limit(self.maximo).count() >= self.maximo:
+            return True
+        mas_antigua = pendientes.order_by(NotificacionResumen.fecha_creacion).with_entities(
+            NotificacionResumen.fecha_creacion
+        ).limit(1).scalar()
+        return mas_antigua is not None and mas_antigua <= datetime.utcnow() - timedelta(seconds=self.intervalo)
+
+    def reclamar(self):
+        """Reclama atómicamente hasta `maximo` notificaciones pendientes. Devuelve (lote, notificaciones)"""
+        candidatas = [fila.id for fila in NotificacionResumen.query.filter_by(estado='pendiente').order_by(
+            NotificacionResumen.fecha_creacion, NotificacionResumen.id
+        ).with_entities(NotificacionResumen.id).limit(self.maximo)]
+        if not candidatas:
+            return None, []
+
+        lote = str(uuid.uuid4())
+        NotificacionResumen.query.filter(
+            NotificacionResumen.id.in_(candidatas),
+            NotificacionResumen.estado == 'pendiente'
+        ).update({
+            'estado': 'enviando',
+            'lote': lote,
+            'fecha_reclamo': datetime.utcnow(),
+            'intentos': NotificacionResumen.intentos + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return lote, NotificacionResumen.query.filter_by(lote=lote).order_by(NotificacionResumen.id).all()
+
+    def enviar_pendientes(self, forzar=False):
+        """Envía un resumen si corresponde (o siempre con forzar=True). Devuelve la cantidad enviada."""
+        if not forzar and not self.debe_enviar():
+            return 0
+
+        lote, notificaciones = self.reclamar()
+        if not notificaciones:
+            return 0
+
+        items = []
+        for notificacion in notificaciones:
+            formulario = db.session.get(FormularioActividad, notificacion.formulario_id)
+            if formulario is None:
+                continue
+            adjunto = self.crear_adjunto(formulario)
+            items.append({
+                'id': notificacion.id,
+                'formulario': formulario.to_dict(),
+                'attachments': [adjunto] if adjunto else []
+            })
+
+        try:
+            # El lote sirve de ID de correlación en los logs de Apps Script
+            with correlacion.usar(lote):
+                resultado = self.email_sender.send_digest_email(items)
+        except Exception as e:
+            logger.exception(f'Error enviando el resumen {lote}')
+            resultado = None
+            error_general = str(e)
+        else:
+            error_general = 'Sin respuesta de Google Apps Script' if resultado is None else None
+
+        enviados = set(resultado.get('sentItems', [])) if resultado else set()
+        postergados = set(resultado.get('deferredItems', [])) if resultado else set()
+        errores = {item['id']: item.get('error') for item in resultado.get('failedItems', [])} if resultado else {}
+
+        ahora = datetime.utcnow()
+        for notificacion in notificaciones:
+            if notificacion.id in enviados:
+                notificacion.estado = 'enviado'
+                notificacion.fecha_envio = ahora
+                notificacion.mensaje_error = None
+            elif notificacion.id in postergados:
+                # No entró en el email (límite de tamaño): vuelve sin consumir un intento
+                notificacion.estado = 'pendiente'
+                notificacion.intentos -= 1
+            else:
+                notificacion.mensaje_error = errores.get(notificacion.id) or error_general or 'No incluida en el resumen'
+                notificacion.estado = 'error' if notificacion.intentos >= self.max_intentos else 'pendiente'
+            notificacion.lote = None
+        db.session.commit()
+
+        logger.info(f'Resumen {lote}: {len(enviados)} enviadas, {len(postergados)} postergadas, '
+                    f'{len(notificaciones) - len(enviados) - len(postergados)} con error')
+        return len(enviados)
+
+    def _loop(self):
+        """Bucle del hilo de envío"""
+        ultimo_recover = 0.0
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - ultimo_recover > self.lease_seconds / 5:
+                        self.recover()
+                        ultimo_recover = time.monotonic()
+                    self.enviar_pendientes()
+            except Exception:
+                logger.exception('Error en el envío de resúmenes')
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
@@ -0,0 +1,122 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, text
+
+from models import db, FormularioActividad, ProcesamientoJob
+from utils import apps_script_client
+
+logger = logging.getLogger(__name__)
+
+
+class Salud:
+    """Verificación profunda del estado del proceso para /health?deep=1.
+
+    Mide la latencia de una consulta a la base de datos, si se puede tomar el lock
+    de escritura de SQLite, la tasa de éxito y la latencia recientes de Apps Script
+    (de este proceso) y la cantidad de formularios y trabajos por estado. El
+    resultado se guarda `ttl` segundos y un solo hilo a la vez lo recalcula, de modo
+    que los chequeos del balanceador no agregan carga a la base de datos.
+    """
+
+    def __init__(self, ttl=None, timeout_lock=None, ventana=None, min_exito=None, min_peticiones=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('SALUD_CACHE_SEGUNDOS', 5))
+        self.timeout_lock = timeout_lock or float(os.getenv('SALUD_TIMEOUT_LOCK', 1))
+        self.ventana = ventana or int(os.getenv('SALUD_VENTANA_APPS_SCRIPT', 300))
+        self.min_exito = min_exito if min_exito is not None else float(os.getenv('SALUD_MIN_EXITO_APPS_SCRIPT', 0.5))
+        self.min_peticiones = min_peticiones or int(os.getenv('SALUD_MIN_PETICIONES_APPS_SCRIPT', 5))
+        self._lock = threading.Lock()
+        self._resultado = None
+        self._momento = 0.0
+
+    def verificar(self):
+        """Resultado de las verificaciones (desde la caché si tiene menos de ttl segundos)"""
+        with self._lock:
+            if self._resultado is None or time.monotonic() - self._momento >= self.ttl:
+                self._resultado = self._sondear()
+                self._momento = time.monotonic()
+            return dict(self._resultado, edad_cache_segundos=round(time.monotonic() - self._momento, 3))
+
+    def _sondear(self):
+        verificaciones = {
+            'base_de_datos': self._base_de_datos(),
+            'lock_escritura': self._lock_escritura(),
+            'apps_script': apps_script_client.resumen_reciente(self.ventana),
+            'estados': self._estados()
+        }
+
+        problemas = []
+        if not verificaciones['base_de_datos']['ok']:
+            problemas.append('base de datos no disponible')
+        if verificaciones['lock_escritura']['ok'] is False:
+            problemas.append('lock de escritura de SQLite no disponible')
+        # Sin base de datos el proceso no puede atender envíos; con Apps Script
+        # degradado todavía puede guardarlos para procesarlos después
+        critico = bool(problemas)
+        apps_script = verificaciones['apps_script']
+        if apps_script['peticiones'] >= self.min_peticiones and apps_script['tasa_exito'] < self.min_exito:
+            problemas.append('tasa de éxito de Apps Script baja')
+
+        status = 'ERROR' if critico else 'DEGRADED' if problemas else 'OK'
+        if problemas:
+            logger.warning('Verificación de salud %s: %s', status, ', '.join(problemas))
+        return {
+            'status': status,
+            'problemas': problemas,
+            'verificado': datetime.utcnow().isoformat(),
+            'verificaciones': verificaciones
+        }
+
+    def _base_de_datos(self):
+        """Ida y vuelta a la base de datos (incluye obtener una conexión del pool)"""
+        inicio = time.perf_counter()
+        try:
+            with db.engine.connect() as conexion:
+                conexion.execute(text('SELECT 1'))
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, 'latencia_ms': round((time.perf_counter() - inicio) * 1000, 2)}
+
+    def _lock_escritura(self):
+        """Intenta tomar el lock de escritura de SQLite (BEGIN IMMEDIATE) con timeout_lock
+        segundos de espera, sin escribir nada"""
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            return {'ok': None, 'omitido': 'no es un archivo SQLite'}
+        inicio = time.perf_counter()
+        try:
+            conexion = sqlite3.connect(url.database, timeout=self.timeout_lock, isolation_level=None)
+            try:
+                conexion.execute('BEGIN IMMEDIATE')
+                conexion.execute('ROLLBACK')
+            finally:
+                conexion.close()
+        except sqlite3.Error as e:
+            return {'ok': False, 'error': str(e), 'espera_ms': round((time.perf_counter() - inicio) * 1000, 2)}
+        return {'ok': True, 'espera_ms': round((time.perf_counter() - inicio) * 1000, 2)}
+
+    def _estados(self):
+        """Formularios y trabajos de la cola por estado, y antigüedad del trabajo pendiente más viejo"""
+        try:
+            formularios = dict(
+                db.session.query(FormularioActividad.estado, func.count()).group_by(FormularioActividad.estado).all()
+            )
+            trabajos = dict(
+                db.session.query(ProcesamientoJob.estado, func.count()).group_by(ProcesamientoJob.estado).all()
+            )
+            mas_antiguo = db.session.query(func.min(ProcesamientoJob.fecha_creacion)).filter(
+                ProcesamientoJob.estado == 'pendiente'
+            ).scalar()
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}
+        return {
+            'formularios': formularios,
+            'trabajos': trabajos,
+            'trabajo_pendiente_mas_antiguo_segundos':
+                round((datetime.utcnow() - mas_antiguo).total_seconds()) if mas_antiguo else None
+        }
@@ -0,0 +1,81 @@
+import json
+
+# Backend JSON opcional más rápido; si no está instalado se usa el módulo estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Serializa a texto JSON (UTF-8 sin escapar) con el backend más rápido disponible"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _rechazar_constante(nombre):
+    raise ValueError(f'Constante no válida en JSON: {nombre}')
+
+
+def cargar_lista(texto):
+    """Decodifica un arreglo JSON estricto (sin NaN ni Infinity).
+    Devuelve None si el texto no es un arreglo JSON válido."""
+    try:
+        if orjson is not None:
+            valor = orjson.loads(texto)
+        else:
+            valor = json.loads(texto, parse_constant=_rechazar_constante)
+    except (TypeError, ValueError):
+        return None
+    return valor if isinstance(valor, list) else None
+
+
+def _parece_lista(texto):
+    """Chequeo barato (primer y último byte) del JSON validado al escribirse"""
+    return texto[:1] == '[' and texto[-1:] == ']'
+
+
+def backend():
+    """Nombre del backend JSON en uso"""
+    return 'orjson' if orjson is not None else 'json'
+
+
+def formulario_a_json(formulario, campos=None):
+    """Serializa un FormularioActividad a texto JSON.
+
+    Los campos guardados como JSON en la base de datos (periodos y el equipo de
+    formularios no migrados) se insertan tal cual están almacenados, sin
+    decodificarlos y volver a codificarlos: el modelo y migrate_equipo_miembros.py
+    los validan al escribirlos. Si el texto no parece un arreglo se serializa el
+    valor decodificado por el modelo ([] si no se puede leer).
+    """
+    if campos is None:
+        campos = formulario.CAMPOS
+
+    valores = {}
+    insertados = []
+    for campo in campos:
+        texto = None
+        if campo == 'periodos':
+            texto = formulario.periodos_json or '[]'
+        elif campo == 'equipo' and not formulario.miembros:
+            texto = formulario.equipo_json or '[]'
+        if texto is not None and _parece_lista(texto):
+            insertados.append(f'"{campo}":{texto}')
+        else:
+            valores[campo] = formulario._valor_campo(campo)
+
+    # Los campos comunes se codifican en una sola llamada y los JSON almacenados se agregan al final
+    cuerpo = dumps(valores)
+    if not insertados:
+        return cuerpo
+    return cuerpo[:-1] + (',' if valores else '') + ','.join(insertados) + '}'
+
+
+def respuesta_listado(filas_json, **extra):
+    """Arma el cuerpo {"success": true, "data": [...], ...} a partir de filas ya serializadas"""
+    cuerpo = '{"success":true,"data":[' + ','.join(filas_json) + ']'
+    for clave, valor in extra.items():
+        cuerpo += f',"{clave}":{dumps(valor)}'
+    return cuerpo + '}'
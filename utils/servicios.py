@@ -0,0 +1,56 @@
+import threading
+
+
+class Servicios:
+    """Registro de utilidades que se crean en el primer uso.
+
+    Cada proceso de mod_wsgi importa app.py al arrancar o recargarse; con el registro,
+    las utilidades (y sus imports) solo se crean cuando un request o un trabajo las
+    usa por primera vez.
+    """
+
+    def __init__(self):
+        self._fabricas = {}
+        self._instancias = {}
+        # RLock: la fábrica de un servicio puede pedir otro servicio
+        self._lock = threading.RLock()
+
+    def registrar(self, nombre, fabrica):
+        """Registra la función que crea el servicio (se llama una sola vez por proceso)"""
+        self._fabricas[nombre] = fabrica
+
+    def obtener(self, nombre):
+        """Devuelve la instancia del servicio, creándola la primera vez"""
+        instancia = self._instancias.get(nombre)
+        if instancia is None:
+            with self._lock:
+                instancia = self._instancias.get(nombre)
+                if instancia is None:
+                    instancia = self._fabricas[nombre]()
+                    self._instancias[nombre] = instancia
+        return instancia
+
+    def creados(self):
+        """Nombres de los servicios ya creados en este proceso"""
+        return sorted(self._instancias)
+
+    def perezoso(self, nombre):
+        """Objeto que se usa como el servicio y lo crea al acceder al primer atributo"""
+        return _ServicioPerezoso(self, nombre)
+
+
+class _ServicioPerezoso:
+    __slots__ = ('_servicios', '_nombre')
+
+    def __init__(self, servicios, nombre):
+        object.__setattr__(self, '_servicios', servicios)
+        object.__setattr__(self, '_nombre', nombre)
+
+    def __getattr__(self, atributo):
+        return getattr(self._servicios.obtener(self._nombre), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._servicios.obtener(self._nombre), atributo, valor)
+
+    def __repr__(self):
+        return f'<servicio {self._nombre}>'
@@ -0,0 +1,112 @@
+import os
+
+from sqlalchemy import event
+
+# Perfiles de almacenamiento SQLite. Cada PRAGMA se aplica a cada conexión nueva.
+#   default:    comportamiento original de SQLite (rollback journal)
+#   produccion: WAL para que las lecturas no se bloqueen con las escrituras de otros
+#               procesos de mod_wsgi, y busy_timeout para esperar el lock en lugar de
+#               fallar con "database is locked"
+PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {}
+    },
+    'produccion': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,         # milisegundos
+            'cache_size': -16000,         # negativo = KiB (16 MB por conexión)
+            'mmap_size': 64 * 1024 * 1024,
+            'temp_store': 'MEMORY'
+        },
+        'engine_options': {
+            # Pocas conexiones por proceso: los procesos de mod_wsgi ya aportan paralelismo
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_timeout': 10,
+            'pool_recycle': 3600
+        }
+    }
+}
+
+# Variables de entorno que permiten ajustar un PRAGMA del perfil elegido
+PRAGMA_ENV = {
+    'busy_timeout': 'SQLITE_BUSY_TIMEOUT',
+    'cache_size': 'SQLITE_CACHE_SIZE',
+    'mmap_size': 'SQLITE_MMAP_SIZE',
+    'synchronous': 'SQLITE_SYNCHRONOUS'
+}
+
+
+# Valores admitidos para los PRAGMAs que no son numéricos
+PRAGMA_VALORES = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY')
+}
+
+
+def validar_pragma(pragma, value):
+    """Normaliza el valor de un PRAGMA (entero o de la lista de PRAGMA_VALORES).
+    Lanza ValueError si no es válido, para no armar sentencias con texto arbitrario."""
+    if pragma in PRAGMA_VALORES:
+        value = str(value).strip().upper()
+        if value not in PRAGMA_VALORES[pragma]:
+            raise ValueError(f"Valor inválido para PRAGMA {pragma}: {value}. "
+                             f"Opciones: {', '.join(PRAGMA_VALORES[pragma])}")
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para PRAGMA {pragma}: {value} (se esperaba un entero)")
+
+
+def get_profile_name():
+    """Perfil elegido con SQLITE_PROFILE (por defecto 'produccion' en producción)"""
+    default = 'produccion' if os.getenv('FLASK_ENV') == 'production' else 'default'
+    name = os.getenv('SQLITE_PROFILE', default)
+    if name not in PROFILES:
+        raise ValueError(f"SQLITE_PROFILE desconocido: {name}. Opciones: {', '.join(PROFILES)}")
+    return name
+
+
+def get_pragmas(name):
+    """PRAGMAs del perfil con los ajustes de variables de entorno aplicados (validados)"""
+    pragmas = dict(PROFILES[name]['pragmas'])
+    for pragma, env_var in PRAGMA_ENV.items():
+        value = os.getenv(env_var)
+        if value:
+            pragmas[pragma] = value
+    return {pragma: validar_pragma(pragma, value) for pragma, value in pragmas.items()}
+
+
+def get_engine_options(name, database_uri):
+    """Opciones para SQLALCHEMY_ENGINE_OPTIONS según el perfil"""
+    if not database_uri.startswith('sqlite') or ':memory:' in database_uri:
+        return {}
+    options = dict(PROFILES[name]['engine_options'])
+    busy_timeout = get_pragmas(name).get('busy_timeout')
+    if busy_timeout:
+        # El timeout del driver sqlite3 está en segundos
+        options['connect_args'] = {'timeout': int(busy_timeout) / 1000}
+    return options
+
+
+def register(engine, name):
+    """Registra el evento 'connect' que aplica los PRAGMAs del perfil a cada conexión"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = get_pragmas(name)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
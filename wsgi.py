@@ -41,6 +41,12 @@ PROJECT_ROOT = str(project_dir)
 DATABASE_PATH = str(project_dir / 'instance' / 'formularios.db')
 os.environ['DATABASE_PATH'] = DATABASE_PATH
 
+# Configurar el logging una sola vez, antes de importar la aplicación: los hilos
+# de los requests encolan los registros y un hilo aparte los escribe (ver utils/logs.py)
+import logging
+from utils import logs
+logs.configurar(os.getenv('LOG_FILE', str(project_dir / 'logs' / 'pilar.log')))
+
 # Importar la aplicación Flask
 try:
     from app import app as application
@@ -58,17 +64,6 @@ try:
         x_prefix=1
     )
     
-    # Log de inicio para debug
-    import logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(project_dir / 'logs' / 'pilar.log'),
-            logging.StreamHandler()
-        ]
-    )
-    
     logger = logging.getLogger(__name__)
     
     # Usar caracteres ASCII para evitar problemas de encoding en logs
@@ -109,6 +104,13 @@ try:
         logger.error(f"Error al inicializar la base de datos: {str(e)}")
         logger.error(f"URI de base de datos: {application.config.get('SQLALCHEMY_DATABASE_URI', 'no configurada')}")
     
+    # Arrancar los trabajadores de la cola de procesamiento en este proceso
+    try:
+        from app import iniciar_cola_trabajos
+        iniciar_cola_trabajos()
+    except Exception as e:
+        logger.error(f"Error al iniciar la cola de trabajos: {str(e)}")
+    
 except ImportError as e:
     # Crear una aplicación mínima en caso de error
     from flask import Flask